@@ -0,0 +1,121 @@
+# Materialized statistics for the admin dashboard.
+# Every write that changes a dashboard figure adjusts a counter in ADMIN_STATS inside its
+# own transaction, so the dashboard reads a handful of rows instead of scanning USERS,
+# TRAINS and RESERVATIONS on every refresh.
+#
+# Reconciliation (checks the counters against the real tables and repairs drift):
+#   python admin_stats.py                  # once
+#   python admin_stats.py --interval 300   # every 5 minutes
+
+import argparse
+import random
+import time
+
+STAT_NAMES = ('total_users', 'total_trains', 'total_reservations', 'system_total_seats', 'system_booked_seats')
+
+# Each figure is spread over STAT_SLOTS rows; writers pick a random slot so concurrent
+# bookings on different trains do not queue on one counter row. Readers sum the slots.
+STAT_SLOTS = 8
+
+# The aggregates the counters stand for (used by reconciliation).
+STAT_QUERIES = {
+    'total_users': "SELECT COUNT(*) FROM USERS",
+    'total_trains': "SELECT COUNT(*) FROM TRAINS",
+    'total_reservations': "SELECT COUNT(*) FROM RESERVATIONS",
+    # Seat figures cover the open journeys (a train on one travel date, see seat_inventory.py).
+    'system_total_seats': "SELECT SUM(total_seats) FROM JOURNEYS",
+    'system_booked_seats': "SELECT SUM(total_seats - available_seats) FROM JOURNEYS",
+}
+
+def record_stats(cursor, **deltas):
+    """
+    Adds the given deltas to the counters (e.g. total_reservations=2).
+    Call this inside the same transaction as the write it accounts for.
+    """
+    rows = [(name, random.randrange(STAT_SLOTS), delta) for name, delta in deltas.items() if delta]
+    if not rows:
+        return
+    placeholders = ", ".join(["(%s, %s, %s)"] * len(rows))
+    cursor.execute(
+        f"INSERT INTO ADMIN_STATS (stat_name, slot, value) VALUES {placeholders} "
+        "ON DUPLICATE KEY UPDATE value = value + VALUES(value)",
+        [value for row in rows for value in row],
+    )
+
+def set_stats(cursor, **values):
+    """Overwrites counters with absolute values (after resets and during reconciliation)."""
+    for name, value in values.items():
+        cursor.execute("DELETE FROM ADMIN_STATS WHERE stat_name = %s", (name,))
+        cursor.execute("INSERT INTO ADMIN_STATS (stat_name, slot, value) VALUES (%s, 0, %s)", (name, value))
+
+def read_stats(cursor):
+    """Returns {stat_name: value} for every counter with a single small query."""
+    cursor.execute("SELECT stat_name, SUM(value) FROM ADMIN_STATS GROUP BY stat_name")
+    stats = dict.fromkeys(STAT_NAMES, 0)
+    stats.update((name, int(value or 0)) for name, value in cursor.fetchall())
+    return stats
+
+def compute_stats(cursor):
+    """Returns {stat_name: value} computed from the tables themselves (full scans)."""
+    stats = {}
+    for name, query in STAT_QUERIES.items():
+        cursor.execute(query)
+        stats[name] = int(cursor.fetchone()[0] or 0)
+    return stats
+
+def reconcile_stats(pool):
+    """
+    Compares the counters with the real tables and corrects any that drifted.
+    Returns {stat_name: (counter, actual)} for the counters that were wrong.
+
+    The counter rows are locked first, so writers that commit during the check wait
+    for it and then apply their deltas on top of the corrected values.
+    """
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            conn.start_transaction()
+            cursor.execute("SELECT stat_name, slot, value FROM ADMIN_STATS FOR UPDATE")
+            counters = dict.fromkeys(STAT_NAMES, 0)
+            for name, slot, value in cursor.fetchall():
+                counters[name] = counters.get(name, 0) + int(value)
+
+            actual = compute_stats(cursor)
+            drift = {name: (counters[name], actual[name]) for name in STAT_NAMES if counters[name] != actual[name]}
+            if drift:
+                set_stats(cursor, **{name: actual[name] for name in drift})
+            conn.commit()
+            return drift
+        finally:
+            cursor.close()
+
+
+if __name__ == "__main__":
+    import main
+    from storage import DB_ERRORS, create_pool
+
+    parser = argparse.ArgumentParser(description="Check the admin dashboard counters against the real tables.")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default=main.DB_BACKEND)
+    parser.add_argument("--sqlite-path", default=main.SQLITE_PATH)
+    parser.add_argument("--interval", type=float, default=0, help="seconds between runs (0 runs once)")
+    args = parser.parse_args()
+
+    pool = create_pool(args.backend, mysql_config=main.DB_CONFIG, sqlite_path=args.sqlite_path, size=1)
+    try:
+        while True:
+            try:
+                drift = reconcile_stats(pool)
+                if drift:
+                    for name, (counter, actual) in drift.items():
+                        print(f"[FIXED] {name}: counter was {counter}, tables say {actual}")
+                else:
+                    print("[OK] All admin statistics match the tables.")
+            except DB_ERRORS as err:
+                print(f"Reconciliation Error: {err}")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
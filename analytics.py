@@ -0,0 +1,219 @@
+# Occupancy and booking analytics for the admin dashboard.
+# TRAINS, JOURNEYS and RESERVATIONS (plus their archives) are bulk-loaded once into
+# NumPy column arrays; every report is then a handful of vectorized group-bys
+# (np.bincount over integer train, route and station ids) instead of aggregate queries
+# on the live tables. The loaded columns and the reports built from them are cached for
+# the TTL: bookings and cancellations do not invalidate them (under booking load the cache
+# would never hit), so they show up in the report within the TTL. Resets invalidate it.
+#
+#   system.get_analytics(session)    # dict: occupancy, busiest routes and stations, booking rates
+#   GET /admin/analytics             # the same, over the HTTP API
+
+import threading
+import time
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:
+    # Everything else works without NumPy; only the analytics report is unavailable.
+    np = None
+
+FETCH_SIZE = 10000  # Rows per fetchmany() while loading
+TREND_DAYS = 30     # Days of booking counts in the daily trend
+
+
+def _fetch_columns(cursor, query, count):
+    """Runs query and returns its result as `count` lists, one per column."""
+    cursor.execute(query)
+    columns = [[] for _ in range(count)]
+    while True:
+        rows = cursor.fetchmany(FETCH_SIZE)
+        if not rows:
+            return columns
+        for column, values in zip(columns, zip(*rows)):
+            column.extend(values)
+
+def _top(values, top):
+    """Indices of the `top` largest non-zero values, largest first."""
+    order = np.argsort(-values, kind='stable')[:top]
+    return order[values[order] > 0]
+
+
+class _Columns:
+    """The loaded data: one array per column, trains sorted by number, everything else as integer ids."""
+
+    def __init__(self, trains, journeys, reservations):
+        numbers, names, sources, destinations = trains
+        order = np.argsort(np.array(numbers, dtype=str), kind='stable')
+        self.train_numbers = np.array(numbers, dtype=str)[order]
+        self.train_names = np.array(names, dtype=object)[order]
+
+        # Stations and routes (source -> destination) as dense integer ids.
+        ends = np.array(sources + destinations, dtype=str)
+        self.stations, station_ids = np.unique(ends, return_inverse=True)
+        station_ids = station_ids.reshape(2, -1)
+        self.source_ids = station_ids[0][order]
+        self.destination_ids = station_ids[1][order]
+        width = max(len(self.stations), 1)
+        route_codes, self.route_ids = np.unique(self.source_ids.astype(np.int64) * width + self.destination_ids, return_inverse=True)
+        self.route_ends = np.stack(np.divmod(route_codes, width), axis=1)  # route id -> (source id, destination id)
+
+        journey_trains, total_seats, available_seats = journeys
+        self.journey_train_ids, known = self._train_ids(journey_trains)
+        self.journey_total = np.array(total_seats, dtype=np.int64)[known]
+        self.journey_booked = self.journey_total - np.array(available_seats, dtype=np.int64)[known]
+
+        booking_trains, booking_dates = reservations
+        self.booking_train_ids, known = self._train_ids(booking_trains)
+        dated = [value for value, keep in zip(booking_dates, known) if keep and value is not None]
+        self.booking_times = np.array(dated, dtype='datetime64[s]') if dated else np.zeros(0, 'datetime64[s]')
+
+    def _train_ids(self, numbers):
+        """Maps train numbers to train ids with a binary search; returns (ids, mask of known trains)."""
+        numbers = np.array(numbers, dtype=str) if numbers else np.zeros(0, dtype=str)
+        if not len(self.train_numbers):
+            return np.zeros(0, np.int64), np.zeros(len(numbers), bool)
+        ids = np.minimum(np.searchsorted(self.train_numbers, numbers), len(self.train_numbers) - 1)
+        known = self.train_numbers[ids] == numbers
+        return ids[known], known
+
+
+class BookingAnalytics:
+    """
+    Cached analytics over the booking tables (see module comment).
+
+    The columns are reloaded once they are older than the TTL, or after invalidate()
+    (called by resets). A load that overlaps an invalidation is used once but not cached.
+    """
+
+    def __init__(self, pool, ttl=300.0, include_archive=True):
+        self.pool = pool
+        self.ttl = ttl
+        self.include_archive = include_archive
+        self._columns = None
+        self._loaded_at = 0.0
+        self._reports = {}      # top -> report built from the cached columns
+        self._generation = 0    # Bumped by every invalidation
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._columns = None
+            self._reports.clear()
+
+    def _load(self):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                trains = _fetch_columns(cursor, "SELECT train_number, train_name, source, destination FROM TRAINS", 4)
+                journeys = _fetch_columns(cursor, "SELECT train_number, total_seats, available_seats FROM JOURNEYS", 3)
+                reservations = _fetch_columns(cursor, "SELECT train_number, booking_date FROM RESERVATIONS", 2)
+                if self.include_archive:
+                    for target, query in (
+                        (journeys, "SELECT train_number, total_seats, available_seats FROM JOURNEYS_ARCHIVE"),
+                        (reservations, "SELECT train_number, booking_date FROM RESERVATIONS_HISTORY"),
+                    ):
+                        for column, values in zip(target, _fetch_columns(cursor, query, len(target))):
+                            column.extend(values)
+            finally:
+                cursor.close()
+        return _Columns(trains, journeys, reservations)
+
+    def report(self, top=10):
+        """Returns the analytics report (plain data, JSON-serialisable) with `top` entries per ranking."""
+        if np is None:
+            raise RuntimeError("Analytics need NumPy (pip install numpy).")
+        now = time.monotonic()
+        with self._lock:
+            if self._columns is not None and now - self._loaded_at >= self.ttl:
+                self._columns = None
+                self._reports.clear()
+            cached = self._reports.get(top)
+            if cached is not None:
+                return cached
+            columns, generation = self._columns, self._generation
+
+        load_ms = 0.0
+        if columns is None:
+            start = time.perf_counter()
+            columns = self._load()
+            load_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        report = self._build(columns, top)
+        report['load_ms'] = load_ms
+        report['compute_ms'] = (time.perf_counter() - start) * 1000
+
+        with self._lock:
+            if generation == self._generation:
+                if self._columns is None:
+                    self._columns, self._loaded_at = columns, now
+                self._reports[top] = report
+        return report
+
+    def _build(self, c, top):
+        train_count = len(c.train_numbers)
+        station_count = len(c.stations)
+        route_count = len(c.route_ends)
+
+        # Seats per train over its journeys, then per route (trains grouped by route id).
+        capacity = np.bincount(c.journey_train_ids, weights=c.journey_total, minlength=train_count)
+        booked = np.bincount(c.journey_train_ids, weights=c.journey_booked, minlength=train_count)
+        route_capacity = np.bincount(c.route_ids, weights=capacity, minlength=route_count)
+        route_booked = np.bincount(c.route_ids, weights=booked, minlength=route_count)
+
+        # Bookings per train, per route, and per station (counted at both ends of the route).
+        bookings = np.bincount(c.booking_train_ids, minlength=train_count).astype(np.float64)
+        route_bookings = np.bincount(c.route_ids, weights=bookings, minlength=route_count)
+        station_bookings = (
+            np.bincount(c.source_ids, weights=bookings, minlength=station_count)
+            + np.bincount(c.destination_ids, weights=bookings, minlength=station_count)
+        )
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            occupancy = np.where(capacity > 0, booked / capacity * 100, 0.0)
+            route_occupancy = np.where(route_capacity > 0, route_booked / route_capacity * 100, 0.0)
+
+        # Booking rate: by hour of day (as stored) and per day over the last TREND_DAYS days.
+        times = c.booking_times
+        hours = ((times - times.astype('datetime64[D]')) // np.timedelta64(1, 'h')).astype(np.int64)
+        by_hour = np.bincount(hours, minlength=24)
+        first_day = np.datetime64(date.today()) - (TREND_DAYS - 1)
+        days = (times.astype('datetime64[D]') - first_day).astype(np.int64)
+        by_day = np.bincount(days[(days >= 0) & (days < TREND_DAYS)], minlength=TREND_DAYS)
+
+        def route(index):
+            source, destination = c.route_ends[index]
+            return {'source': str(c.stations[source]), 'destination': str(c.stations[destination])}
+
+        total_capacity = capacity.sum()
+        return {
+            'rows': {'trains': train_count, 'journeys': len(c.journey_total), 'bookings': len(times)},
+            'occupancy_percent': float(booked.sum() / total_capacity * 100) if total_capacity else 0.0,
+            'busiest_trains': [
+                {
+                    'train_number': str(c.train_numbers[i]), 'train_name': c.train_names[i],
+                    'booked_seats': int(booked[i]), 'total_seats': int(capacity[i]), 'occupancy_percent': float(occupancy[i]),
+                }
+                for i in _top(occupancy, top)
+            ],
+            'busiest_routes': [
+                {**route(i), 'bookings': int(route_bookings[i]), 'occupancy_percent': float(route_occupancy[i])}
+                for i in _top(route_bookings, top)
+            ],
+            'fullest_routes': [
+                {**route(i), 'booked_seats': int(route_booked[i]), 'total_seats': int(route_capacity[i]),
+                 'occupancy_percent': float(route_occupancy[i])}
+                for i in _top(route_occupancy, top)
+            ],
+            'busiest_stations': [
+                {'station': str(c.stations[i]), 'bookings': int(station_bookings[i])}
+                for i in _top(station_bookings, top)
+            ],
+            'bookings_by_hour': by_hour.tolist(),
+            'bookings_by_day': {
+                str(first_day + offset): int(count) for offset, count in enumerate(by_day)
+            },
+        }
@@ -0,0 +1,264 @@
+# Batch bookings and cancellations for partner agencies.
+# Streams a CSV or JSON Lines file of operations, groups them by train and applies each
+# train's operations in one transaction (see apply_train_batch in main.py); different
+# trains are applied in parallel. Every input row gets a line in the result file with
+# its PNR and seat, or the reason it failed.
+#
+#   python batch_ingest.py agency_batch.csv                 # results in agency_batch.results.csv
+#   python batch_ingest.py agency_batch.jsonl --workers 8   # results in agency_batch.results.jsonl
+#
+# Columns (CSV header) or keys (JSON Lines):
+#   op              'book' or 'cancel'
+#   username        the user the booking belongs to (must exist)
+#   train_number    required for bookings; looked up from the PNR for cancellations if empty
+#                   (a PNR not found before the chunk runs, e.g. one booked earlier in it, is
+#                   looked up again after the chunk's other rows and cancelled then)
+#   journey_date    YYYY-MM-DD (bookings)
+#   passenger_name  (bookings)
+#   age             (bookings)
+#   pnr_number      (cancellations)
+#
+# The file is trusted like data_importer's input: it is applied with admin rights.
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from storage import DB_ERRORS
+
+FIELDS = ('op', 'username', 'train_number', 'journey_date', 'passenger_name', 'age', 'pnr_number')
+RESULT_FIELDS = ('line', 'op', 'train_number', 'status', 'pnr_number', 'seat_number', 'message')
+
+DEFAULT_WORKERS = 4         # Trains applied at the same time (each holds one pooled connection)
+DEFAULT_CHUNK_SIZE = 5000   # Rows read and grouped at a time; bounds memory on large files
+MAX_BATCH_ROWS = 500        # Rows of one train per transaction; longer runs are split (in order)
+
+
+def _is_jsonl(path):
+    return os.path.splitext(path)[1].lower() in ('.jsonl', '.json', '.ndjson')
+
+def read_operation_chunks(path, chunk_size):
+    """
+    Lazily reads the operations file and yields lists of (line, operation) of up to
+    chunk_size rows, where operation is a dict with the keys in FIELDS (missing ones are None).
+    A JSON line that cannot be parsed is yielded with operation None.
+    """
+    with open(path, mode='r', encoding='utf-8', newline='') as file:
+        if _is_jsonl(path):
+            rows = ((line, text) for line, text in enumerate(file, start=1) if text.strip())
+        else:
+            # Line 1 is the header row.
+            rows = enumerate(csv.DictReader(file), start=2)
+
+        chunk = []
+        for line, row in rows:
+            if isinstance(row, str):
+                try:
+                    row = json.loads(row)
+                except ValueError:
+                    row = None
+            if isinstance(row, dict):
+                row = {field: (str(row[field]).strip() if row.get(field) is not None else None) for field in FIELDS}
+                row['op'] = (row['op'] or '').lower()
+            else:
+                row = None
+            chunk.append((line, row))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+class ResultWriter:
+    """Writes one result per input row, as CSV or JSON Lines (by file extension)."""
+
+    def __init__(self, path):
+        self.file = open(path, mode='w', encoding='utf-8', newline='')
+        self.jsonl = _is_jsonl(path)
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=RESULT_FIELDS)
+            self.writer.writeheader()
+
+    def write(self, result):
+        if self.jsonl:
+            self.file.write(json.dumps(result) + "\n")
+        else:
+            self.writer.writerow(result)
+
+    def close(self):
+        self.file.close()
+
+
+def _find_trains(system, pnr_numbers):
+    """Returns {pnr_number: train_number} for confirmed and waitlisted PNRs (cancellations without a train)."""
+    canonical = {}
+    for pnr_number in pnr_numbers:
+        try:
+            canonical[system._pnr(pnr_number)] = pnr_number
+        except main.ReservationError:
+            pass
+    if not canonical:
+        return {}
+    placeholders = ", ".join(["%s"] * len(canonical))
+    with system._checkout() as (conn, cursor):
+        cursor.execute(
+            f"""
+            SELECT pnr_number, train_number FROM RESERVATIONS WHERE pnr_number IN ({placeholders})
+            UNION ALL
+            SELECT pnr_number, train_number FROM WAITLIST WHERE pnr_number IN ({placeholders})
+            """,
+            (*canonical, *canonical),
+        )
+        return {canonical[pnr_number]: train_number for pnr_number, train_number in cursor.fetchall()}
+
+def apply_train(system, session, train_number, rows):
+    """Applies one train's (line, operation) rows in order, MAX_BATCH_ROWS per transaction. Returns result dicts."""
+    results = []
+    for start in range(0, len(rows), MAX_BATCH_ROWS):
+        batch = rows[start:start + MAX_BATCH_ROWS]
+        try:
+            outcomes = system.apply_train_batch(session, train_number, [operation for _, operation in batch])
+            statuses = [('failed' if error else 'ok', pnr, seat, error or '') for pnr, seat, error in outcomes]
+        except DB_ERRORS as err:
+            # The transaction was rolled back: none of these rows were applied.
+            statuses = [('error', None, None, f"Database Error: {err}")] * len(batch)
+        except main.ReservationError as err:
+            # Refused as a whole (e.g. the admin session expired); nothing was applied.
+            statuses = [('error', None, None, str(err))] * len(batch)
+        except Exception as err:
+            # Anything else fails this batch only; the rest of the file is still applied.
+            statuses = [('error', None, None, f"Unexpected error: {err}")] * len(batch)
+        for (line, operation), (status, pnr_number, seat_number, message) in zip(batch, statuses):
+            results.append({
+                'line': line, 'op': operation['op'], 'train_number': train_number, 'status': status,
+                'pnr_number': pnr_number or operation['pnr_number'], 'seat_number': seat_number, 'message': message,
+            })
+    return results
+
+def _lookup_trains(system, pnr_numbers):
+    """Returns ({pnr_number: train_number}, error message or None) for _find_trains."""
+    try:
+        return (_find_trains(system, pnr_numbers) if pnr_numbers else {}), None
+    except DB_ERRORS as err:
+        return {}, f"Database Error: {err}"
+
+def _apply_trains(system, session, executor, trains, results):
+    """Applies {train_number: rows} in parallel and stores each row's result in results by line."""
+    futures = [executor.submit(apply_train, system, session, train_number, rows) for train_number, rows in trains.items()]
+    for future in futures:
+        for result in future.result():
+            results[result['line']] = result
+
+def process_chunk(system, session, executor, chunk):
+    """
+    Groups a chunk by train, applies the trains in parallel and returns the results in input order.
+    Cancellations whose train cannot be looked up beforehand are retried after the rest of the
+    chunk, when a PNR booked earlier in the chunk exists.
+    """
+    results = {}
+    missing = [operation['pnr_number'] for _, operation in chunk
+               if operation and operation['op'] == 'cancel' and not operation['train_number'] and operation['pnr_number']]
+    found, lookup_error = _lookup_trains(system, missing)
+
+    trains = {}    # train_number -> [(line, operation), ...] in file order
+    deferred = []  # cancellations whose PNR was not found yet
+    for line, operation in chunk:
+        if operation is None:
+            results[line] = {'line': line, 'status': 'failed', 'message': "Row could not be parsed."}
+            continue
+        train_number = operation['train_number'] or found.get(operation['pnr_number'])
+        if not train_number:
+            if operation['op'] != 'cancel':
+                status, message = 'failed', "No train_number given."
+            elif lookup_error and operation['pnr_number']:
+                status, message = 'error', lookup_error
+            elif operation['pnr_number']:
+                deferred.append((line, operation))
+                continue
+            else:
+                status, message = 'failed', "No pnr_number given."
+            results[line] = {'line': line, 'op': operation['op'], 'status': status, 'message': message}
+            continue
+        trains.setdefault(train_number, []).append((line, operation))
+    _apply_trains(system, session, executor, trains, results)
+
+    if deferred:
+        found, lookup_error = _lookup_trains(system, [operation['pnr_number'] for _, operation in deferred])
+        trains = {}
+        for line, operation in deferred:
+            train_number = found.get(operation['pnr_number'])
+            if train_number:
+                trains.setdefault(train_number, []).append((line, operation))
+                continue
+            if lookup_error:
+                status, message = 'error', lookup_error
+            else:
+                status, message = 'failed', f"PNR Number {operation['pnr_number']} not found."
+            results[line] = {'line': line, 'op': operation['op'], 'status': status, 'message': message}
+        _apply_trains(system, session, executor, trains, results)
+    return [results[line] for line, _ in chunk]
+
+def ingest_file(system, path, output_path, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Applies every operation in the file and writes the per-row results. Returns {'ok', 'failed', 'error'} counts."""
+    counts = {'ok': 0, 'failed': 0, 'error': 0}
+    writer = ResultWriter(output_path)
+    start_time = time.monotonic()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for chunk in read_operation_chunks(path, chunk_size):
+                # A fresh admin session per chunk: a long file must not outlive SESSION_TTL.
+                session = system.sessions.create(main.ADMIN_USERNAME)
+                try:
+                    results = process_chunk(system, session, executor, chunk)
+                finally:
+                    system.logout_user(session)
+                for result in results:
+                    counts[result['status']] += 1
+                    writer.write({field: result.get(field) for field in RESULT_FIELDS})
+
+                rows_done = sum(counts.values())
+                elapsed = time.monotonic() - start_time
+                rate = rows_done / elapsed if elapsed > 0 else 0.0
+                print(f"  ... {rows_done} rows processed ({rate:,.0f} rows/sec)")
+    finally:
+        writer.close()
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply a partner agency's batch of bookings and cancellations.")
+    parser.add_argument("input", help="CSV or JSON Lines (.jsonl) file of operations")
+    parser.add_argument("--output", help="result file (default: <input>.results.<ext>)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="trains applied in parallel")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows grouped at a time")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default=main.DB_BACKEND)
+    parser.add_argument("--sqlite-path", default=main.SQLITE_PATH)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.input):
+        raise SystemExit(f"[ERROR] File not found: {args.input}")
+    root, extension = os.path.splitext(args.input)
+    output_path = args.output or f"{root}.results{extension or '.csv'}"
+
+    system = main.RailwayReservationSystem(backend=args.backend, pool_size=args.workers + 1, sqlite_path=args.sqlite_path)
+    if not system.connect():
+        raise SystemExit(1)
+    try:
+        start_time = time.monotonic()
+        print(f"Applying '{args.input}' with {args.workers} workers...")
+        counts = ingest_file(system, args.input, output_path, args.workers, args.chunk_size)
+        print("\n==============================================")
+        print("BATCH COMPLETE")
+        print("==============================================")
+        print(f"Applied: {counts['ok']}")
+        print(f"Failed (see results): {counts['failed']}")
+        print(f"Not applied (database errors): {counts['error']}")
+        print(f"Results written to: {output_path}")
+        print(f"Elapsed time: {time.monotonic() - start_time:.2f}s")
+    finally:
+        system.disconnect()
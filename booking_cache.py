@@ -0,0 +1,77 @@
+# Read-through cache of booking records for the Railway Reservation System.
+# PNR status checks are the most frequent read; repeated checks of the same PNR are
+# answered from memory instead of joining RESERVATIONS and TRAINS again.
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class BookingCache:
+    """
+    LRU cache of pnr_number -> booking record (the dict built by get_booking), with a TTL.
+
+    Writes that change a booking call invalidate() after they commit. A lookup that
+    missed passes the generation it started at to put(), so a record read just before
+    a concurrent invalidation is not cached. The TTL bounds how long a change made by
+    another process can go unnoticed.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # pnr_number -> (record, cached_at), LRU order
+        self._generation = 0           # Bumped by every invalidation
+        self._lock = threading.Lock()
+
+    def get(self, pnr_number):
+        """Returns (record, generation): record is None on a miss; pass generation to put()."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(pnr_number)
+            if entry is not None and now - entry[1] < self.ttl:
+                self._entries.move_to_end(pnr_number)
+                self.hits += 1
+                return entry[0], self._generation
+            if entry is not None:
+                del self._entries[pnr_number]
+            self.misses += 1
+            return None, self._generation
+
+    def put(self, pnr_number, record, generation):
+        """Caches a record read from the database, unless something was invalidated since get()."""
+        if not self.max_entries:
+            return
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[pnr_number] = (record, time.monotonic())
+            self._entries.move_to_end(pnr_number)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *pnr_numbers):
+        """Drops the given PNRs (after a write to them commits)."""
+        with self._lock:
+            self._generation += 1
+            for pnr_number in pnr_numbers:
+                self._entries.pop(pnr_number, None)
+
+    def clear(self):
+        """Drops every record (after a reset)."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Returns {'entries', 'hits', 'misses', 'hit_rate'} since the cache was created."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,185 @@
+# Password hashing for the Railway Reservation System.
+# Per-user salts and a slow, tunable key-derivation function (scrypt or PBKDF2) replace the
+# single SHA-512 over password + global SALT. Old SHA-512 hashes still verify and are
+# upgraded the next time their owner logs in.
+#
+# Benchmark (logins/sec per core for each cost):
+#   python credentials.py --algorithm scrypt --costs 12 13 14 15 --workers 1 4
+
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# The cost is a log2 work factor: scrypt N = 2**cost, PBKDF2-SHA256 iterations = 2**cost.
+DEFAULT_COSTS = {'scrypt': 14, 'pbkdf2_sha256': 19}
+SCRYPT_R = 8
+SCRYPT_P = 1
+SALT_BYTES = 16
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii").rstrip("=")
+
+def _unb64(text):
+    return base64.b64decode(text + "=" * (-len(text) % 4))
+
+def derive_key(algorithm, password, salt, cost):
+    """Runs the KDF once. Both hashlib KDFs release the GIL, so worker threads hash in parallel."""
+    if algorithm == 'scrypt':
+        n = 2 ** cost
+        return hashlib.scrypt(
+            password.encode("utf-8"), salt=salt, n=n, r=SCRYPT_R, p=SCRYPT_P,
+            maxmem=256 * SCRYPT_R * n, dklen=32,
+        )
+    if algorithm == 'pbkdf2_sha256':
+        return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, 2 ** cost, dklen=32)
+    raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+
+
+class PasswordHasher:
+    """
+    Creates and checks password hashes stored as "<algorithm>$<cost>$<salt>$<hash>".
+
+    Hashing runs on a small thread pool (one worker per core by default), which caps how
+    much CPU a burst of logins can take from booking and search threads.
+
+    A short-lived cache remembers credentials that verified recently: repeated logins with
+    the same password skip the KDF. It holds only an HMAC of the password under a random
+    per-process key, bound to the stored hash so a password change invalidates it.
+    """
+
+    def __init__(self, algorithm='scrypt', cost=None, legacy_salt="", workers=None,
+                 cache_size=1024, cache_ttl=300):
+        if algorithm not in DEFAULT_COSTS:
+            raise ValueError(f"Unknown password hash algorithm: {algorithm}")
+        self.algorithm = algorithm
+        self.cost = cost or DEFAULT_COSTS[algorithm]
+        self.legacy_salt = legacy_salt
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1, thread_name_prefix="kdf")
+        self._cache_key = secrets.token_bytes(32)
+        self._cache = OrderedDict()  # username -> (stored_hash, digest, verified_at), LRU order
+        self._lock = threading.Lock()
+
+    def _run(self, function, *args):
+        return self._executor.submit(function, *args).result()
+
+    def hash(self, password):
+        """Returns a new salted hash of the password with the current algorithm and cost."""
+        salt = os.urandom(SALT_BYTES)
+        key = self._run(derive_key, self.algorithm, password, salt, self.cost)
+        return f"{self.algorithm}${self.cost}${_b64(salt)}${_b64(key)}"
+
+    def legacy_hash(self, password):
+        """The original scheme: one SHA-512 over password + the global SALT (hex, 128 characters)."""
+        return hashlib.sha512((password + self.legacy_salt).encode("utf-8")).hexdigest()
+
+    def needs_rehash(self, stored_hash):
+        """True for legacy hashes and for hashes made with another algorithm or cost."""
+        return not stored_hash.startswith(f"{self.algorithm}${self.cost}$")
+
+    def verify(self, password, stored_hash, username=None):
+        """Checks a password against a stored hash of any supported format."""
+        if username is not None and self._cached(username, password, stored_hash):
+            return True
+
+        if "$" not in stored_hash:
+            ok = hmac.compare_digest(self.legacy_hash(password), stored_hash)
+        else:
+            try:
+                algorithm, cost, salt, expected = stored_hash.split("$")
+                key = self._run(derive_key, algorithm, password, _unb64(salt), int(cost))
+            except ValueError:
+                return False
+            ok = hmac.compare_digest(key, _unb64(expected))
+
+        if ok and username is not None:
+            self._remember(username, password, stored_hash)
+        return ok
+
+    # --- Verified-credential cache ---
+
+    def _digest(self, password, stored_hash):
+        return hmac.new(self._cache_key, f"{stored_hash}\0{password}".encode("utf-8"), hashlib.sha256).digest()
+
+    def _cached(self, username, password, stored_hash):
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry is None:
+                return False
+            cached_hash, digest, verified_at = entry
+            if cached_hash != stored_hash or time.monotonic() - verified_at > self.cache_ttl:
+                del self._cache[username]
+                return False
+            self._cache.move_to_end(username)
+        return hmac.compare_digest(digest, self._digest(password, stored_hash))
+
+    def _remember(self, username, password, stored_hash):
+        entry = (stored_hash, self._digest(password, stored_hash), time.monotonic())
+        with self._lock:
+            self._cache[username] = entry
+            self._cache.move_to_end(username)
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def forget(self, username=None):
+        """Drops one user's cached credential (or all of them)."""
+        with self._lock:
+            if username is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(username, None)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+# --- Benchmark ---
+
+def benchmark(algorithm, costs, workers_list, seconds):
+    """Prints logins/sec (one KDF run per login) for each cost and worker count."""
+    cores = os.cpu_count() or 1
+    print(f"\n--- Password hashing benchmark: {algorithm} ({cores} cores) ---")
+    print("{:<6} {:<8} {:>12} {:>14} {:>16}".format("Cost", "Workers", "ms/login", "logins/sec", "logins/sec/core"))
+    print("-" * 60)
+    for cost in costs:
+        hasher = PasswordHasher(algorithm, cost, workers=1, cache_size=0)
+        stored_hash = hasher.hash("benchmark-password")
+        hasher.close()
+        for workers in workers_list:
+            hasher = PasswordHasher(algorithm, cost, workers=workers, cache_size=0)
+            clients = ThreadPoolExecutor(max_workers=workers)
+            done = 0
+            start = time.perf_counter()
+            deadline = start + seconds
+            while time.perf_counter() < deadline:
+                # Keep every hashing worker busy: one concurrent login per worker.
+                futures = [clients.submit(hasher.verify, "benchmark-password", stored_hash) for _ in range(workers)]
+                done += sum(future.result() for future in futures)
+            elapsed = time.perf_counter() - start
+            clients.shutdown()
+            hasher.close()
+            rate = done / elapsed
+            print("{:<6} {:<8} {:>12.1f} {:>14.1f} {:>16.1f}".format(
+                cost, workers, 1000 * workers / rate, rate, rate / min(workers, cores)
+            ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure login capacity for each password hashing cost.")
+    parser.add_argument("--algorithm", choices=sorted(DEFAULT_COSTS), default="scrypt")
+    parser.add_argument("--costs", type=int, nargs="+", default=None, help="log2 work factors to measure")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--seconds", type=float, default=2.0, help="time spent on each setting")
+    args = parser.parse_args()
+
+    default_cost = DEFAULT_COSTS[args.algorithm]
+    benchmark(args.algorithm, args.costs or [default_cost - 2, default_cost - 1, default_cost, default_cost + 1], args.workers, args.seconds)
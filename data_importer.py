@@ -1,8 +1,13 @@
 # Script to import train data from trains_list.csv into the MySQL TRAINS table.
 
-import mysql.connector
 import csv
+import json
 import os
+import time
+
+from admin_stats import record_stats
+from route_index import record_train_changes
+from storage import DB_ERRORS, create_pool
 
 # --- 1. Database Configuration (Must match railway_system.py) ---
 # !!! IMPORTANT: ENSURE THESE DETAILS ARE CORRECT !!!
@@ -13,115 +18,230 @@ DB_CONFIG = {
     'database': 'railway_db'
 }
 
-def import_train_data(csv_filepath="trains_list.csv", total_seats=500):
+# Storage backend: 'mysql' uses DB_CONFIG above, 'sqlite' uses the embedded database file.
+DB_BACKEND = 'mysql'
+SQLITE_PATH = 'railway_db.sqlite3'
+
+# Number of CSV rows written (and committed) per round trip.
+DEFAULT_CHUNK_SIZE = 1000
+
+# SQL statement for inserting data
+# The ON DUPLICATE KEY UPDATE clause is important. If a train_number
+# already exists (it's the PRIMARY KEY), it updates the record instead of failing.
+# available_seats is only shifted by the change in capacity, so re-imports keep existing
+# bookings; it is listed first because MySQL applies the assignments left to right.
+INSERT_QUERY = """
+INSERT INTO TRAINS
+    (train_number, train_name, source, destination, total_seats, available_seats)
+VALUES
+    (%s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    available_seats = available_seats + (VALUES(total_seats) - total_seats),
+    train_name = VALUES(train_name),
+    source = VALUES(source),
+    destination = VALUES(destination),
+    total_seats = VALUES(total_seats)
+"""
+
+def read_train_chunks(csv_filepath, chunk_size, skip_rows=0):
+    """
+    Lazily reads the CSV file and yields (rows_read, trains) for every chunk of rows,
+    where trains maps train_number -> (train_name, source, destination).
+
+    Args:
+        csv_filepath (str): The path to the CSV file.
+        chunk_size (int): Number of CSV rows per chunk.
+        skip_rows (int): Rows already imported by an earlier run (resume point).
+    """
+    with open(csv_filepath, mode='r', encoding='utf-8') as file:
+        # Assuming your CSV has a header row:
+        reader = csv.DictReader(file)
+
+        rows_read = 0
+        trains = {}
+        for row in reader:
+            rows_read += 1
+            if rows_read <= skip_rows:
+                continue
+
+            # Based on the snippet, mapping is:
+            # CSV 'Train no.' -> DB train_number
+            # CSV 'Train name' -> DB train_name
+            # CSV 'Starts' -> DB source
+            # CSV 'Ends' -> DB destination
+
+            # Sanitize and prepare data
+            try:
+                train_number = str(row['Train no.']).strip()
+                trains[train_number] = (row['Train name'].strip(), row['Starts'].strip(), row['Ends'].strip())
+            except KeyError as e:
+                print(f"\n[ERROR] Missing expected column in CSV: {e}. Row skipped: {row}")
+
+            if rows_read % chunk_size == 0:
+                yield rows_read, trains
+                trains = {}
+
+        if trains or rows_read % chunk_size:
+            yield rows_read, trains
+
+def _checkpoint_path(csv_filepath):
+    return csv_filepath + ".checkpoint"
+
+def _file_signature(csv_filepath):
+    """Identifies the CSV contents, so a checkpoint is never applied to a different file."""
+    stat = os.stat(csv_filepath)
+    return {'size': stat.st_size, 'mtime': int(stat.st_mtime)}
+
+def load_checkpoint(csv_filepath):
+    """Returns the number of CSV rows committed by an interrupted import, or 0."""
+    try:
+        with open(_checkpoint_path(csv_filepath), mode='r', encoding='utf-8') as file:
+            checkpoint = json.load(file)
+    except (FileNotFoundError, ValueError):
+        return 0
+    if checkpoint.get('signature') != _file_signature(csv_filepath):
+        return 0
+    return checkpoint.get('rows_committed', 0)
+
+def save_checkpoint(csv_filepath, rows_committed):
+    """Records the last committed chunk; written only after the chunk's COMMIT succeeds."""
+    checkpoint = {'signature': _file_signature(csv_filepath), 'rows_committed': rows_committed}
+    temp_path = _checkpoint_path(csv_filepath) + ".tmp"
+    with open(temp_path, mode='w', encoding='utf-8') as file:
+        json.dump(checkpoint, file)
+    os.replace(temp_path, _checkpoint_path(csv_filepath))
+
+def clear_checkpoint(csv_filepath):
+    try:
+        os.remove(_checkpoint_path(csv_filepath))
+    except FileNotFoundError:
+        pass
+
+def _fetch_existing(cursor, train_numbers):
+    """Returns {train_number: (train_name, source, destination, total_seats)} for trains already stored."""
+    placeholders = ", ".join(["%s"] * len(train_numbers))
+    cursor.execute(
+        f"SELECT train_number, train_name, source, destination, total_seats FROM TRAINS WHERE train_number IN ({placeholders})",
+        tuple(train_numbers),
+    )
+    return {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+def import_chunk(conn, cursor, trains, total_seats):
+    """
+    Writes one chunk with a single executemany upsert and commits it.
+    Rows whose content is already stored are skipped entirely.
+    Returns (inserted, updated, unchanged).
     """
-    Reads train data from a CSV file and inserts it into the TRAINS table.
+    existing = _fetch_existing(cursor, list(trains))
+
+    changed_rows = []
+    inserted = updated = unchanged = 0
+    for train_number, (train_name, source, destination) in trains.items():
+        stored = existing.get(train_number)
+        if stored == (train_name, source, destination, total_seats):
+            unchanged += 1
+            continue
+        if stored is None:
+            inserted += 1
+        else:
+            updated += 1
+        # available_seats is set equal to total_seats for new trains
+        changed_rows.append((train_number, train_name, source, destination, total_seats, total_seats))
+
+    if changed_rows:
+        cursor.executemany(INSERT_QUERY, changed_rows)
+        # Lets running reservation systems refresh their route index incrementally.
+        record_train_changes(cursor, [row[0] for row in changed_rows])
+        # Seat figures are per journey; a new capacity only applies to journeys created later.
+        record_stats(cursor, total_trains=inserted)
+    conn.commit()
+    return inserted, updated, unchanged
+
+def import_train_data(csv_filepath="trains_list.csv", total_seats=500, chunk_size=DEFAULT_CHUNK_SIZE, resume=True):
+    """
+    Streams train data from a CSV file into the TRAINS table, one committed chunk at a time.
 
     Args:
         csv_filepath (str): The path to the CSV file.
         total_seats (int): The default total capacity to assign to each train.
+        chunk_size (int): Number of CSV rows written and committed per round trip.
+        resume (bool): Continue after the last committed chunk of an interrupted import.
     """
     try:
         # Establish database connection
-        db_connection = mysql.connector.connect(**DB_CONFIG)
-        cursor = db_connection.cursor()
+        pool = create_pool(DB_BACKEND, mysql_config=DB_CONFIG, sqlite_path=SQLITE_PATH, size=1)
+        conn = pool.acquire()
+        cursor = conn.cursor()
         print("--- Database connection successful. ---")
-    except mysql.connector.Error as err:
-        print(f"Error connecting to MySQL: {err}")
+    except (RuntimeError, ValueError) + DB_ERRORS as err:
+        print(f"Error connecting to the database: {err}")
         print("Please check DB_CONFIG in this file and ensure your MySQL server is running.")
         return
 
-    # SQL statement for inserting data
-    insert_query = """
-    INSERT INTO TRAINS 
-        (train_number, train_name, source, destination, total_seats, available_seats)
-    VALUES 
-        (%s, %s, %s, %s, %s, %s)
-    ON DUPLICATE KEY UPDATE 
-        train_name = VALUES(train_name),
-        source = VALUES(source),
-        destination = VALUES(destination),
-        total_seats = VALUES(total_seats),
-        available_seats = VALUES(available_seats);
-    """
-    # The ON DUPLICATE KEY UPDATE clause is important. If a train_number 
-    # already exists (it's the PRIMARY KEY), it updates the record instead of failing.
-    
-    records_processed = 0
+    rows_committed = 0
     records_inserted = 0
-    
+    records_updated = 0
+    records_unchanged = 0
+    start_time = time.monotonic()
+
     try:
-        with open(csv_filepath, mode='r', encoding='utf-8') as file:
-            # Use csv.reader for files without column names or csv.DictReader if the first row is a header.
-            # Assuming your CSV has a header row:
-            reader = csv.DictReader(file) 
-            
-            print(f"Reading data from '{csv_filepath}'...")
-            
-            for row in reader:
-                records_processed += 1
-                
-                # Based on the snippet, mapping is:
-                # CSV 'Train no.' -> DB train_number
-                # CSV 'Train name' -> DB train_name
-                # CSV 'Starts' -> DB source
-                # CSV 'Ends' -> DB destination
-                
-                # Sanitize and prepare data
-                try:
-                    train_number = str(row['Train no.']).strip()
-                    train_name = row['Train name'].strip()
-                    source = row['Starts'].strip()
-                    destination = row['Ends'].strip()
-                except KeyError as e:
-                    print(f"\n[ERROR] Missing expected column in CSV: {e}. Row skipped: {row}")
-                    continue
-
-                # Data for the SQL query
-                # available_seats is set equal to total_seats initially
-                train_data = (
-                    train_number,
-                    train_name,
-                    source,
-                    destination,
-                    total_seats,
-                    total_seats 
-                )
-                
-                # Execute the insertion
-                cursor.execute(insert_query, train_data)
-                records_inserted += 1
-        
-        # Commit the transaction after all rows are successfully processed
-        db_connection.commit()
-        
+        if not os.path.exists(csv_filepath):
+            raise FileNotFoundError(csv_filepath)
+
+        skip_rows = load_checkpoint(csv_filepath) if resume else 0
+        rows_committed = skip_rows
+        if skip_rows:
+            print(f"Resuming import after row {skip_rows} (last committed chunk).")
+
+        print(f"Reading data from '{csv_filepath}' in chunks of {chunk_size} rows...")
+
+        for rows_read, trains in read_train_chunks(csv_filepath, chunk_size, skip_rows):
+            if trains:
+                inserted, updated, unchanged = import_chunk(conn, cursor, trains, total_seats)
+                records_inserted += inserted
+                records_updated += updated
+                records_unchanged += unchanged
+            rows_committed = rows_read
+            save_checkpoint(csv_filepath, rows_committed)
+
+            elapsed = time.monotonic() - start_time
+            rate = (rows_committed - skip_rows) / elapsed if elapsed > 0 else 0.0
+            print(f"  ... {rows_committed} rows committed ({rate:,.0f} rows/sec)")
+
+        clear_checkpoint(csv_filepath)
+
+        elapsed = time.monotonic() - start_time
         print("\n==============================================")
         print("DATA IMPORT COMPLETE")
         print("==============================================")
-        print(f"Total rows read from CSV: {records_processed}")
-        print(f"Total trains added/updated in database: {records_inserted}")
+        print(f"Total rows read from CSV: {rows_committed}")
+        print(f"New trains added: {records_inserted}")
+        print(f"Existing trains updated: {records_updated}")
+        print(f"Unchanged trains skipped: {records_unchanged}")
         print(f"Default seats per train: {total_seats}")
-        
+        print(f"Elapsed time: {elapsed:.2f}s")
+
     except FileNotFoundError:
         print(f"\n[ERROR] CSV file not found at path: {csv_filepath}")
-    except mysql.connector.Error as err:
+    except DB_ERRORS as err:
         print(f"\n[ERROR] Database Transaction Failed: {err}")
-        db_connection.rollback()
+        print(f"Rows up to {rows_committed} are committed; run the import again to resume.")
+        conn.rollback()
     except Exception as e:
         print(f"\n[ERROR] An unexpected error occurred: {e}")
-        
+
     finally:
         # Close connection
-        if db_connection and db_connection.is_connected():
-            cursor.close()
-            db_connection.close()
-            print("--- Database connection closed. ---")
+        cursor.close()
+        pool.release(conn)
+        pool.close()
+        print("--- Database connection closed. ---")
 
 # --- Execution Block ---
 if __name__ == "__main__":
     # You can change the default_seats value here if you need more or less capacity.
-    default_seats = 500 
-    
+    default_seats = 500
+
     print("Starting data import...")
     # NOTE: The CSV file MUST be in the same directory as this script.
-    import_train_data(csv_filepath="trains_list.csv", total_seats=default_seats)
\ No newline at end of file
+    import_train_data(csv_filepath="trains_list.csv", total_seats=default_seats)
@@ -0,0 +1,366 @@
+# HTTP/JSON front-end for the Railway Reservation System.
+# Serves many users at once: each request carries its session as a bearer token
+# (the token returned by POST /login, see sessions.py).
+#
+# Usage: python http_api.py [--backend sqlite] [--host 127.0.0.1] [--port 8080]
+#
+#   POST   /register          {"username": ..., "password": ...}
+#   POST   /login             {"username": ..., "password": ...}  -> {"token": ...}
+#   POST   /logout
+#   GET    /trains?source=..&destination=..[&date=YYYY-MM-DD]
+#   GET    /connections?source=..&destination=..[&date=YYYY-MM-DD]
+#   POST   /bookings          {"train_number": ..., "journey_date": "YYYY-MM-DD", "passengers": [{"name": ..., "age": ...}]}
+#   GET    /bookings[?limit=20&after=..]   -> {"bookings": [...], "next": ...} (your bookings, newest first)
+#   GET    /bookings/<pnr>
+#   DELETE /bookings/<pnr>
+#   POST   /waitlist          (same body as POST /bookings, for a full train)
+#   GET    /waitlist/<pnr>    -> {"position": ..., "waiting": ...}
+#   GET    /admin/stats
+#   GET    /admin/metrics     query timings per operation (see metrics.py)
+#   GET    /admin/analytics[?top=10]   occupancy, busiest routes/stations, booking rates (see analytics.py)
+
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qs, urlsplit
+
+import main
+from main import RailwayReservationSystem, ReservationError
+from storage import DB_ERRORS
+
+MAX_BODY_SIZE = 64 * 1024
+
+# ReservationError.code -> HTTP status
+ERROR_STATUS = {
+    'invalid': 400,
+    'forbidden': 403,
+    'not_found': 404,
+    'conflict': 409,
+    'unavailable': 409,
+}
+
+REASONS = {
+    200: 'OK', 201: 'Created', 400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden',
+    404: 'Not Found', 405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, **extra):
+        super().__init__(message)
+        self.status = status
+        self.extra = extra
+
+
+class ReservationAPI:
+    """
+    Maps HTTP requests onto RailwayReservationSystem.
+
+    The event loop only parses requests and writes responses; every database call runs
+    on a thread pool sized to the connection pool, so a slow query never blocks other clients.
+    """
+
+    def __init__(self, system, workers=None):
+        self.system = system
+        self.executor = ThreadPoolExecutor(max_workers=workers or system.pool.size, thread_name_prefix="api")
+
+    def _session(self, headers, admin=False):
+        """
+        Returns the Session behind the request's bearer token, or raises 401/403.
+        Runs on the thread pool: with a shared session backend the check may query the database.
+        """
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        session = self.system.sessions.get(token) if scheme.lower() == 'bearer' else None
+        if session is None:
+            raise HTTPError(401, "Login required.")
+        if admin and session.username.lower() != main.ADMIN_USERNAME.lower():
+            raise HTTPError(403, "Admin access required.")
+        return session
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    # --- Request handling ---
+
+    async def handle(self, method, path, query, headers, body):
+        """Returns (status, payload) for one request."""
+        try:
+            parts = [part for part in path.split('/') if part]
+            if parts == ['register'] and method == 'POST':
+                return await self.register(_json_body(body))
+            if parts == ['login'] and method == 'POST':
+                return await self.login(_json_body(body))
+            if parts == ['logout'] and method == 'POST':
+                return await self._run(self.logout, headers)
+            if parts == ['trains'] and method == 'GET':
+                return await self.trains(query)
+            if parts == ['connections'] and method == 'GET':
+                return await self.connections(query)
+            if parts == ['bookings'] and method == 'POST':
+                return await self.book(await self._run(self._session, headers), _json_body(body))
+            if parts == ['bookings'] and method == 'GET':
+                return await self.my_bookings(await self._run(self._session, headers), query)
+            if len(parts) == 2 and parts[0] == 'bookings' and method == 'GET':
+                return await self.view(await self._run(self._session, headers), parts[1])
+            if len(parts) == 2 and parts[0] == 'bookings' and method == 'DELETE':
+                return await self.cancel(await self._run(self._session, headers), parts[1])
+            if parts == ['waitlist'] and method == 'POST':
+                return await self.join_waitlist(await self._run(self._session, headers), _json_body(body))
+            if len(parts) == 2 and parts[0] == 'waitlist' and method == 'GET':
+                return await self.waitlist_position(await self._run(self._session, headers), parts[1])
+            if parts == ['admin', 'stats'] and method == 'GET':
+                await self._run(self._session, headers, True)
+                return await self.stats()
+            if parts == ['admin', 'metrics'] and method == 'GET':
+                await self._run(self._session, headers, True)
+                return 200, self.system.metrics.snapshot()
+            if parts == ['admin', 'analytics'] and method == 'GET':
+                return await self.analytics(await self._run(self._session, headers, True), query)
+            raise HTTPError(404, f"No route for {method} {path}.")
+
+        except HTTPError as err:
+            return err.status, {'error': str(err), **err.extra}
+        except ReservationError as err:
+            return ERROR_STATUS.get(err.code, 400), {'error': str(err)}
+        except DB_ERRORS as err:
+            return 503, {'error': f"Database Error: {err}"}
+
+    async def register(self, data):
+        username, password = _field(data, 'username'), _field(data, 'password')
+        await self._run(self.system.create_user, username, password)
+        return 201, {'username': username}
+
+    async def login(self, data):
+        username, password = _field(data, 'username'), _field(data, 'password')
+        if not await self._run(self.system.check_credentials, username, password):
+            raise HTTPError(401, "Invalid username or password.")
+        session = await self._run(self.system.sessions.create, username)
+        return 200, {'username': username, 'token': session.token, 'expires_at': session.expires_at}
+
+    def logout(self, headers):
+        self.system.logout_user(self._session(headers))
+        return 200, {'logged_out': True}
+
+    async def _stations(self, query):
+        """Resolves ?source=&destination= to stored station names, or raises 404 with suggestions."""
+        stations = []
+        for field in ('source', 'destination'):
+            text = query.get(field, [''])[0].strip()
+            if not text:
+                raise HTTPError(400, f"Missing query parameter '{field}'.")
+            match, suggestions = await self._run(self.system.resolve_station, text)
+            if match is None:
+                raise HTTPError(404, f"Unknown station '{text}'.", suggestions=suggestions)
+            stations.append(match)
+        return stations
+
+    async def trains(self, query):
+        source, destination = await self._stations(query)
+        journey_date = query.get('date', [date.today().isoformat()])[0]
+        rows = await self._run(self.system.find_trains, source, destination, journey_date)
+        columns = ('train_number', 'train_name', 'source', 'destination', 'available_seats')
+        return 200, {
+            'source': source,
+            'destination': destination,
+            'journey_date': journey_date,
+            'trains': [dict(zip(columns, row)) for row in rows],
+        }
+
+    async def connections(self, query):
+        source, destination = await self._stations(query)
+        journey_date = query.get('date', [date.today().isoformat()])[0]
+        connections = await self._run(self.system.find_connections, source, destination, journey_date)
+        return 200, {
+            'source': source,
+            'destination': destination,
+            'journey_date': journey_date,
+            'connections': [
+                {
+                    'stations': stations,
+                    'legs': [[{'train_number': number, 'available_seats': seats} for number, seats in leg] for leg in legs],
+                }
+                for stations, legs in connections
+            ],
+        }
+
+    async def book(self, session, data):
+        train_number, journey_date, passengers = _booking_fields(data)
+        booked = await self._run(self.system.reserve_seats, session, train_number, journey_date, passengers)
+        return 201, {
+            'train_number': train_number,
+            'journey_date': journey_date,
+            'booked_by': session.username,
+            'tickets': [
+                {'pnr_number': pnr, 'passenger_name': name, 'age': age, 'seat_number': seat}
+                for pnr, name, age, seat in booked
+            ],
+        }
+
+    async def join_waitlist(self, session, data):
+        train_number, journey_date, passengers = _booking_fields(data)
+        waitlisted = await self._run(self.system.join_waitlist, session, train_number, journey_date, passengers)
+        return 201, {
+            'train_number': train_number,
+            'journey_date': journey_date,
+            'booked_by': session.username,
+            'waitlisted': [
+                {'pnr_number': pnr, 'passenger_name': name, 'age': age, 'position': position}
+                for pnr, name, age, position in waitlisted
+            ],
+        }
+
+    async def waitlist_position(self, session, pnr_number):
+        waiting = await self._run(self.system.get_waitlist_position, session, pnr_number)
+        if waiting is None:
+            raise HTTPError(404, f"PNR {pnr_number} is not on a waitlist.")
+        return 200, waiting
+
+    async def view(self, session, pnr_number):
+        booking = await self._run(self.system.get_booking, session, pnr_number)
+        if booking is None:
+            raise HTTPError(404, f"Booking not found for PNR Number: {pnr_number}")
+        return 200, booking
+
+    async def my_bookings(self, session, query):
+        try:
+            limit = int(query.get('limit', [main.BOOKINGS_PAGE_SIZE])[0])
+        except ValueError:
+            raise HTTPError(400, "'limit' must be a number.")
+        after = query.get('after', [None])[0]
+        bookings, next_page = await self._run(self.system.list_bookings, session, limit, after)
+        # Pass "next" back as ?after= for the following page; null on the last page.
+        return 200, {'bookings': bookings, 'next': next_page}
+
+    async def cancel(self, session, pnr_number):
+        train_number, seat_number = await self._run(self.system.cancel_reservation, session, pnr_number)
+        return 200, {'pnr_number': pnr_number, 'train_number': train_number, 'seat_number': seat_number}
+
+    async def stats(self):
+        stats = await self._run(self.system.get_admin_stats)
+        if stats is None:
+            raise HTTPError(503, "Could not fetch admin statistics.")
+        return 200, stats
+
+    async def analytics(self, session, query):
+        try:
+            top = int(query.get('top', [main.ANALYTICS_TOP_N])[0])
+        except ValueError:
+            raise HTTPError(400, "'top' must be a number.")
+        return 200, await self._run(self.system.get_analytics, session, top)
+
+    # --- HTTP/1.1 connection handling ---
+
+    async def serve_connection(self, reader, writer):
+        """Reads requests off one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode('latin-1').split(' ', 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY_SIZE:
+                    status, payload = 413, {'error': "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    url = urlsplit(target)
+                    try:
+                        status, payload = await self.handle(method.upper(), url.path, parse_qs(url.query), headers, body)
+                    except Exception as e:
+                        status, payload = 500, {'error': f"An unexpected error occurred: {e}"}
+                    keep_alive = headers.get('connection', '').lower() != 'close' and version.strip() == 'HTTP/1.1'
+
+                data = json.dumps(payload, default=str).encode()
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # malformed request or client went away
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+
+def _json_body(body):
+    try:
+        data = json.loads(body or b'{}')
+    except ValueError:
+        raise HTTPError(400, "Request body must be JSON.")
+    if not isinstance(data, dict):
+        raise HTTPError(400, "Request body must be a JSON object.")
+    return data
+
+def _field(data, name):
+    value = data.get(name)
+    if value in (None, ''):
+        raise HTTPError(400, f"Missing field '{name}'.")
+    return value
+
+def _booking_fields(data):
+    """Returns (train_number, journey_date, [(name, age), ...]) from a booking request body."""
+    train_number = str(_field(data, 'train_number'))
+    journey_date = str(_field(data, 'journey_date'))
+    passengers = data.get('passengers')
+    if not isinstance(passengers, list):
+        raise HTTPError(400, "'passengers' must be a list of {\"name\": ..., \"age\": ...}.")
+    try:
+        passengers = [(str(p['name']).strip(), int(p['age'])) for p in passengers]
+    except (TypeError, KeyError, ValueError):
+        raise HTTPError(400, "Every passenger needs a name and a numeric age.")
+    if any(not name or age <= 0 for name, age in passengers):
+        raise HTTPError(400, "Every passenger needs a name and a positive age.")
+    return train_number, journey_date, passengers
+
+
+async def serve(api, host, port):
+    server = await asyncio.start_server(api.serve_connection, host, port)
+    print(f"--- Railway Reservation API listening on http://{host}:{port} ---")
+    async with server:
+        await server.serve_forever()
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="HTTP/JSON API for the Railway Reservation System.")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default=main.DB_BACKEND)
+    parser.add_argument("--sqlite-path", default=main.SQLITE_PATH)
+    parser.add_argument("--pool-size", type=int, default=main.POOL_SIZE)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    args = parser.parse_args()
+
+    system = RailwayReservationSystem(backend=args.backend, pool_size=args.pool_size, sqlite_path=args.sqlite_path)
+    if not system.connect():
+        return
+    api = ReservationAPI(system)
+    try:
+        asyncio.run(serve(api, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        api.close()
+        system.disconnect()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,138 @@
+# Connection search for the Railway Reservation System.
+# Finds one-change and two-change itineraries when no direct train runs between two stations.
+
+import threading
+from array import array
+from collections import OrderedDict
+
+
+class JourneyPlanner:
+    """
+    Station graph built from TRAINS, where every train is an edge source -> destination.
+
+    Station names are interned to ints and the edges are stored as array-backed
+    adjacency lists (CSR layout: edges of station i live in offsets[i]..offsets[i+1]).
+    The graph is rebuilt, and the result cache cleared, whenever the route index
+    reports that TRAINS has changed.
+    """
+
+    def __init__(self, route_index, cache_size=1024, max_results=5):
+        self.route_index = route_index
+        self.cache_size = cache_size
+        self.max_results = max_results
+        self._version = None
+        self._cache = OrderedDict()  # (source, destination) -> itineraries, in LRU order
+        self._lock = threading.Lock()
+
+    def _build(self, train_routes):
+        """Interns stations and builds the outgoing and incoming adjacency arrays."""
+        self._station_ids = {}
+        self._station_names = []
+        self._train_numbers = sorted(train_routes)
+        edges = []
+        for train_id, train_number in enumerate(self._train_numbers):
+            source, destination = train_routes[train_number]
+            source_id = self._intern(source)
+            destination_id = self._intern(destination)
+            if source_id != destination_id:
+                edges.append((source_id, destination_id, train_id))
+
+        station_count = len(self._station_ids)
+        self._out = self._pack(edges, station_count, key=0, other=1)
+        self._in = self._pack(edges, station_count, key=1, other=0)
+
+    def _intern(self, station):
+        station_id = self._station_ids.get(station)
+        if station_id is None:
+            station_id = self._station_ids[station] = len(self._station_names)
+            self._station_names.append(station)
+        return station_id
+
+    @staticmethod
+    def _pack(edges, station_count, key, other):
+        """Returns (offsets, stations, trains) arrays for edges grouped by edge[key]."""
+        edges = sorted(edges, key=lambda edge: edge[key])
+        offsets = array('i', [0] * (station_count + 1))
+        for edge in edges:
+            offsets[edge[key] + 1] += 1
+        for i in range(station_count):
+            offsets[i + 1] += offsets[i]
+        stations = array('i', (edge[other] for edge in edges))
+        trains = array('i', (edge[2] for edge in edges))
+        return offsets, stations, trains
+
+    @staticmethod
+    def _neighbours(adjacency, station_id):
+        """Returns {neighbour station id: [train ids]} for one station."""
+        offsets, stations, trains = adjacency
+        neighbours = {}
+        for i in range(offsets[station_id], offsets[station_id + 1]):
+            neighbours.setdefault(stations[i], []).append(trains[i])
+        return neighbours
+
+    def _ensure_current(self):
+        self.route_index.refresh()
+        if self.route_index.version != self._version:
+            train_routes, version = self.route_index.train_routes()
+            self._build(train_routes)
+            self._cache.clear()
+            self._version = version
+
+    def find_connections(self, source, destination):
+        """
+        Returns up to max_results itineraries as (stations, legs), where stations is the
+        list of stations visited and legs[i] lists the train numbers between stations[i]
+        and stations[i + 1]. One-change itineraries come before two-change ones.
+        """
+        with self._lock:
+            self._ensure_current()
+
+            key = (source, destination)
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+            itineraries = self._search(source, destination)
+
+            self._cache[key] = itineraries
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return itineraries
+
+    def _search(self, source, destination):
+        source_id = self._station_ids.get(source)
+        destination_id = self._station_ids.get(destination)
+        if source_id is None or destination_id is None or source_id == destination_id:
+            return []
+
+        names = self._station_names
+        numbers = self._train_numbers
+        first_legs = self._neighbours(self._out, source_id)
+        last_legs = self._neighbours(self._in, destination_id)  # station -> trains into destination
+        results = []
+
+        # One change: source -> X -> destination
+        for via, trains_in in first_legs.items():
+            if via != destination_id and via in last_legs:
+                results.append((
+                    [source, names[via], destination],
+                    [[numbers[t] for t in trains_in], [numbers[t] for t in last_legs[via]]],
+                ))
+                if len(results) >= self.max_results:
+                    return results
+
+        # Two changes: source -> X -> Y -> destination
+        for via_1, trains_1 in first_legs.items():
+            if via_1 == destination_id:
+                continue
+            for via_2, trains_2 in self._neighbours(self._out, via_1).items():
+                if via_2 in (source_id, destination_id) or via_2 not in last_legs:
+                    continue
+                results.append((
+                    [source, names[via_1], names[via_2], destination],
+                    [[numbers[t] for t in trains_1], [numbers[t] for t in trains_2], [numbers[t] for t in last_legs[via_2]]],
+                ))
+                if len(results) >= self.max_results:
+                    return results
+
+        return results
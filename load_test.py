@@ -0,0 +1,440 @@
+# Concurrent load test and benchmark for the Railway Reservation System.
+# Drives search_trains, book_ticket, cancel_ticket and view_booking from many threads
+# (and optionally processes) against a local database, then checks the data for
+# oversold trains and double-booked seats and saves the results as JSON.
+#
+# Example:
+#   python load_test.py --workload hot-train --threads 16 --ops 200 --output run.json
+#   python load_test.py --workload hot-train --threads 16 --ops 200 --compare run.json
+#
+# Seat inventory slots (see seat_inventory.py): every thread books the same train.
+#   python load_test.py --backend mysql --workload contention --threads 64 --slots 1 --output slots1.json
+#   python load_test.py --backend mysql --workload contention --threads 64 --slots 8 --compare slots1.json
+# (SQLite serializes all writers on one database lock, so slots only pay off on MySQL.)
+#
+# Read replicas (see replicas.py): two local MySQL servers, the one on port 3307 replicating main.DB_CONFIG.
+#   python load_test.py --backend mysql --workload search-heavy --threads 32 --output primary_only.json
+#   python load_test.py --backend mysql --workload search-heavy --threads 32 --replica 127.0.0.1:3307 --compare primary_only.json
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import main
+import storage
+from admin_stats import compute_stats, read_stats, reconcile_stats
+from data_importer import import_chunk, read_train_chunks
+from seat_inventory import SeatMap
+
+# --- 1. Workloads ---
+# Operation mix (weights) and the share of bookings aimed at the single "hot" train.
+WORKLOADS = {
+    'hot-train':    {'mix': {'search': 20, 'book': 60, 'cancel': 10, 'view': 10}, 'hot_fraction': 0.8},
+    'search-heavy': {'mix': {'search': 80, 'book': 10, 'cancel': 2, 'view': 8}, 'hot_fraction': 0.1},
+    'churn':        {'mix': {'search': 10, 'book': 45, 'cancel': 40, 'view': 5}, 'hot_fraction': 0.3},
+    'contention':   {'mix': {'book': 90, 'cancel': 10}, 'hot_fraction': 1.0},
+}
+
+BENCH_USER = "loadtest"
+BENCH_PASSWORD = "loadtest"
+
+
+class Recorder:
+    """Thread-safe collection of latencies (seconds) per operation plus lock/pool wait totals."""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.lock_wait = 0.0
+        self.pool_wait = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, op, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(op, []).append(seconds)
+            if not ok:
+                self.errors[op] = self.errors.get(op, 0) + 1
+
+    def add_wait(self, kind, seconds):
+        with self._lock:
+            setattr(self, kind, getattr(self, kind) + seconds)
+
+    def merge(self, raw):
+        for op, values in raw['latencies'].items():
+            self.latencies.setdefault(op, []).extend(values)
+        for op, count in raw['errors'].items():
+            self.errors[op] = self.errors.get(op, 0) + count
+        self.lock_wait += raw['lock_wait']
+        self.pool_wait += raw['pool_wait']
+
+    def raw(self):
+        return {'latencies': self.latencies, 'errors': self.errors, 'lock_wait': self.lock_wait, 'pool_wait': self.pool_wait}
+
+
+def _timed(func, recorder, kind):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            recorder.add_wait(kind, time.perf_counter() - start)
+    return wrapper
+
+class _LockTimedCursor:
+    """Cursor whose row-locking statements (SELECT ... FOR UPDATE) add to the recorder's lock wait."""
+
+    def __init__(self, cursor, recorder):
+        self._cursor = cursor
+        self._recorder = recorder
+
+    def execute(self, query, params=()):
+        if "FOR UPDATE" not in query:
+            return self._cursor.execute(query, params)
+        return _timed(self._cursor.execute, self._recorder, 'lock_wait')(query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class _LockTimedConnection:
+    """
+    A checked-out connection that times where its backend waits for the journey lock:
+    SELECT ... FOR UPDATE on MySQL, the database write lock taken by BEGIN IMMEDIATE
+    (start_transaction) on SQLite.
+    """
+
+    def __init__(self, conn, recorder, backend):
+        self._conn = conn
+        self._recorder = recorder
+        self._backend = backend
+
+    def cursor(self, *args, **kwargs):
+        cursor = self._conn.cursor(*args, **kwargs)
+        return _LockTimedCursor(cursor, self._recorder) if self._backend == 'mysql' else cursor
+
+    def start_transaction(self):
+        if self._backend == 'sqlite':
+            return _timed(self._conn.start_transaction, self._recorder, 'lock_wait')()
+        return self._conn.start_transaction()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+@contextmanager
+def instrument(system, recorder):
+    """
+    Measures time spent waiting for pooled connections and for the journey lock while the
+    block runs. Only this system's pool is wrapped (instance attributes, removed on exit),
+    so other pools in the process and later runs are not affected.
+    """
+    pool = system.pool
+    pool_connection = pool.connection
+
+    @contextmanager
+    def connection():
+        with pool_connection() as conn:
+            yield _LockTimedConnection(conn, recorder, pool.backend)
+
+    pool.acquire = _timed(pool.acquire, recorder, 'pool_wait')
+    pool.connection = connection
+    try:
+        yield
+    finally:
+        del pool.acquire, pool.connection
+
+
+# --- 2. Setup ---
+
+def prepare_database(args):
+    """Loads the trains and the benchmark user. Returns the list of (train_number, source, destination)."""
+    pool = storage.create_pool(args.backend, mysql_config=main.DB_CONFIG, sqlite_path=args.sqlite_path, size=1)
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            if args.trains_csv:
+                for _, trains in read_train_chunks(args.trains_csv, 1000):
+                    if trains:
+                        import_chunk(conn, cursor, trains, args.seats)
+            if args.backend == 'sqlite':
+                # Fresh benchmark database: give every train the configured capacity.
+                cursor.execute("UPDATE TRAINS SET total_seats = %s, available_seats = %s", (args.seats, args.seats))
+                conn.commit()
+            cursor.execute("SELECT train_number, source, destination FROM TRAINS ORDER BY train_number")
+            trains = cursor.fetchall()
+            cursor.close()
+        # The capacity change above bypasses the dashboard counters; start from exact values.
+        reconcile_stats(pool)
+    finally:
+        pool.close()
+
+    system = main.RailwayReservationSystem(backend=args.backend, pool_size=1, sqlite_path=args.sqlite_path)
+    with _quiet():
+        system.connect()
+        system.register_user(BENCH_USER, BENCH_PASSWORD)
+        system.disconnect()
+    return trains
+
+class _quiet:
+    """Silences the reservation system's console output while the benchmark runs."""
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = open(os.devnull, mode='w')
+
+    def __exit__(self, *exc):
+        sys.stdout.close()
+        sys.stdout = self._stdout
+
+
+# --- 3. Workers ---
+
+def run_worker(system, session, recorder, trains, workload, ops, seed, days):
+    rng = random.Random(seed)
+    mix = WORKLOADS[workload]['mix']
+    hot_fraction = WORKLOADS[workload]['hot_fraction']
+    ops_names = list(mix)
+    weights = [mix[name] for name in ops_names]
+    hot_train = trains[0]
+    my_pnrs = []
+
+    def pick_train():
+        return hot_train if rng.random() < hot_fraction else rng.choice(trains)
+
+    def pick_date():
+        return (date.today() + timedelta(days=rng.randrange(days))).isoformat()
+
+    for _ in range(ops):
+        op = rng.choices(ops_names, weights)[0]
+        if op in ('cancel', 'view') and not my_pnrs:
+            op = 'book'
+
+        start = time.perf_counter()
+        if op == 'search':
+            _, source, destination = pick_train()
+            ok = system.search_trains(source, destination, pick_date())
+        elif op == 'book':
+            pnr = system.book_ticket(session, pick_train()[0], pick_date(), "Load Test", rng.randint(1, 90))
+            ok = pnr is not None
+            if ok:
+                my_pnrs.append(pnr)
+        elif op == 'cancel':
+            ok = system.cancel_ticket(session, my_pnrs.pop(rng.randrange(len(my_pnrs))))
+        else:
+            ok = system.view_booking(session, rng.choice(my_pnrs))
+        recorder.add(op, time.perf_counter() - start, ok)
+
+def replica_configs(args):
+    """main.READ_REPLICAS entries for the --replica options: {'host', 'port'} on MySQL, file paths on SQLite."""
+    if args.backend == 'sqlite':
+        return list(args.replica)
+    configs = []
+    for address in args.replica:
+        host, _, port = address.rpartition(':')
+        configs.append({'host': host, 'port': int(port)} if host else {'host': address})
+    return configs
+
+def run_process(args, trains, process_id):
+    """Runs args.threads worker threads sharing one RailwayReservationSystem (and pool)."""
+    recorder = Recorder()
+    main.INVENTORY_SLOTS = args.slots
+    system = main.RailwayReservationSystem(
+        backend=args.backend, pool_size=args.pool_size, sqlite_path=args.sqlite_path, read_replicas=replica_configs(args),
+    )
+    with _quiet():
+        if not system.connect():
+            raise SystemExit("Could not connect to the benchmark database.")
+        session = system.login_user(BENCH_USER, BENCH_PASSWORD)
+
+        threads = [
+            threading.Thread(target=run_worker, args=(system, session, recorder, trains, args.workload, args.ops, args.seed + process_id * 1000 + i, args.days))
+            for i in range(args.threads)
+        ]
+        with instrument(system, recorder):
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        system.disconnect()
+    return recorder.raw()
+
+def _process_entry(packed):
+    args, trains, process_id = packed
+    return run_process(args, trains, process_id)
+
+
+# --- 4. Consistency Checks & Report ---
+
+def check_violations(args):
+    """Counts oversold trains, seat counter drift, double-booked and out-of-range seats, and stale dashboard counters."""
+    pool = storage.create_pool(args.backend, mysql_config=main.DB_CONFIG, sqlite_path=args.sqlite_path, size=1)
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM JOURNEYS WHERE available_seats < 0")
+            oversold = cursor.fetchone()[0]
+            # Checked per slot: each slot counts the reservations inside its own seat range.
+            cursor.execute("""
+                SELECT j.total_seats, j.available_seats, j.first_seat, j.seat_map, COUNT(r.pnr_number)
+                FROM JOURNEYS j LEFT JOIN RESERVATIONS r
+                    ON r.train_number = j.train_number AND r.journey_date = j.journey_date
+                    AND r.seat_number >= j.first_seat AND r.seat_number < j.first_seat + j.total_seats
+                GROUP BY j.train_number, j.journey_date, j.slot, j.total_seats, j.available_seats, j.first_seat, j.seat_map
+            """)
+            counter_drift = seat_map_mismatch = 0
+            for total_seats, available_seats, first_seat, seat_map, booked in cursor.fetchall():
+                if total_seats - available_seats != booked:
+                    counter_drift += 1
+                if seat_map is not None and SeatMap.from_bytes(total_seats, seat_map, first_seat).free_count() != available_seats:
+                    seat_map_mismatch += 1
+            cursor.execute("""
+                SELECT COUNT(*) FROM RESERVATIONS r
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM JOURNEYS j
+                    WHERE j.train_number = r.train_number AND j.journey_date = r.journey_date
+                    AND r.seat_number >= j.first_seat AND r.seat_number < j.first_seat + j.total_seats
+                )
+            """)
+            out_of_range = cursor.fetchone()[0]
+            cursor.execute("""
+                SELECT COUNT(*) FROM (
+                    SELECT train_number, journey_date, seat_number FROM RESERVATIONS
+                    GROUP BY train_number, journey_date, seat_number HAVING COUNT(*) > 1
+                ) duplicates
+            """)
+            double_booked = cursor.fetchone()[0]
+            counters, actual = read_stats(cursor), compute_stats(cursor)
+            stats_drift = sum(counters[name] != actual[name] for name in actual)
+            cursor.close()
+    finally:
+        pool.close()
+    return {
+        'oversold_trains': oversold,
+        'seat_counter_drift': counter_drift,
+        'double_booked_seats': double_booked,
+        'seats_out_of_range': out_of_range,
+        'seat_map_mismatch': seat_map_mismatch,
+        'admin_stats_drift': stats_drift,
+    }
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def summarize(recorder, elapsed):
+    operations = {}
+    total_ops = 0
+    for op, values in sorted(recorder.latencies.items()):
+        values = sorted(values)
+        total_ops += len(values)
+        operations[op] = {
+            'count': len(values),
+            'failed': recorder.errors.get(op, 0),
+            'throughput_per_sec': len(values) / elapsed if elapsed else 0.0,
+            'mean_ms': sum(values) / len(values) * 1000,
+            'p50_ms': percentile(values, 0.50) * 1000,
+            'p95_ms': percentile(values, 0.95) * 1000,
+            'p99_ms': percentile(values, 0.99) * 1000,
+            'max_ms': values[-1] * 1000,
+        }
+    return {
+        'elapsed_sec': elapsed,
+        'total_ops': total_ops,
+        'throughput_per_sec': total_ops / elapsed if elapsed else 0.0,
+        'lock_wait_sec': recorder.lock_wait,
+        'pool_wait_sec': recorder.pool_wait,
+        'operations': operations,
+    }
+
+def print_report(result, baseline=None):
+    summary = result['summary']
+    print("\n==============================================")
+    print(f"LOAD TEST: {result['config']['workload']} ({result['config']['backend']})")
+    print("==============================================")
+    print(f"Total operations: {summary['total_ops']} in {summary['elapsed_sec']:.2f}s "
+          f"({summary['throughput_per_sec']:,.1f} ops/sec)")
+    print(f"Lock wait: {summary['lock_wait_sec']:.3f}s | Pool wait: {summary['pool_wait_sec']:.3f}s (summed over all workers)")
+    print("{:<8} {:>7} {:>7} {:>10} {:>9} {:>9} {:>9}".format("Op", "Count", "Failed", "Ops/sec", "p50 ms", "p95 ms", "p99 ms"))
+    print("-" * 65)
+    for op, stats in summary['operations'].items():
+        print("{:<8} {:>7} {:>7} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.2f}".format(
+            op, stats['count'], stats['failed'], stats['throughput_per_sec'], stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+
+    print("\n--- Consistency Checks ---")
+    for name, count in result['violations'].items():
+        print(f"{name}: {count}{'' if count == 0 else '  <-- VIOLATION'}")
+
+    if baseline:
+        print("\n--- Compared With Baseline ---")
+        old = baseline['summary']
+        print(f"Throughput: {old['throughput_per_sec']:,.1f} -> {summary['throughput_per_sec']:,.1f} ops/sec")
+        for op, stats in summary['operations'].items():
+            if op in old['operations']:
+                print(f"{op} p95: {old['operations'][op]['p95_ms']:.2f} -> {stats['p95_ms']:.2f} ms")
+
+
+# --- 5. Execution Block ---
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Railway Reservation System.")
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite',
+                        help="sqlite uses a fresh temporary database file; mysql uses main.DB_CONFIG")
+    parser.add_argument('--sqlite-path', help="SQLite file to use (default: a new temporary file)")
+    parser.add_argument('--workload', choices=sorted(WORKLOADS), default='hot-train')
+    parser.add_argument('--threads', type=int, default=8, help="worker threads per process")
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--ops', type=int, default=200, help="operations per worker thread")
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--replica', action='append', default=[],
+                        help="read replica to route searches and views to: HOST:PORT on MySQL, a file on SQLite (repeatable)")
+    parser.add_argument('--seats', type=int, default=500, help="seats per train (SQLite only)")
+    parser.add_argument('--days', type=int, default=1, help="spread searches and bookings over this many travel dates from today")
+    parser.add_argument('--slots', type=int, default=main.INVENTORY_SLOTS, help="seat inventory slots per new journey")
+    parser.add_argument('--trains-csv', default=None, help="also import this CSV before the run (e.g. trains_list.csv)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    return parser.parse_args(argv)
+
+def run(args):
+    if args.backend == 'sqlite' and not args.sqlite_path:
+        args.sqlite_path = os.path.join(tempfile.mkdtemp(prefix="railway_loadtest_"), "loadtest.sqlite3")
+    if args.backend == 'mysql':
+        print("[WARNING] Running against the MySQL database in main.DB_CONFIG; bookings are made as user 'loadtest'.")
+
+    trains = prepare_database(args)
+    recorder = Recorder()
+    start = time.perf_counter()
+    if args.processes > 1:
+        with multiprocessing.Pool(args.processes) as workers:
+            for raw in workers.map(_process_entry, [(args, trains, i) for i in range(args.processes)]):
+                recorder.merge(raw)
+    else:
+        recorder.merge(run_process(args, trains, 0))
+    elapsed = time.perf_counter() - start
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+    return {'config': config, 'summary': summarize(recorder, elapsed), 'violations': check_violations(args)}
+
+if __name__ == "__main__":
+    args = parse_args()
+    result = run(args)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, mode='r', encoding='utf-8') as file:
+            baseline = json.load(file)
+    print_report(result, baseline)
+
+    if args.output:
+        with open(args.output, mode='w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+        print(f"\nResults saved to '{args.output}'.")
@@ -1,10 +1,26 @@
 # Class 12 CS Project: Railway Reservation System
 # Python code using mysql-connector-python for database interaction.
 
-import mysql.connector
+import base64
 import os
-import hashlib
-from uuid import uuid4
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from admin_stats import read_stats, record_stats, set_stats
+from analytics import BookingAnalytics
+from booking_cache import BookingCache
+from credentials import PasswordHasher
+from journey_planner import JourneyPlanner
+from metrics import QueryMetrics, configure_slow_log, instrumented
+from pnr import PnrGenerator, normalize_pnr
+from replicas import ReplicaRouter
+from rollover import delete_users, online_reset
+from route_index import RouteIndex
+from seat_inventory import allocate_seats, archive_journeys, ensure_journey, lock_journey, pick_slot, store_journey
+from sessions import DatabaseSessionBackend, SessionStore
+from station_lookup import StationIndex
+from storage import DB_ERRORS, create_pool, prepared_statement
+from waitlist import WaitlistIndex, add_to_waitlist, count_waiting, expire_waitlists, pop_waitlist_head
 
 # --- 1. Database Configuration ---
 # !!! IMPORTANT: YOU MUST CHANGE THESE DETAILS TO MATCH YOUR LOCAL MYSQL SETUP !!!
@@ -15,308 +31,1128 @@ DB_CONFIG = {
     'database': 'railway_db'
 }
 
-# --- Global State for Logged-in User ---
-CURRENT_USER = None 
-SALT = "class12csrailway" # A fixed salt for security (for a real app, this should be unique per user)
+# Storage backend: 'mysql' uses DB_CONFIG above, 'sqlite' uses an embedded database file
+# (same schema as sql_setup.sql) so the system can run without a MySQL server.
+DB_BACKEND = 'mysql'
+SQLITE_PATH = 'railway_db.sqlite3'
+POOL_SIZE = 5 # Maximum number of database connections open at the same time
+READ_REPLICAS = [] # Read-only replicas of the database: dicts overriding DB_CONFIG (e.g. {'host': 'replica1'}) or SQLite file paths; empty sends every read to the primary
+REPLICA_MAX_LAG = 2.0 # Seconds a replica may trail the primary and still serve searches, booking lookups and dashboards
+REPLICA_HEARTBEAT_INTERVAL = 0.5 # Seconds between heartbeats written on the primary (replica lag is measured from them)
+PREPARE_STATEMENTS = True # Keep hot queries prepared on each pooled connection (measure with: python statement_benchmark.py)
+MAX_GROUP_SIZE = 6 # Maximum passengers in one group booking
+BOOKING_HORIZON_DAYS = 120 # How many days ahead journeys can be searched and booked
+WAITLIST_LIMIT = 50 # Passengers who can wait for seats on one journey once it is full
+INVENTORY_SLOTS = 1 # Seat counter rows per new journey; >1 spreads concurrent bookings of one train over several locks
+PNR_BLOCK_SIZE = 100 # PNR numbers each process reserves from PNR_SEQUENCE at a time
+PNR_CACHE_SIZE = 10000 # Booking records kept in memory for repeated PNR status checks (0 disables the cache)
+PNR_CACHE_TTL = 60 # Seconds a cached booking record is trusted (bounds staleness across processes)
+BOOKINGS_PAGE_SIZE = 20 # Bookings per page of "My Bookings"
+MAX_BOOKINGS_PAGE_SIZE = 100 # Largest page a caller (e.g. GET /bookings?limit=) can ask for
+SLOW_QUERY_MS = 100 # Statements slower than this (milliseconds) are written to the slow-query log
+SLOW_QUERY_LOG = 'slow_queries.log' # None turns the slow-query log off
+ANALYTICS_TTL = 300 # Seconds the analytics report is reused before the tables are read again (bookings show up within this time)
+ANALYTICS_TOP_N = 10 # Entries in each ranking of the analytics report
+ARCHIVE_AFTER_DAYS = 7 # Reservations move to RESERVATIONS_HISTORY this many days after their journey (run: python rollover.py)
+RESET_MODE = 'online' # 'online' resets journey by journey while bookings continue; 'offline' empties the tables in one transaction
+RESET_BATCH_SIZE = 50 # Journeys (or departed reservations, or users) per batch of an online reset
+RESET_PAUSE = 0.05 # Seconds an online reset waits between batches, letting bookings through
+ROUTE_INDEX_ENABLED = True # Keep an in-memory (source, destination) -> trains index for search_trains
+
+# --- Login Sessions & Admin Settings ---
+# login_user returns a Session; every reservation method takes the caller's session
+# instead of reading a global "current user", so one process can serve many users.
+SESSION_SECRET = os.environ.get("RAILWAY_SESSION_SECRET", "class12csrailway-sessions") # Signs session tokens (set your own in production)
+SESSION_TTL = 30 * 60 # Seconds a login stays valid
+SESSION_BACKEND = 'memory' # 'database' shares sessions between processes through the SESSIONS table
+SALT = "class12csrailway" # The old fixed salt; only used to check (and upgrade) SHA-512 hashes from before per-user salts
+PASSWORD_HASH_ALGORITHM = 'scrypt' # or 'pbkdf2_sha256'
+PASSWORD_HASH_COST = None # log2 work factor; None uses the algorithm's default (measure with: python credentials.py)
 ADMIN_SECRET_CODE = "ADMIN" # Secret command to access the new Admin menu
 ADMIN_USERNAME = "admin" # The designated username for the administrator account.
 
+# Free seats per train on one date (param: journey_date), summed over the journey's slots.
+JOURNEY_SEATS_JOIN = """
+    LEFT JOIN (
+        SELECT train_number, SUM(available_seats) AS available_seats FROM JOURNEYS
+        WHERE journey_date = %s GROUP BY train_number
+    ) j ON j.train_number = t.train_number
+"""
+
+# Booking status of a RESERVATIONS_HISTORY row, by its archive_reason (see rollover.py).
+HISTORY_STATUS = {'completed': 'archived', 'reset': 'cancelled_by_reset'}
+
+class ReservationError(Exception):
+    """
+    A registration, booking, cancellation or lookup that cannot be completed.
+    The message explains why; code is one of 'invalid', 'not_found', 'forbidden',
+    'conflict' or 'unavailable' so API callers can map it to a status.
+    """
+    def __init__(self, message, code='invalid'):
+        super().__init__(message)
+        self.code = code
+
 class RailwayReservationSystem:
     """
     Manages the core logic and database operations for the railway reservation system.
     """
-    def __init__(self):
-        self.db_connection = None
-        self.cursor = None
+    def __init__(self, backend=DB_BACKEND, pool_size=POOL_SIZE, sqlite_path=SQLITE_PATH, read_replicas=None):
+        self.backend = backend
+        self.pool_size = pool_size
+        self.sqlite_path = sqlite_path
+        self.read_replicas = READ_REPLICAS if read_replicas is None else read_replicas
+        self.pool = None
+        self.replicas = None
+        self.route_index = None
+        self.journey_planner = None
+        self.station_index = None
+        self.waitlist = None
+        self.pnrs = None
+        self.analytics = None
+        self.booking_cache = BookingCache(PNR_CACHE_SIZE, PNR_CACHE_TTL)
+        self.metrics = QueryMetrics(SLOW_QUERY_MS / 1000)
+        self.sessions = SessionStore(SESSION_SECRET, ttl=SESSION_TTL)
+        self.hasher = PasswordHasher(PASSWORD_HASH_ALGORITHM, PASSWORD_HASH_COST, legacy_salt=SALT)
 
     # --- Utility Methods ---
 
     def _hash_password(self, password):
-        """Hashes the password using SHA-512 with a fixed salt."""
-        # Concatenate password and salt, then hash the result
-        hashed_password = hashlib.sha512((password + SALT).encode('utf-8')).hexdigest()
-        return hashed_password
+        """Hashes the password with a fresh per-user salt and the configured KDF (see credentials.py)."""
+        return self.hasher.hash(password)
 
     def connect(self):
-        """Attempts to establish a connection to the MySQL database."""
+        """Creates the connection pool and checks that the database is reachable."""
         try:
-            self.db_connection = mysql.connector.connect(**DB_CONFIG)
-            self.cursor = self.db_connection.cursor()
+            self.pool = create_pool(
+                self.backend, mysql_config=DB_CONFIG, sqlite_path=self.sqlite_path, size=self.pool_size, prepare=PREPARE_STATEMENTS,
+            )
+            self.pool.metrics = self.metrics
+            configure_slow_log(SLOW_QUERY_LOG)
+            with self.pool.connection() as conn:
+                conn.ping(reconnect=False)
+            # Nothing is opened on a replica yet: one that cannot be reached just serves no reads.
+            replica_pools = [
+                create_pool(
+                    self.backend, mysql_config={**DB_CONFIG, **replica} if isinstance(replica, dict) else None,
+                    sqlite_path=replica if isinstance(replica, str) else None,
+                    size=self.pool_size, prepare=PREPARE_STATEMENTS, replica=True,
+                )
+                for replica in self.read_replicas
+            ]
+            for replica_pool in replica_pools:
+                replica_pool.metrics = self.metrics
+            self.replicas = ReplicaRouter(self.pool, replica_pools, REPLICA_MAX_LAG, REPLICA_HEARTBEAT_INTERVAL)
+            self.replicas.start()
             print("--- Database connection successful. ---")
-            return True
-        except mysql.connector.Error as err:
-            print(f"Error connecting to MySQL: {err}")
+        except (RuntimeError, ValueError) + DB_ERRORS as err:
+            print(f"Error connecting to the database: {err}")
             print("Please ensure your MySQL server is running and configuration details (host, user, password) are correct.")
+            if self.replicas:
+                self.replicas.close()
+                self.replicas = None
+            if self.pool:
+                self.pool.close()
+                self.pool = None
             return False
 
+        if SESSION_BACKEND == 'database':
+            self.sessions.backend = DatabaseSessionBackend(self.pool)
+        self.waitlist = WaitlistIndex(self.pool)
+        self.pnrs = PnrGenerator(self.pool, PNR_BLOCK_SIZE)
+        # The analytics scans are read-only: a replica serves them when there is one.
+        self.analytics = BookingAnalytics(self.replicas, ANALYTICS_TTL)
+
+        try:
+            archived = self.archive_journeys()
+            if archived:
+                print(f"[INFO] Archived {archived} departed journeys.")
+        except DB_ERRORS as err:
+            print(f"[WARNING] Could not archive departed journeys: {err}")
+
+        if ROUTE_INDEX_ENABLED:
+            try:
+                self.route_index = RouteIndex(self.pool)
+                self.route_index.load()
+            except DB_ERRORS as err:
+                print(f"[WARNING] Route index unavailable, searching the database directly: {err}")
+                self.route_index = None
+        return True
+
     def disconnect(self):
-        """Closes the database connection."""
-        if self.db_connection and self.db_connection.is_connected():
-            self.cursor.close()
-            self.db_connection.close()
+        """Closes every pooled database connection."""
+        if self.replicas:
+            self.replicas.close()
+            self.replicas = None
+        if self.pool:
+            self.pool.close()
+            self.pool = None
             print("--- Database connection closed. ---")
 
+    @contextmanager
+    def _checkout(self):
+        """
+        Checks a connection out of the pool for a single operation and yields (connection, cursor).
+        Any transaction still open when the block exits is rolled back by the pool.
+        """
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield conn, cursor
+            finally:
+                cursor.close()
+
+    @contextmanager
+    def _read_checkout(self, username=None):
+        """
+        Like _checkout, for read-only work: the connection comes from a read replica when one
+        is within REPLICA_MAX_LAG and has every write this process made for `username`
+        (read-your-writes), otherwise from the primary (see replicas.py).
+        """
+        with self.replicas.connection(username) as conn:
+            cursor = conn.cursor()
+            try:
+                yield conn, cursor
+            finally:
+                cursor.close()
+
     def _execute_query(self, query, params=None, fetch=False, commit=False):
         """
         Internal function to handle query execution and common errors.
         Returns result if fetch=True, otherwise None.
         """
         try:
-            self.cursor.execute(query, params or ())
-            if commit:
-                self.db_connection.commit()
-            if fetch:
-                return self.cursor.fetchall()
-        except mysql.connector.Error as err:
+            with self._checkout() as (conn, cursor):
+                cursor.execute(query, params or ())
+                if commit:
+                    conn.commit()
+                if fetch:
+                    return cursor.fetchall()
+        except DB_ERRORS as err:
+            # The pool rolls back the failed transaction before reusing the connection.
             print(f"Database Error: {err}")
-            self.db_connection.rollback() # Rollback on error to prevent transaction leakage
         except Exception as e:
             print(f"An unexpected error occurred during query execution: {e}")
         return None
 
     # --- Admin Statistics Function ---
+    @instrumented('stats')
     def get_admin_stats(self):
-        """Fetches key statistics for the admin dashboard."""
-        
-        stats = {}
-        
+        """
+        Fetches key statistics for the admin dashboard.
+        The figures are counters kept up to date by every write (see admin_stats.py),
+        so this is one small query instead of scans of USERS, TRAINS and RESERVATIONS.
+        """
         try:
-            # 1. Total Users
-            total_users_query = "SELECT COUNT(*) FROM USERS"
-            stats['total_users'] = self._execute_query(total_users_query, fetch=True)[0][0] or 0
-            
-            # 2. Total Trains
-            total_trains_query = "SELECT COUNT(*) FROM TRAINS"
-            stats['total_trains'] = self._execute_query(total_trains_query, fetch=True)[0][0] or 0
-            
-            # 3. Total Reservations (Booked Seats)
-            total_reservations_query = "SELECT COUNT(*) FROM RESERVATIONS"
-            stats['total_reservations'] = self._execute_query(total_reservations_query, fetch=True)[0][0] or 0
-            
-            # 4. Total Seats & Occupancy (booked seats is total - available)
-            total_seats_query = "SELECT SUM(total_seats), SUM(total_seats - available_seats) FROM TRAINS"
-            seat_info = self._execute_query(total_seats_query, fetch=True)[0]
-            stats['system_total_seats'] = seat_info[0] or 0
-            stats['system_booked_seats'] = seat_info[1] or 0
-            
+            with self._read_checkout(ADMIN_USERNAME) as (conn, cursor):
+                stats = read_stats(cursor)
+
             # Calculate Occupancy Percentage
             if stats['system_total_seats'] > 0:
                 stats['occupancy_percent'] = (stats['system_booked_seats'] / stats['system_total_seats']) * 100
             else:
                 stats['occupancy_percent'] = 0.0
 
+            # Served from this process's memory, not the database.
+            stats['pnr_cache'] = self.booking_cache.stats()
+            stats['replicas'] = self.replicas.status()
             return stats
 
         except Exception as e:
             print(f"Error fetching admin stats: {e}")
             return None
 
+    def show_metrics(self):
+        """Prints per-operation latency and database time, and optionally saves the full snapshot."""
+        snapshot = self.metrics.snapshot(top=5)
+        print("\n--- Query Metrics (this process) ---")
+        print("{:<10} {:>7} {:>9} {:>9} {:>9} {:>11} {:>11} {:>7}".format(
+            "Operation", "Count", "p50 ms", "p95 ms", "p99 ms", "DB ms/op", "Pool p95 ms", "Errors"
+        ))
+        print("-" * 80)
+        for name, op in snapshot['operations'].items():
+            latency = op['latency']
+            db_per_op = op['db_time']['count'] * op['db_time']['mean_ms'] / latency['count'] if latency['count'] else 0.0
+            print("{:<10} {:>7} {:>9.2f} {:>9.2f} {:>9.2f} {:>11.2f} {:>11.2f} {:>7}".format(
+                name, latency['count'], latency['p50_ms'], latency['p95_ms'], latency['p99_ms'],
+                db_per_op, op['pool_wait']['p95_ms'], op['errors'],
+            ))
+        print("\nSlowest statements (total time):")
+        for statement in snapshot['top_statements']:
+            print(f"  {statement['total_ms']:9.1f} ms total, {statement['count']} runs: {statement['sql'][:100]}")
+
+        path = input("\nSave the full snapshot as JSON (file name, or press Enter to skip): ").strip()
+        if path:
+            self.metrics.dump(path)
+            print(f"Metrics saved to '{path}'.")
+
+    def get_analytics(self, session, top=ANALYTICS_TOP_N):
+        """
+        Returns the occupancy and booking analytics report (see analytics.py). Admin only.
+        Served from memory for up to ANALYTICS_TTL seconds, or until a reset.
+        """
+        self._require_session(session, admin=True)
+        try:
+            return self.analytics.report(max(1, min(int(top), 100)))
+        except RuntimeError as err:
+            raise ReservationError(str(err), 'unavailable')
+
+    def show_analytics(self, session):
+        """Prints the analytics report."""
+        try:
+            report = self.get_analytics(session)
+        except ReservationError as err:
+            print(f"Analytics Failed: {err}")
+            return
+        except DB_ERRORS as err:
+            print(f"Database Error: {err}")
+            return
+
+        rows = report['rows']
+        print(f"\n--- Analytics ({rows['trains']} trains, {rows['journeys']} journeys, {rows['bookings']} bookings) ---")
+        print(f"Overall Occupancy: {report['occupancy_percent']:.2f}%")
+        print("\nFullest Trains:")
+        for train in report['busiest_trains']:
+            print(f"  {train['train_number']:<8} {train['train_name'][:30]:<30} {train['booked_seats']}/{train['total_seats']} seats ({train['occupancy_percent']:.1f}%)")
+        print("\nBusiest Routes (bookings):")
+        for route in report['busiest_routes']:
+            print(f"  {route['source']} -> {route['destination']}: {route['bookings']} ({route['occupancy_percent']:.1f}% full)")
+        print("\nBusiest Stations (bookings from or to):")
+        for station in report['busiest_stations']:
+            print(f"  {station['station']}: {station['bookings']}")
+        print("\nBookings by Hour of Day:")
+        peak = max(report['bookings_by_hour']) or 1
+        for hour, count in enumerate(report['bookings_by_hour']):
+            print(f"  {hour:02d}:00 {'#' * round(count / peak * 40):<40} {count}")
+        print(f"\n(Report built in {report['load_ms'] + report['compute_ms']:.1f} ms)")
+
     # --- User Authentication Functions ---
 
-    def register_user(self, username, password):
-        """Registers a new user by hashing the password and inserting into the USERS table."""
+    @instrumented('register')
+    def create_user(self, username, password):
+        """Inserts a new user with a hashed password. Raises ReservationError if the name is empty or taken."""
         if not username or not password:
-            print("Registration Failed: Username and password cannot be empty.")
-            return False
+            raise ReservationError("Username and password cannot be empty.", 'invalid')
 
-        try:
+        # Hashed before a pooled connection is checked out: the KDF is deliberately slow.
+        password_hash = self._hash_password(password)
+
+        with self._checkout() as (conn, cursor):
             # Check if user already exists
-            self.cursor.execute("SELECT username FROM USERS WHERE username = %s", (username,))
-            if self.cursor.fetchone():
-                print(f"Registration Failed: Username '{username}' already taken.")
-                return False
+            cursor.execute("SELECT username FROM USERS WHERE username = %s", (username,))
+            if cursor.fetchone():
+                raise ReservationError(f"Username '{username}' already taken.", 'conflict')
 
-            password_hash = self._hash_password(password)
-            
             insert_query = "INSERT INTO USERS (username, password_hash) VALUES (%s, %s)"
-            self.cursor.execute(insert_query, (username, password_hash))
-            self.db_connection.commit()
+            cursor.execute(insert_query, (username, password_hash))
+            record_stats(cursor, total_users=1)
+            conn.commit()
+
+    def register_user(self, username, password):
+        """Registers a new user by hashing the password and inserting into the USERS table."""
+        try:
+            self.create_user(username, password)
             print(f"\n[SUCCESS] User '{username}' registered successfully!")
             return True
-            
-        except mysql.connector.Error as err:
+        except ReservationError as err:
+            print(f"Registration Failed: {err}")
+            return False
+        except DB_ERRORS as err:
             print(f"Registration Error: {err}")
-            self.db_connection.rollback()
             return False
 
+    @instrumented('login')
+    def check_credentials(self, username, password):
+        """
+        Returns True if the username exists and the password matches its stored hash.
+        Hashes from an older scheme or cost are replaced with a current one on success.
+        """
+        with self._checkout() as (conn, cursor):
+            cursor.execute("SELECT password_hash FROM USERS WHERE username = %s", (username,))
+            result = cursor.fetchone()
+
+        # The database connection is back in the pool before the (slow) hash check.
+        if not result or not self.hasher.verify(password, result[0], username):
+            return False
+
+        if self.hasher.needs_rehash(result[0]):
+            new_hash = self._hash_password(password)
+            with self._checkout() as (conn, cursor):
+                # Only replace the hash we checked, in case the password changed meanwhile.
+                cursor.execute(
+                    "UPDATE USERS SET password_hash = %s WHERE username = %s AND password_hash = %s",
+                    (new_hash, username, result[0]),
+                )
+                conn.commit()
+        return True
+
     def login_user(self, username, password):
-        """Authenticates a user by checking the hashed password and setting CURRENT_USER."""
-        global CURRENT_USER 
+        """Authenticates a user by checking the hashed password. Returns a new Session, or None."""
         try:
-            self.cursor.execute("SELECT password_hash FROM USERS WHERE username = %s", (username,))
-            result = self.cursor.fetchone()
-
-            if result:
-                stored_hash = result[0]
-                provided_hash = self._hash_password(password)
-                
-                if stored_hash == provided_hash:
-                    # Modify the global variable, so 'global' is needed here.
-                    CURRENT_USER = username 
-                    return True
-                else:
-                    print("\nLogin Failed: Invalid username or password.")
-                    return False
+            if self.check_credentials(username, password):
+                return self.sessions.create(username)
             else:
                 print("\nLogin Failed: Invalid username or password.")
-                return False
-                
-        except mysql.connector.Error as err:
+                return None
+
+        except DB_ERRORS as err:
             print(f"Login Error: {err}")
-            return False
+            return None
+
+    def logout_user(self, session):
+        """Ends a session; its token is rejected from now on."""
+        if session is not None:
+            self.sessions.revoke(session.token)
+
+    def _require_session(self, session, admin=False):
+        """
+        Returns the username of a live session (checked against the session store, so
+        expired or logged-out sessions are refused). Raises ReservationError otherwise.
+        """
+        live = self.sessions.get(session.token) if session is not None else None
+        if live is None:
+            raise ReservationError("You must be logged in.", 'forbidden')
+        if admin and live.username.lower() != ADMIN_USERNAME.lower():
+            raise ReservationError(f"Only the '{ADMIN_USERNAME}' user can do this.", 'forbidden')
+        return live.username
 
     # --- Core Reservation Functions ---
+    # The methods without console output (find_trains, reserve_seats, cancel_reservation,
+    # get_booking, ...) return data and raise ReservationError (see http_api.py); the
+    # menu-facing methods wrap them and print the outcome. Both take the caller's Session.
 
-    def search_trains(self, source, destination):
-        """Searches for available trains between the given source and destination."""
-        query = """
-            SELECT train_number, train_name, source, destination, available_seats
-            FROM TRAINS
-            WHERE source = %s AND destination = %s AND available_seats > 0
+    def _get_route_index(self):
+        """Returns the route index, loading one on demand when ROUTE_INDEX_ENABLED is off."""
+        if self.route_index is None:
+            route_index = RouteIndex(self.pool)
+            route_index.load()
+            self.route_index = route_index
+        return self.route_index
+
+    def resolve_station(self, text):
         """
-        results = self._execute_query(query, (source, destination), fetch=True) 
-        
+        Resolves user input to a station name stored in TRAINS.
+        Returns (exact_match, suggestions); exact_match is None when the input is ambiguous or misspelled.
+        """
+        try:
+            if self.station_index is None:
+                self.station_index = StationIndex(self._get_route_index())
+            match = self.station_index.exact(text)
+            if match:
+                return match, [match]
+            return None, self.station_index.suggest(text)
+        except DB_ERRORS as err:
+            # Fall back to searching with the text exactly as typed.
+            print(f"Database Error: {err}")
+            return text, [text]
+
+    def _journey_date(self, journey_date):
+        """
+        Accepts a date or 'YYYY-MM-DD' text and returns the date if it can be booked
+        (today up to BOOKING_HORIZON_DAYS ahead). Raises ReservationError otherwise.
+        """
+        if isinstance(journey_date, str):
+            try:
+                journey_date = date.fromisoformat(journey_date.strip())
+            except ValueError:
+                raise ReservationError(f"Invalid journey date '{journey_date}'. Use YYYY-MM-DD.", 'invalid')
+        today = date.today()
+        if journey_date < today:
+            raise ReservationError(f"Journey date {journey_date} is in the past.", 'invalid')
+        if journey_date > today + timedelta(days=BOOKING_HORIZON_DAYS):
+            raise ReservationError(f"Journeys can only be booked up to {BOOKING_HORIZON_DAYS} days ahead.", 'invalid')
+        return journey_date
+
+    def _seats_on(self, cursor, journey_date, train_numbers):
+        """
+        Returns {train_number: free seats} on the given date for trains with seats left.
+        Dates nobody has booked yet have no JOURNEYS row and count as fully free.
+        """
+        placeholders = ", ".join(["%s"] * len(train_numbers))
+        cursor.execute(f"""
+            SELECT t.train_number, COALESCE(j.available_seats, t.total_seats)
+            FROM TRAINS t
+            {JOURNEY_SEATS_JOIN}
+            WHERE t.train_number IN ({placeholders}) AND COALESCE(j.available_seats, t.total_seats) > 0
+        """, (journey_date, *train_numbers))
+        return dict(cursor.fetchall())
+
+    @instrumented('search')
+    def find_trains(self, source, destination, journey_date, include_full=False):
+        """
+        Returns (train_number, train_name, source, destination, available_seats) for trains with free
+        seats on the date; with include_full, sold-out trains (0 seats, waitlist only) are listed too.
+        """
+        journey_date = self._journey_date(journey_date)
+        seats_filter = "" if include_full else " AND COALESCE(j.available_seats, t.total_seats) > 0"
+        seats_query = f"""
+            SELECT t.train_number, t.train_name, t.source, t.destination, COALESCE(j.available_seats, t.total_seats)
+            FROM TRAINS t
+            {JOURNEY_SEATS_JOIN}
+        """
+        if self.route_index:
+            # The index answers the static part; only live seat counts come from the database.
+            train_numbers = self.route_index.lookup(source, destination)
+            if not train_numbers:
+                return []
+            placeholders = ", ".join(["%s"] * len(train_numbers))
+            # Prepared once per connection for each number of trains on a route.
+            query = prepared_statement(seats_query + f"WHERE t.train_number IN ({placeholders})" + seats_filter)
+            params = (journey_date, *train_numbers)
+        else:
+            query = prepared_statement(seats_query + "WHERE t.source = %s AND t.destination = %s" + seats_filter)
+            params = (journey_date, source, destination)
+
+        # Seat counts are advisory here (booking re-checks them under lock), so a replica may answer.
+        with self._read_checkout() as (conn, cursor):
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def search_trains(self, source, destination, journey_date):
+        """
+        Searches for trains between the given source and destination on a travel date.
+        Sold-out trains are listed as well while waitlists are enabled, so they can still be
+        chosen and joined (see book_group). Returns True if any train was listed.
+        """
+        try:
+            results = self.find_trains(source, destination, journey_date, include_full=WAITLIST_LIMIT > 0)
+        except ReservationError as err:
+            print(f"Search Failed: {err}")
+            return False
+        except DB_ERRORS as err:
+            print(f"Database Error: {err}")
+            results = None
+
         if results:
             print("\n--- Available Trains ---")
             print("{:<10} {:<30} {:<15} {:<15} {:<10}".format(
                 "Number", "Name", "Source", "Destination", "Seats"
             ))
             print("-" * 80)
-            for row in results:
-                print("{:<10} {:<30} {:<15} {:<15} {:<10}".format(*row))
+            for *train, seats in results:
+                print("{:<10} {:<30} {:<15} {:<15} {:<10}".format(*train, seats if seats > 0 else "FULL (waitlist)"))
             return True
         else:
             print("\nNo direct trains found for this route, or seats are unavailable.")
             return False
 
-    def book_ticket(self, train_number, name, age):
-        """Books a ticket by assigning a PNR and seat, and updating available seats."""
-        # CURRENT_USER is only read here, so no 'global' declaration is needed.
-        if not CURRENT_USER:
-            print("Booking Failed: You must be logged in to book a ticket.")
-            return
+    @instrumented('search')
+    def find_connections(self, source, destination, journey_date):
+        """
+        Returns one-change and two-change itineraries whose legs all have free seats on the
+        travel date, as a list of (stations, legs) where legs[i] lists (train_number, available_seats).
+        """
+        journey_date = self._journey_date(journey_date)
+        if self.journey_planner is None:
+            self.journey_planner = JourneyPlanner(self._get_route_index())
+        itineraries = self.journey_planner.find_connections(source, destination)
+        if not itineraries:
+            return []
+
+        # Only keep trains that still have seats (live counts come from the database).
+        train_numbers = sorted({number for _, legs in itineraries for leg in legs for number in leg})
+        with self._read_checkout() as (conn, cursor):
+            seats = self._seats_on(cursor, journey_date, train_numbers)
 
+        connections = []
+        for stations, legs in itineraries:
+            open_legs = [[(number, seats[number]) for number in leg if number in seats] for leg in legs]
+            if all(open_legs):
+                connections.append((stations, open_legs))
+        return connections
+
+    def search_connections(self, source, destination, journey_date):
+        """Searches for one-change and two-change itineraries when there is no direct train."""
         try:
-            # 1. Fetch current seat availability and VALIDATE TRAIN NUMBER FIRST
-            # We use FOR UPDATE to lock the row, but we defer the transaction start slightly.
-            # However, because we need to lock the row, we must start the transaction here.
-            
-            # --- TRANSACTION PRE-CHECK & START ---
-            if self.db_connection.in_transaction:
-                print("[WARNING] An active transaction was found before starting a new one. Rolling back...")
-                self.db_connection.rollback()
-            
-            self.db_connection.start_transaction()
-            # -----------------------------------
+            connections = self.find_connections(source, destination, journey_date)
+        except ReservationError as err:
+            print(f"Search Failed: {err}")
+            return False
+        except DB_ERRORS as err:
+            print(f"Database Error: {err}")
+            return False
+
+        if not connections:
+            print("No connecting trains with available seats found either.")
+            return False
 
-            self.cursor.execute("SELECT available_seats, total_seats FROM TRAINS WHERE train_number = %s FOR UPDATE", (train_number,))
-            train_info = self.cursor.fetchone()
+        print("\n--- Connecting Trains ---")
+        for option, (stations, legs) in enumerate(connections, start=1):
+            print(f"\nOption {option}: {' -> '.join(stations)} ({len(legs) - 1} change{'s' if len(legs) > 2 else ''})")
+            for i, leg in enumerate(legs):
+                trains = ", ".join(f"{number} ({seats} seats)" for number, seats in leg)
+                print(f"  {stations[i]} to {stations[i + 1]}: {trains}")
+        print("\nAll legs run on the same date. Book each leg separately using its train number.")
+        return True
+
+    def _pnr(self, pnr_number):
+        """Returns the canonical form of a PNR, or raises ReservationError if it cannot exist (see pnr.py)."""
+        canonical = normalize_pnr(pnr_number)
+        if canonical is None:
+            raise ReservationError(f"'{pnr_number}' is not a valid PNR Number.", 'invalid')
+        return canonical
+
+    @instrumented('book')
+    def reserve_seats(self, session, train_number, journey_date, passengers):
+        """
+        Books seats for a group of passengers on one journey in a single transaction.
+
+        The seats come from one locked slot of the journey (the train on that date) when a
+        slot has room for the whole group, otherwise from all its slots locked in order.
+        They are inserted with one multi-row statement: either every passenger is booked or none is.
+
+        Args:
+            session (Session): The logged-in user making the booking.
+            train_number (str): The train to book on.
+            journey_date (date or str): The travel date ('YYYY-MM-DD').
+            passengers (list): (name, age) for every passenger.
+
+        Returns a list of (pnr_number, name, age, seat_number).
+        Raises ReservationError if the booking cannot be made.
+        """
+        username = self._require_session(session)
+
+        if not passengers:
+            raise ReservationError("No passengers given.", 'invalid')
+
+        if len(passengers) > MAX_GROUP_SIZE:
+            raise ReservationError(f"At most {MAX_GROUP_SIZE} passengers can be booked together.", 'invalid')
+
+        journey_date = self._journey_date(journey_date)
+        # Reserved before the transaction: a new block of numbers needs a connection of its own.
+        pnr_numbers = self.pnrs.allocate(len(passengers))
+
+        with self._checkout() as (conn, cursor):
+            # 1. VALIDATE TRAIN NUMBER FIRST; the journey row is created the first time its date is booked
+            if not ensure_journey(conn, cursor, train_number, journey_date, INVENTORY_SLOTS):
+                raise ReservationError("Invalid Train Number.", 'not_found')
+
+            # 2. Fetch current seat availability
+            # We lock the journey's slot rows with FOR UPDATE, so the transaction must start here.
+            # Raising inside this block rolls the transaction back (see _checkout).
+            conn.start_transaction()
+
+            slot = pick_slot(cursor, train_number, journey_date, len(passengers))
+            locked = lock_journey(cursor, train_number, journey_date, slot)
+
+            if slot is not None and locked and locked[0][1] < len(passengers):
+                # Another booking filled the slot after it was picked: start over holding every slot.
+                conn.rollback()
+                conn.start_transaction()
+                locked = lock_journey(cursor, train_number, journey_date)
+
+            if not locked:
+                raise ReservationError("Invalid Train Number.", 'not_found')
+
+            available_seats = sum(slot_seats for _, slot_seats, _ in locked)
 
-            if not train_info:
-                print("Booking Failed: Invalid Train Number.")
-                self.db_connection.rollback() 
-                return
-            
-            available_seats, total_seats = train_info
-            
             if available_seats <= 0:
-                print("Booking Failed: No available seats left on this train.")
-                self.db_connection.rollback() 
-                return
+                raise ReservationError("No available seats left on this train.", 'unavailable')
 
-            # 2. Determine the next available seat number
-            seat_number = total_seats - available_seats + 1
-            
-            # 3. Generate PNR
-            pnr_number = str(uuid4())[:8].upper() 
+            # 3. Take free seats from the seat maps (one contiguous block when possible)
+            allocation = allocate_seats(locked, len(passengers))
 
-            # 4. Insert Reservation Record (This is where 'username' is used)
+            if allocation is None:
+                free_seats = sum(min(slot_seats, seat_map.free_count()) for _, slot_seats, seat_map in locked)
+                raise ReservationError(
+                    f"Only {free_seats} seats left on this train for {len(passengers)} passengers.",
+                    'unavailable',
+                )
+            seat_numbers = [seat_number for _, _, seats in allocation for seat_number in seats]
+
+            # 4. One PNR per passenger
+            booked = [
+                (pnr_number, name, age, seat_number)
+                for pnr_number, (name, age), seat_number in zip(pnr_numbers, passengers, seat_numbers)
+            ]
+
+            # 5. Insert all Reservation Records with one statement (This is where 'username' is used)
             reservation_query = """
-                INSERT INTO RESERVATIONS (pnr_number, train_number, username, passenger_name, age, seat_number)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                INSERT INTO RESERVATIONS (pnr_number, train_number, journey_date, username, passenger_name, age, seat_number)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
             """
-            # CURRENT_USER must correspond to a valid user in the USERS table
-            self.cursor.execute(reservation_query, (pnr_number, train_number, CURRENT_USER, name, age, seat_number))
-            
-            # 5. Update Available Seats in TRAINS table
-            update_seats_query = "UPDATE TRAINS SET available_seats = available_seats - 1 WHERE train_number = %s"
-            self.cursor.execute(update_seats_query, (train_number,))
+            # username must correspond to a valid user in the USERS table
+            cursor.executemany(reservation_query, [
+                (pnr_number, train_number, journey_date, username, name, age, seat_number)
+                for pnr_number, name, age, seat_number in booked
+            ])
+
+            # 6. Update Available Seats and the seat map of each slot used in JOURNEYS table
+            for slot, seat_map, seats in allocation:
+                store_journey(cursor, train_number, journey_date, slot, seat_map, -len(seats))
+            record_stats(cursor, total_reservations=len(booked), system_booked_seats=len(booked))
+
+            conn.commit() # Commit all changes
+        self.replicas.wrote(username)
+        return booked
+
+    def book_ticket(self, session, train_number, journey_date, name, age):
+        """Books a ticket by assigning a PNR and seat, and updating available seats. Returns the PNR or None."""
+        booked = self.book_group(session, train_number, journey_date, [(name, age)])
+        return booked[0][0] if booked else None
+
+    def book_group(self, session, train_number, journey_date, passengers, offer_waitlist=False):
+        """
+        Books a group of (name, age) passengers for the session's user (see reserve_seats).
+        With offer_waitlist, a full journey asks whether to join its waitlist instead.
+        Returns a list of (pnr_number, name, age, seat_number), or None if the booking failed.
+        """
+        if session is None:
+            print("Booking Failed: You must be logged in to book a ticket.")
+            return None
+
+        try:
+            booked = self.reserve_seats(session, train_number, journey_date, passengers)
 
-            self.db_connection.commit() # Commit all changes
             print(f"\n--- BOOKING SUCCESSFUL! ---")
-            print(f"PNR Number: {pnr_number}")
-            print(f"Booked by: {CURRENT_USER}")
-            print(f"Train: {train_number} - Seat: {seat_number}")
-            print(f"Passenger: {name}, Age: {age}")
-            
-        except mysql.connector.Error as err:
-            # Re-raise the error to show which specific DB error occurred
+            print(f"Booked by: {session.username}")
+            print(f"Train: {train_number}")
+            print(f"Journey Date: {journey_date}")
+            for pnr_number, name, age, seat_number in booked:
+                print(f"PNR Number: {pnr_number} - Seat: {seat_number} - Passenger: {name}, Age: {age}")
+            return booked
+
+        except ReservationError as err:
+            print(f"Booking Failed: {err}")
+            if offer_waitlist and err.code == 'unavailable' and WAITLIST_LIMIT:
+                if input("Join the waitlist for this train? (y/n): ").strip().lower() == 'y':
+                    self.waitlist_group(session, train_number, journey_date, passengers)
+        except DB_ERRORS as err:
+            # The pool rolls back the failed transaction, so no passenger is left half-booked.
             print(f"Booking Error: {err}")
-            self.db_connection.rollback() 
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-            self.db_connection.rollback() 
+        return None
 
+    @instrumented('waitlist')
+    def join_waitlist(self, session, train_number, journey_date, passengers):
+        """
+        Puts a group of (name, age) passengers on the waitlist of a full journey.
+        Each passenger gets a PNR now and a seat as soon as one is cancelled (first come,
+        first served, see cancel_reservation).
 
-    def cancel_ticket(self, pnr_number):
-        """Cancels a ticket by deleting the reservation and updating available seats."""
-        # CURRENT_USER is only read here, so no 'global' declaration is needed.
-        if not CURRENT_USER:
-            print("Cancellation Failed: You must be logged in to cancel a ticket.")
-            return
+        Returns a list of (pnr_number, name, age, waitlist_position).
+        Raises ReservationError if the journey still has enough seats or the waitlist is full.
+        """
+        username = self._require_session(session)
+
+        if not passengers:
+            raise ReservationError("No passengers given.", 'invalid')
+
+        if len(passengers) > MAX_GROUP_SIZE:
+            raise ReservationError(f"At most {MAX_GROUP_SIZE} passengers can be booked together.", 'invalid')
+
+        journey_date = self._journey_date(journey_date)
+        pnr_numbers = self.pnrs.allocate(len(passengers))
+
+        with self._checkout() as (conn, cursor):
+            if not ensure_journey(conn, cursor, train_number, journey_date, INVENTORY_SLOTS):
+                raise ReservationError("Invalid Train Number.", 'not_found')
+
+            # Hold every slot, so no seat can be cancelled (and go unclaimed) while the group joins.
+            # ensure_journey has committed its reads, so no transaction is open yet (MySQL refuses to nest).
+            conn.start_transaction()
+            locked = lock_journey(cursor, train_number, journey_date)
+            if not locked:
+                raise ReservationError("Invalid Train Number.", 'not_found')
 
+            free_seats = sum(min(slot_seats, seat_map.free_count()) for _, slot_seats, seat_map in locked)
+            if free_seats >= len(passengers):
+                raise ReservationError(f"{free_seats} seats are available on this train; book them instead.", 'conflict')
+
+            waiting = count_waiting(cursor, train_number, journey_date)
+            if waiting + len(passengers) > WAITLIST_LIMIT:
+                raise ReservationError(
+                    f"The waitlist for this train is full ({waiting} of {WAITLIST_LIMIT} places taken).",
+                    'unavailable',
+                )
+
+            entries = [(pnr_number, name, age) for pnr_number, (name, age) in zip(pnr_numbers, passengers)]
+            added = add_to_waitlist(cursor, train_number, journey_date, username, entries)
+            conn.commit()
+
+        self.replicas.wrote(username)
+        self.waitlist.joined((train_number, journey_date), username, added)
+        return [
+            (pnr_number, name, age, waiting + position)
+            for position, (pnr_number, name, age) in enumerate(entries, start=1)
+        ]
+
+    def waitlist_group(self, session, train_number, journey_date, passengers):
+        """Puts passengers on a journey's waitlist (see join_waitlist). Returns the entries, or None."""
         try:
-            # FIX: Ensure any prior transactions are rolled back before starting a new one.
-            if self.db_connection.in_transaction:
-                print("Cancellation Failed: An active transaction was found. Rolling back the old one...")
-                self.db_connection.rollback()
-            
-            self.db_connection.start_transaction()
+            waitlisted = self.join_waitlist(session, train_number, journey_date, passengers)
+
+            print(f"\n--- ADDED TO WAITLIST ---")
+            print(f"Train: {train_number}")
+            print(f"Journey Date: {journey_date}")
+            for pnr_number, name, age, position in waitlisted:
+                print(f"PNR Number: {pnr_number} - Waitlist Position: {position} - Passenger: {name}, Age: {age}")
+            print("Seats are assigned automatically, in waitlist order, as other passengers cancel.")
+            return waitlisted
+
+        except ReservationError as err:
+            print(f"Waitlist Failed: {err}")
+        except DB_ERRORS as err:
+            print(f"Waitlist Error: {err}")
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+        return None
+
+    @instrumented('cancel')
+    def cancel_reservation(self, session, pnr_number):
+        """
+        Deletes a reservation owned by the session's user. Its seat goes to the first passenger
+        on the journey's waitlist, or back to the journey if nobody is waiting.
+        A waitlisted PNR is simply taken off the waitlist.
+
+        Returns (train_number, seat_number); seat_number is None for a waitlisted PNR.
+        Raises ReservationError if it cannot be cancelled.
+        """
+        username = self._require_session(session)
+        pnr_number = self._pnr(pnr_number)
+
+        with self._checkout() as (conn, cursor):
+            conn.start_transaction()
 
             # 1. Retrieve the reservation details (train_number and check user) FOR UPDATE
-            self.cursor.execute("SELECT train_number, username FROM RESERVATIONS WHERE pnr_number = %s FOR UPDATE", (pnr_number,))
-            reservation = self.cursor.fetchone()
+            cursor.execute(prepared_statement("SELECT train_number, journey_date, username, seat_number FROM RESERVATIONS WHERE pnr_number = %s FOR UPDATE"), (pnr_number,))
+            reservation = cursor.fetchone()
 
             if not reservation:
-                print(f"Cancellation Failed: PNR Number {pnr_number} not found.")
-                self.db_connection.rollback()
-                return
-            
-            train_number, booking_user = reservation
-            
-            # Check if the logged-in user owns the reservation
-            if booking_user != CURRENT_USER:
-                print(f"Cancellation Failed: You are not authorized to cancel PNR {pnr_number}. It was booked by user '{booking_user}'.")
-                self.db_connection.rollback()
-                return
-            
+                return self._leave_waitlist(conn, cursor, username, pnr_number)
+
+            train_number, journey_date, booking_user, seat_number = reservation
+
+            # Check if the acting user owns the reservation
+            if booking_user != username:
+                raise ReservationError(
+                    f"You are not authorized to cancel PNR {pnr_number}. It was booked by user '{booking_user}'.",
+                    'forbidden',
+                )
+
+            if journey_date < date.today():
+                raise ReservationError(f"PNR {pnr_number} was for a journey on {journey_date}, which has already departed.", 'invalid')
+
             # 2. Delete the reservation record
-            delete_query = "DELETE FROM RESERVATIONS WHERE pnr_number = %s"
-            self.cursor.execute(delete_query, (pnr_number,))
-            
-            # 3. Update Available Seats in TRAINS table (increase by 1)
-            update_seats_query = "UPDATE TRAINS SET available_seats = available_seats + 1 WHERE train_number = %s"
-            self.cursor.execute(update_seats_query, (train_number,))
+            delete_query = prepared_statement("DELETE FROM RESERVATIONS WHERE pnr_number = %s")
+            cursor.execute(delete_query, (pnr_number,))
+
+            # 3. Give the seat to the head of the waitlist, keeping their PNR; the seat stays taken.
+            [(slot, _, seat_map)] = lock_journey(cursor, train_number, journey_date, seat_number=seat_number)
+            promoted = pop_waitlist_head(cursor, train_number, journey_date)
+            if promoted:
+                promoted_pnr, promoted_user, name, age = promoted
+                cursor.execute(
+                    """
+                    INSERT INTO RESERVATIONS (pnr_number, train_number, journey_date, username, passenger_name, age, seat_number)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (promoted_pnr, train_number, journey_date, promoted_user, name, age, seat_number),
+                )
+            else:
+                # 4. Nobody is waiting: return the seat to the journey's seat map and increase Available Seats by 1
+                seat_map.release(seat_number)
+                store_journey(cursor, train_number, journey_date, slot, seat_map, +1)
+                record_stats(cursor, total_reservations=-1, system_booked_seats=-1)
+
+            conn.commit()
+
+        # The promoted passenger's booking changed too: their next look must see it.
+        self.replicas.wrote(username, promoted[1] if promoted else None)
+        if promoted:
+            self.waitlist.left((train_number, journey_date), promoted_pnr)
+            self.booking_cache.invalidate(pnr_number, promoted_pnr)
+        else:
+            self.booking_cache.invalidate(pnr_number)
+        return train_number, seat_number
+
+    def _leave_waitlist(self, conn, cursor, username, pnr_number):
+        """The waitlisted half of cancel_reservation (transaction already started)."""
+        cursor.execute(
+            "SELECT train_number, journey_date, username FROM WAITLIST WHERE pnr_number = %s FOR UPDATE",
+            (pnr_number,),
+        )
+        entry = cursor.fetchone()
+        if not entry:
+            raise ReservationError(f"PNR Number {pnr_number} not found.", 'not_found')
 
-            self.db_connection.commit()
+        train_number, journey_date, booking_user = entry
+        if booking_user != username:
+            raise ReservationError(
+                f"You are not authorized to cancel PNR {pnr_number}. It was booked by user '{booking_user}'.",
+                'forbidden',
+            )
+
+        cursor.execute("DELETE FROM WAITLIST WHERE pnr_number = %s", (pnr_number,))
+        conn.commit()
+        self.replicas.wrote(username)
+        self.waitlist.left((train_number, journey_date), pnr_number)
+        self.booking_cache.invalidate(pnr_number)
+        return train_number, None
+
+    def cancel_ticket(self, session, pnr_number):
+        """Cancels a ticket by deleting the reservation and updating available seats. Returns True on success."""
+        if session is None:
+            print("Cancellation Failed: You must be logged in to cancel a ticket.")
+            return False
+
+        try:
+            train_number, seat_number = self.cancel_reservation(session, pnr_number)
             print(f"\n--- CANCELLATION SUCCESSFUL! ---")
-            print(f"PNR {pnr_number} cancelled. Seat on Train {train_number} is now available.")
+            if seat_number is None:
+                print(f"PNR {pnr_number} removed from the waitlist of Train {train_number}.")
+            else:
+                print(f"PNR {pnr_number} cancelled. Seat {seat_number} on Train {train_number} has been released.")
+            return True
 
-        except mysql.connector.Error as err:
+        except ReservationError as err:
+            print(f"Cancellation Failed: {err}")
+        except DB_ERRORS as err:
             print(f"Cancellation Error: {err}")
-            self.db_connection.rollback()
         except Exception as e:
             print(f"An unexpected error occurred: {e}")
-            self.db_connection.rollback()
+        return False
 
-    def view_booking(self, pnr_number):
-        """Displays the details of a specific reservation."""
-        # CURRENT_USER is only read here, so no 'global' declaration is needed.
-        if not CURRENT_USER:
-            print("View Booking Failed: You must be logged in to view a ticket.")
-            return
-            
-        query = """
+    # --- Batch Operations (partner agency files, see batch_ingest.py) ---
+
+    @instrumented('batch')
+    def apply_train_batch(self, session, train_number, operations):
+        """
+        Applies a batch of bookings and cancellations on one train in a single transaction.
+        Admin only: each operation names the user it is made for.
+
+        operations is a list of dicts with 'op' ('book' or 'cancel') and 'username', plus
+        'journey_date', 'passenger_name' and 'age' for a booking or 'pnr_number' for a
+        cancellation. They are applied in order, so a seat cancelled early in the batch can
+        go to a booking later in it. The train's journeys in the batch are locked once (in
+        date order) and the new reservations are written with one multi-row insert.
+
+        Returns one (pnr_number, seat_number, error) per operation: error is None if the
+        operation was applied, otherwise the reason it was skipped (the rest of the batch
+        still applies). A database error rolls the whole batch back and is raised.
+        """
+        self._require_session(session, admin=True)
+
+        results = [None] * len(operations)
+        bookings = {}  # index -> (username, journey_date, name, age)
+        cancels = {}   # index -> (pnr_number, username)
+        cancel_pnrs = {}  # pnr_number -> index
+        for index, operation in enumerate(operations):
+            try:
+                username = str(operation.get('username') or '').strip()
+                if not username:
+                    raise ReservationError("No username given.", 'invalid')
+                kind = operation.get('op')
+                if kind == 'book':
+                    name = str(operation.get('passenger_name') or '').strip()
+                    try:
+                        age = int(operation.get('age'))
+                    except (TypeError, ValueError):
+                        age = 0
+                    if not name or age <= 0:
+                        raise ReservationError("A booking needs a passenger name and an age above 0.", 'invalid')
+                    journey_date = self._journey_date(operation.get('journey_date') or '')
+                    bookings[index] = (username, journey_date, name, age)
+                elif kind == 'cancel':
+                    pnr_number = self._pnr(operation.get('pnr_number'))
+                    if pnr_number in cancel_pnrs:
+                        raise ReservationError(f"PNR {pnr_number} is already cancelled earlier in this batch.", 'conflict')
+                    cancels[index] = (pnr_number, username)
+                    cancel_pnrs[pnr_number] = index
+                else:
+                    raise ReservationError(f"Unknown operation '{kind}'. Use 'book' or 'cancel'.", 'invalid')
+            except ReservationError as err:
+                results[index] = (None, None, str(err))
+
+        def fail(index, message):
+            results[index] = (None, None, message)
+
+        # Reserved before the transaction: a new block of numbers needs a connection of its own.
+        pnr_numbers = dict(zip(bookings, self.pnrs.allocate(len(bookings)))) if bookings else {}
+
+        with self._checkout() as (conn, cursor):
+            usernames = {username for username, _, _, _ in bookings.values()}
+            if usernames:
+                placeholders = ", ".join(["%s"] * len(usernames))
+                cursor.execute(f"SELECT username FROM USERS WHERE username IN ({placeholders})", tuple(usernames))
+                known = {row[0] for row in cursor.fetchall()}
+                for index, (username, _, _, _) in list(bookings.items()):
+                    if username not in known:
+                        fail(index, f"Unknown user '{username}'.")
+                        del bookings[index]
+
+            for journey_date in sorted({journey_date for _, journey_date, _, _ in bookings.values()}):
+                if not ensure_journey(conn, cursor, train_number, journey_date, INVENTORY_SLOTS):
+                    for index in bookings:
+                        fail(index, "Invalid Train Number.")
+                    bookings.clear()
+                    break
+
+            # End the transaction MySQL opened on the USERS lookup (ensure_journey may not have
+            # run to commit it): start_transaction() raises while one is open.
+            conn.commit()
+            conn.start_transaction()
+
+            # Reservation rows first, then journeys: the same lock order as cancel_reservation.
+            reservations = {}  # pnr_number -> (journey_date, username, seat_number)
+            waitlisted = {}    # pnr_number -> (journey_date, username)
+            if cancel_pnrs:
+                placeholders = ", ".join(["%s"] * len(cancel_pnrs))
+                cursor.execute(
+                    f"""
+                    SELECT pnr_number, journey_date, username, seat_number FROM RESERVATIONS
+                    WHERE train_number = %s AND pnr_number IN ({placeholders}) FOR UPDATE
+                    """,
+                    (train_number, *cancel_pnrs),
+                )
+                reservations = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+                missing = [pnr_number for pnr_number in cancel_pnrs if pnr_number not in reservations]
+                if missing:
+                    placeholders = ", ".join(["%s"] * len(missing))
+                    cursor.execute(
+                        f"""
+                        SELECT pnr_number, journey_date, username FROM WAITLIST
+                        WHERE train_number = %s AND pnr_number IN ({placeholders}) FOR UPDATE
+                        """,
+                        (train_number, *missing),
+                    )
+                    waitlisted = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+            today = date.today()
+            journey_dates = {journey_date for _, journey_date, _, _ in bookings.values()}
+            journey_dates.update(journey_date for journey_date, _, _ in reservations.values() if journey_date >= today)
+            journeys = {}  # journey_date -> {slot: [available_seats, seat_map]}
+            for journey_date in sorted(journey_dates):
+                locked = lock_journey(cursor, train_number, journey_date)
+                journeys[journey_date] = {slot: [slot_seats, seat_map] for slot, slot_seats, seat_map in locked}
+
+            deleted = []    # cancelled reservations
+            inserted = []   # new reservation rows (bookings and promoted waitlist passengers)
+            promoted = []   # (journey, pnr_number) taken off a waitlist onto a cancelled seat
+            withdrawn = []  # (journey, pnr_number) cancelled while waitlisted
+            changed = {}    # (journey_date, slot) -> change in available_seats
+            seats_booked = 0
+
+            for index in range(len(operations)):
+                if index in bookings:
+                    username, journey_date, name, age = bookings[index]
+                    slots = journeys[journey_date]
+                    allocation = allocate_seats([(slot, state[0], state[1]) for slot, state in slots.items()], 1)
+                    if allocation is None:
+                        fail(index, "No available seats left on this train.")
+                        continue
+                    [(slot, _, [seat_number])] = allocation
+                    slots[slot][0] -= 1
+                    changed[journey_date, slot] = changed.get((journey_date, slot), 0) - 1
+                    pnr_number = pnr_numbers[index]
+                    inserted.append((pnr_number, train_number, journey_date, username, name, age, seat_number))
+                    seats_booked += 1
+                    results[index] = (pnr_number, seat_number, None)
+                    continue
+
+                if index not in cancels:
+                    continue
+                pnr_number, username = cancels[index]
+
+                if pnr_number in reservations:
+                    journey_date, booking_user, seat_number = reservations[pnr_number]
+                    if booking_user != username:
+                        fail(index, f"PNR {pnr_number} was booked by user '{booking_user}', not '{username}'.")
+                    elif journey_date < today:
+                        fail(index, f"PNR {pnr_number} was for a journey on {journey_date}, which has already departed.")
+                    else:
+                        deleted.append(pnr_number)
+                        slots = journeys[journey_date]
+                        slot = next(slot for slot, (_, seat_map) in slots.items()
+                                    if seat_map.first_seat <= seat_number < seat_map.first_seat + seat_map.total_seats)
+                        # The head of the waitlist keeps their PNR and takes the seat, as in cancel_reservation.
+                        head = pop_waitlist_head(cursor, train_number, journey_date)
+                        if head:
+                            head_pnr, head_user, name, age = head
+                            inserted.append((head_pnr, train_number, journey_date, head_user, name, age, seat_number))
+                            promoted.append(((train_number, journey_date), head_pnr))
+                        else:
+                            slots[slot][1].release(seat_number)
+                            slots[slot][0] += 1
+                            changed[journey_date, slot] = changed.get((journey_date, slot), 0) + 1
+                            seats_booked -= 1
+                        results[index] = (pnr_number, seat_number, None)
+                elif pnr_number in waitlisted:
+                    journey_date, booking_user = waitlisted[pnr_number]
+                    if booking_user != username:
+                        fail(index, f"PNR {pnr_number} was booked by user '{booking_user}', not '{username}'.")
+                    elif any(pnr == pnr_number for _, pnr in promoted):
+                        fail(index, f"PNR {pnr_number} was given a seat earlier in this batch; cancel it in a later batch.")
+                    else:
+                        # Removed straight away, so a later cancellation in the batch cannot promote it.
+                        cursor.execute("DELETE FROM WAITLIST WHERE pnr_number = %s", (pnr_number,))
+                        withdrawn.append(((train_number, journey_date), pnr_number))
+                        results[index] = (pnr_number, None, None)
+                else:
+                    fail(index, f"PNR Number {pnr_number} not found on Train {train_number}.")
+
+            if deleted:
+                cursor.executemany("DELETE FROM RESERVATIONS WHERE pnr_number = %s", [(pnr_number,) for pnr_number in deleted])
+            if inserted:
+                cursor.executemany(
+                    """
+                    INSERT INTO RESERVATIONS (pnr_number, train_number, journey_date, username, passenger_name, age, seat_number)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    inserted,
+                )
+            # A slot is written if a seat was taken or released there, even when the two cancel out.
+            for (journey_date, slot), seats_delta in changed.items():
+                store_journey(cursor, train_number, journey_date, slot, journeys[journey_date][slot][1], seats_delta)
+            record_stats(cursor, total_reservations=seats_booked, system_booked_seats=seats_booked)
+            conn.commit()
+
+        self.replicas.wrote(*{operation.get('username') for operation in operations}, *(row[3] for row in inserted))
+        for journey, pnr_number in promoted + withdrawn:
+            self.waitlist.left(journey, pnr_number)
+        if deleted or promoted or withdrawn:
+            self.booking_cache.invalidate(*deleted, *(pnr for _, pnr in promoted + withdrawn))
+        return results
+
+    @instrumented('view')
+    def get_booking(self, session, pnr_number):
+        """
+        Returns the reservation (confirmed, waitlisted, archived or cancelled_by_reset) as a dict, or None if the PNR does not exist.
+        Raises ReservationError if the PNR is malformed or the reservation belongs to another user.
+
+        Records come from the PNR cache when possible (see booking_cache.py); a waitlisted
+        PNR's position is always current (see waitlist.py).
+        """
+        username = self._require_session(session)
+        pnr_number = self._pnr(pnr_number)
+
+        booking, generation = self.booking_cache.get(pnr_number)
+        if booking is None:
+            booking = self._load_booking(pnr_number, username)
+            if booking is None:
+                return None
+            # Only the owner's reads are kept in step with the owner's writes (see replicas.py),
+            # so a record someone else read from a replica is not cached.
+            if booking['booked_by'] == username:
+                self.booking_cache.put(pnr_number, booking, generation)
+
+        # Only allow viewing if the acting user is the one who booked it
+        if booking['booked_by'] != username:
+            raise ReservationError(
+                f"PNR {pnr_number} was booked by user '{booking['booked_by']}'. You cannot view this detail.",
+                'forbidden',
+            )
+
+        booking = dict(booking)
+        if booking['status'] == 'waitlisted':
+            waiting = self.waitlist.position(pnr_number)
+            # None if the passenger got a seat (or left) since the record was read.
+            booking['waitlist_position'] = waiting[2] if waiting else None
+        return booking
+
+    def _load_booking(self, pnr_number, username=None):
+        """Reads one booking record for `username` (a replica may answer; None if the PNR does not exist)."""
+        query = prepared_statement("""
             SELECT 
                 r.pnr_number, 
                 r.passenger_name, 
@@ -326,69 +1162,324 @@ class RailwayReservationSystem:
                 t.train_number,
                 t.source, 
                 t.destination,
+                r.journey_date,
                 r.booking_date,
                 r.username -- Fetch the booking user
             FROM RESERVATIONS r
             JOIN TRAINS t ON r.train_number = t.train_number
             WHERE r.pnr_number = %s
+            UNION ALL
+            -- A PNR still waiting for a seat (see join_waitlist)
+            SELECT w.pnr_number, w.passenger_name, w.age, NULL, t.train_name, t.train_number,
+                t.source, t.destination, w.journey_date, w.joined_at, w.username
+            FROM WAITLIST w
+            JOIN TRAINS t ON w.train_number = t.train_number
+            WHERE w.pnr_number = %s
+        """)
+        with self._read_checkout(username) as (conn, cursor):
+            cursor.execute(query, (pnr_number, pnr_number))
+            result = cursor.fetchall()
+            if result:
+                return self._booking_record(result[0])
+
+            # Not in the hot tables: an old booking moved to the archive (see rollover.py).
+            cursor.execute(prepared_statement("""
+                SELECT h.pnr_number, h.passenger_name, h.age, h.seat_number, t.train_name, h.train_number,
+                    t.source, t.destination, h.journey_date, h.booking_date, h.username, h.archive_reason
+                FROM RESERVATIONS_HISTORY h
+                LEFT JOIN TRAINS t ON h.train_number = t.train_number
+                WHERE h.pnr_number = %s
+            """), (pnr_number,))
+            result = cursor.fetchall()
+        if not result:
+            return None
+        *row, reason = result[0]
+        return self._booking_record(row, HISTORY_STATUS[reason])
+
+    def _booking_record(self, row, status=None):
+        """
+        Builds the booking dict from a row in _load_booking's column order. status defaults
+        to 'confirmed' or 'waitlisted' (no seat); history rows pass their HISTORY_STATUS
+        ('archived' for a completed trip, 'cancelled_by_reset' for one an admin reset cleared).
         """
-        result = self._execute_query(query, (pnr_number,), fetch=True)
+        (pnr, name, age, seat, t_name, t_num, src, dest, journey_date, booked_on, booking_user) = row
 
-        if result:
-            (pnr, name, age, seat, t_name, t_num, src, dest, date, booking_user) = result[0]
-            
-            # Only allow viewing if the logged-in user is the one who booked it
-            if booking_user != CURRENT_USER:
-                 print(f"\nView Failed: PNR {pnr_number} was booked by user '{booking_user}'. You cannot view this detail.")
-                 return
-                 
+        return {
+            'pnr_number': pnr,
+            'status': status or ('confirmed' if seat is not None else 'waitlisted'),
+            'booked_by': booking_user,
+            'train_number': t_num,
+            'train_name': t_name,
+            'source': src,
+            'destination': dest,
+            'passenger_name': name,
+            'age': age,
+            'seat_number': seat,
+            'journey_date': journey_date.isoformat(),
+            'booking_date': booked_on.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+
+    @instrumented('history')
+    def list_bookings(self, session, limit=BOOKINGS_PAGE_SIZE, after=None):
+        """
+        Returns (bookings, next_page): one page of the session user's bookings, confirmed,
+        waitlisted and archived, newest first, as get_booking dicts. Pass next_page back as `after`
+        for the following page; it is None on the last page.
+
+        Pages are found by key, not by OFFSET: next_page holds the (booking time, PNR) of
+        the last row, and the next page is read from the (username, booking_date) indexes
+        just below it. Every page costs the same however long the history is, and only
+        `limit` rows are read for it.
+        """
+        username = self._require_session(session)
+        limit = max(1, min(int(limit), MAX_BOOKINGS_PAGE_SIZE))
+        booked_before, pnr_before = self._page_key(after)
+
+        confirmed_query = prepared_statement("""
+            SELECT r.pnr_number, r.passenger_name, r.age, r.seat_number, t.train_name, t.train_number,
+                t.source, t.destination, r.journey_date, r.booking_date, r.username
+            FROM RESERVATIONS r
+            JOIN TRAINS t ON r.train_number = t.train_number
+            WHERE r.username = %s AND (r.booking_date, r.pnr_number) < (%s, %s)
+            ORDER BY r.booking_date DESC, r.pnr_number DESC
+            LIMIT %s
+        """)
+        waitlisted_query = prepared_statement("""
+            SELECT w.pnr_number, w.passenger_name, w.age, NULL, t.train_name, t.train_number,
+                t.source, t.destination, w.journey_date, w.joined_at, w.username
+            FROM WAITLIST w
+            JOIN TRAINS t ON w.train_number = t.train_number
+            WHERE w.username = %s AND (w.joined_at, w.pnr_number) < (%s, %s)
+            ORDER BY w.joined_at DESC, w.pnr_number DESC
+            LIMIT %s
+        """)
+        archived_query = prepared_statement("""
+            SELECT h.pnr_number, h.passenger_name, h.age, h.seat_number, t.train_name, h.train_number,
+                t.source, t.destination, h.journey_date, h.booking_date, h.username, h.archive_reason
+            FROM RESERVATIONS_HISTORY h
+            LEFT JOIN TRAINS t ON h.train_number = t.train_number
+            WHERE h.username = %s AND (h.booking_date, h.pnr_number) < (%s, %s)
+            ORDER BY h.booking_date DESC, h.pnr_number DESC
+            LIMIT %s
+        """)
+        # One row more than the page shows whether another page follows.
+        params = (username, booked_before, pnr_before, limit + 1)
+        rows = []
+        with self._read_checkout(username) as (conn, cursor):
+            for query in (confirmed_query, waitlisted_query):
+                cursor.execute(query, params)
+                rows += [(row, None) for row in cursor.fetchall()]
+            cursor.execute(archived_query, params)
+            rows += [(row[:-1], HISTORY_STATUS[row[-1]]) for row in cursor.fetchall()]
+
+        rows.sort(key=lambda entry: (entry[0][9], entry[0][0]), reverse=True)
+        bookings = [self._booking_record(row, status) for row, status in rows[:limit]]
+        if len(rows) <= limit:
+            return bookings, None
+        last = bookings[-1]
+        next_page = base64.urlsafe_b64encode(f"{last['booking_date']}|{last['pnr_number']}".encode()).decode()
+        return bookings, next_page
+
+    def _page_key(self, after):
+        """Decodes a next_page value from list_bookings into (booking time, PNR); the first page has none."""
+        if not after:
+            return '9999-12-31 23:59:59', ''
+        try:
+            booked_on, pnr_number = base64.urlsafe_b64decode(after.encode()).decode().split('|')
+            datetime.strptime(booked_on, '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            raise ReservationError("Invalid page cursor.", 'invalid')
+        return booked_on, self._pnr(pnr_number)
+
+    def show_bookings(self, session):
+        """Prints the session user's bookings a page at a time, newest first (see list_bookings)."""
+        if session is None:
+            print("My Bookings Failed: You must be logged in to list your bookings.")
+            return
+
+        after = None
+        shown = 0
+        try:
+            while True:
+                bookings, after = self.list_bookings(session, BOOKINGS_PAGE_SIZE, after)
+                if not shown:
+                    if not bookings:
+                        print("\nYou have no bookings.")
+                        return
+                    print(f"\n--- MY BOOKINGS ({session.username}) ---")
+                    print("{:<12} {:<8} {:<12} {:<22} {:<13} {:<20}".format(
+                        "PNR", "Train", "Journey", "Passenger", "Seat", "Booked On"
+                    ))
+                    print("-" * 90)
+                for booking in bookings:
+                    seat = {'waitlisted': "WAITLISTED", 'cancelled_by_reset': "CANCELLED"}.get(booking['status'], booking['seat_number'])
+                    print("{:<12} {:<8} {:<12} {:<22} {:<13} {:<20}".format(
+                        booking['pnr_number'], booking['train_number'], booking['journey_date'],
+                        booking['passenger_name'][:22], seat, booking['booking_date'],
+                    ))
+                shown += len(bookings)
+                if after is None:
+                    print(f"\n{shown} bookings shown.")
+                    return
+                if input("\nPress Enter for more, or 'q' to stop: ").strip().lower() == 'q':
+                    return
+        except ReservationError as err:
+            print(f"My Bookings Failed: {err}")
+        except DB_ERRORS as err:
+            print(f"Database Error: {err}")
+
+    @instrumented('view')
+    def get_waitlist_position(self, session, pnr_number):
+        """
+        Returns {'pnr_number', 'train_number', 'journey_date', 'position', 'waiting'} for a
+        waitlisted PNR of the session's user, or None if the PNR is not on a waitlist.
+        Answered from the in-memory waitlist index (see waitlist.py).
+        """
+        username = self._require_session(session)
+        pnr_number = self._pnr(pnr_number)
+
+        waiting = self.waitlist.position(pnr_number)
+        if waiting is None:
+            return None
+        train_number, journey_date, position, length, booking_user = waiting
+        if booking_user != username:
+            raise ReservationError(f"PNR {pnr_number} was booked by user '{booking_user}'.", 'forbidden')
+        return {
+            'pnr_number': pnr_number,
+            'train_number': train_number,
+            'journey_date': journey_date.isoformat(),
+            'position': position,
+            'waiting': length,
+        }
+
+    def view_booking(self, session, pnr_number):
+        """Displays the details of a specific reservation. Returns True if it was shown."""
+        if session is None:
+            print("View Booking Failed: You must be logged in to view a ticket.")
+            return False
+
+        try:
+            booking = self.get_booking(session, pnr_number)
+        except ReservationError as err:
+            print(f"\nView Failed: {err}")
+            return False
+        except DB_ERRORS as err:
+            print(f"Database Error: {err}")
+            return False
+
+        if booking:
             print("\n--- RESERVATION DETAILS ---")
-            print(f"PNR Number: {pnr}")
-            print(f"Booked By: {booking_user}")
-            print(f"Train: {t_num} - {t_name}")
-            print(f"Route: {src} to {dest}")
-            print(f"Passenger: {name} (Age: {age})")
-            print(f"Seat Number: {seat}")
-            print(f"Booked On: {date.strftime('%Y-%m-%d %H:%M:%S')}")
+            print(f"PNR Number: {booking['pnr_number']}")
+            print(f"Booked By: {booking['booked_by']}")
+            print(f"Train: {booking['train_number']} - {booking['train_name']}")
+            print(f"Route: {booking['source']} to {booking['destination']}")
+            print(f"Journey Date: {booking['journey_date']}")
+            print(f"Passenger: {booking['passenger_name']} (Age: {booking['age']})")
+            if booking['status'] == 'waitlisted':
+                print(f"Status: WAITLISTED (Position: {booking['waitlist_position']})")
+            elif booking['status'] != 'cancelled_by_reset':
+                print(f"Seat Number: {booking['seat_number']}")
+            if booking['status'] == 'archived':
+                print("Status: COMPLETED (archived)")
+            elif booking['status'] == 'cancelled_by_reset':
+                print("Status: CANCELLED BY RESET (an administrator cleared this journey's bookings before it ran)")
+            print(f"Booked On: {booking['booking_date']}")
+            return True
         else:
             print(f"\nBooking not found for PNR Number: {pnr_number}")
+            return False
 
-    def reset_seats(self):
+    @instrumented('archive')
+    def archive_journeys(self):
         """
-        Resets the available_seats for all trains to their total_seats capacity,
+        Moves the seat inventory of journeys dated before today into JOURNEYS_ARCHIVE and
+        drops their waitlists. Their reservations stay in RESERVATIONS.
+        Returns the number of journeys archived.
+        """
+        with self._checkout() as (conn, cursor):
+            conn.start_transaction()
+            archived = archive_journeys(cursor, date.today())
+            expired = expire_waitlists(cursor, date.today())
+            conn.commit()
+        if expired and self.waitlist:
+            self.waitlist.clear()
+            self.booking_cache.clear()
+            self.replicas.wrote_all()
+        return archived
+
+    def reset_seats(self, session):
+        """
+        Resets the available_seats for all journeys to their total_seats capacity,
         and clears all entries in the RESERVATIONS table.
+        With RESET_MODE = 'online' the reservations are archived and the journeys reset a
+        few at a time while bookings continue (see rollover.py).
         """
-        # CURRENT_USER and ADMIN_USERNAME are only read here, so no 'global' declaration is needed.
-        
-        if CURRENT_USER is None or CURRENT_USER.lower() != ADMIN_USERNAME.lower(): 
+        try:
+            self._require_session(session, admin=True)
+        except ReservationError:
             print("Access Denied: Only the 'admin' user can perform a full reset.")
             return
 
         print("\n--- Initiating System Reset (Seating and Reservations) ---")
+        if RESET_MODE == 'online':
+            self._online_reset()
+            return
         try:
-            self.cursor.execute("TRUNCATE TABLE RESERVATIONS")
-            update_query = "UPDATE TRAINS SET available_seats = total_seats"
-            self.cursor.execute(update_query)
-            self.db_connection.commit()
-            
-            print(f"[SUCCESS] Cleared {self.cursor.rowcount} reservations.")
+            with self._checkout() as (conn, cursor):
+                cursor.execute("SELECT COUNT(*) FROM RESERVATIONS")
+                cleared = cursor.fetchone()[0]
+                cursor.execute("TRUNCATE TABLE RESERVATIONS")
+                cursor.execute("DELETE FROM WAITLIST")
+                # Journeys are created again, with empty seat maps, as their dates get booked.
+                cursor.execute("DELETE FROM JOURNEYS")
+                set_stats(cursor, total_reservations=0, system_total_seats=0, system_booked_seats=0)
+                conn.commit()
+                self.waitlist.clear()
+                self.booking_cache.clear()
+                self.replicas.wrote_all()
+                self.analytics.invalidate()
+
+                print(f"[SUCCESS] Cleared {cleared} reservations.")
             print(f"[SUCCESS] Reset available seats for all trains to full capacity.")
-            
-        except mysql.connector.Error as err:
+
+        except DB_ERRORS as err:
             print(f"Reset Error: {err}")
-            self.db_connection.rollback()
         except Exception as e:
             print(f"An unexpected error occurred during reset: {e}")
 
-    def reset_users(self):
+    def _online_reset(self):
+        """Archives every reservation and frees every seat in batches, printing progress. Returns True when done."""
+        progress = None
+        try:
+            for progress in online_reset(self.pool, date.today(), RESET_BATCH_SIZE, RESET_PAUSE):
+                # Records of the PNRs just archived must not be served from memory.
+                self.waitlist.clear()
+                self.booking_cache.clear()
+                self.replicas.wrote_all()
+                self.analytics.invalidate()
+                if progress['phase'] == 'journeys':
+                    print(f"  ... {progress['journeys_done']}/{progress['journeys_total']} journeys reset, "
+                          f"{progress['archived']} reservations archived")
+        except DB_ERRORS as err:
+            print(f"Reset Error: {err}")
+            print("The journeys reset so far stay reset; run the reset again to finish.")
+            return False
+
+        if progress:
+            print(f"[SUCCESS] Archived {progress['archived']} reservations to RESERVATIONS_HISTORY "
+                  f"and dropped {progress['waitlist_dropped']} waitlist entries.")
+            print(f"[SUCCESS] Freed {progress['seats_freed']} seats on {progress['journeys_done']} journeys.")
+        return True
+
+    def reset_users(self, session):
         """
         Clears the USERS table and re-registers the admin user.
         Requires clearing RESERVATIONS first due to Foreign Key constraint.
+        Every session (including the caller's) is logged out afterwards.
         """
-        global CURRENT_USER
-        # ADMIN_USERNAME is only read here, so no 'global' declaration is needed.
-
-        if CURRENT_USER is None or CURRENT_USER.lower() != ADMIN_USERNAME.lower(): 
+        try:
+            self._require_session(session, admin=True)
+        except ReservationError:
             print("Access Denied: Only the 'admin' user can perform a user reset.")
             return
 
@@ -402,45 +1493,135 @@ class RailwayReservationSystem:
             print("Reset Cancelled: New admin password cannot be empty.")
             return
 
+        if RESET_MODE == 'online':
+            self._online_reset_users(new_admin_password)
+            return
         try:
-            # 1. Temporarily disable foreign key checks
-            self.cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
-            
-            # 2. Clear dependent table (RESERVATIONS)
-            self.cursor.execute("TRUNCATE TABLE RESERVATIONS")
-            
-            # 3. Clear the USERS table
-            self.cursor.execute("TRUNCATE TABLE USERS")
-            
-            # 4. Re-enable foreign key checks
-            self.cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
-            
-            self.db_connection.commit()
-            
+            with self._checkout() as (conn, cursor):
+                # 1. Temporarily disable foreign key checks
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 0")
+
+                # 2. Clear dependent tables (RESERVATIONS, WAITLIST)
+                cursor.execute("TRUNCATE TABLE RESERVATIONS")
+                cursor.execute("DELETE FROM WAITLIST")
+
+                # 3. Clear the USERS table
+                cursor.execute("TRUNCATE TABLE USERS")
+
+                # Every reservation is gone, so every seat is free again.
+                cursor.execute("DELETE FROM JOURNEYS")
+                set_stats(cursor, total_users=0, total_reservations=0, system_total_seats=0, system_booked_seats=0)
+
+                # 4. Re-enable foreign key checks
+                cursor.execute("SET FOREIGN_KEY_CHECKS = 1")
+
+                conn.commit()
+
+            # The deleted users must not keep acting through sessions they still hold.
+            self.sessions.revoke_all()
+            self.hasher.forget()
+            self.waitlist.clear()
+            self.booking_cache.clear()
+            self.replicas.wrote_all()
+            self.analytics.invalidate()
+
             # 5. Re-register the admin user immediately
             if self.register_user(ADMIN_USERNAME, new_admin_password):
                 print(f"[SUCCESS] Cleared all users and re-registered '{ADMIN_USERNAME}' with the new password.")
-                # Modify the global variable, so 'global' is needed here.
-                CURRENT_USER = None 
                 print("[WARNING] ACTION REQUIRED: You have been logged out. Please log in again using the new admin password.")
             else:
                 print("CRITICAL ERROR: Cleared users table but failed to re-register admin user.")
             
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             print(f"User Reset Error: {err}")
-            self.db_connection.rollback()
         except Exception as e:
             print(f"An unexpected error occurred during user reset: {e}")
 
+    def _online_reset_users(self, new_admin_password):
+        """reset_users for RESET_MODE = 'online': archives bookings, then deletes users in batches."""
+        # Logged-out users cannot book while their bookings are being archived.
+        self.sessions.revoke_all()
+        if not self._online_reset():
+            return
+
+        progress = {'deleted': 0, 'kept': 0}
+        try:
+            for progress in delete_users(self.pool, RESET_BATCH_SIZE, RESET_PAUSE):
+                print(f"  ... {progress['deleted']} users deleted")
+        except DB_ERRORS as err:
+            print(f"User Reset Error: {err}")
+            print("The users deleted so far stay deleted; run the reset again to finish.")
+            return
+
+        self.sessions.revoke_all()
+        self.hasher.forget()
+        if progress['kept']:
+            print(f"[WARNING] Kept {progress['kept']} users who booked again during the reset.")
+        if self.register_user(ADMIN_USERNAME, new_admin_password):
+            print(f"[SUCCESS] Cleared {progress['deleted']} users and re-registered '{ADMIN_USERNAME}' with the new password.")
+            print("[WARNING] ACTION REQUIRED: You have been logged out. Please log in again using the new admin password.")
+        else:
+            print("CRITICAL ERROR: Cleared users table but failed to re-register admin user.")
+
 # --- 3. User Interface / Menu Logic ---
 
 def clear_screen():
     """Clears the console screen for better readability."""
     os.system('cls' if os.name == 'nt' else 'clear')
 
+def choose_station(system, prompt):
+    """Asks for a station and resolves it to the exact name stored in TRAINS (None if cancelled)."""
+    text = input(prompt).strip()
+    if not text:
+        return None
+
+    match, suggestions = system.resolve_station(text)
+    if match:
+        return match
+    if not suggestions:
+        print(f"No station matching '{text}' was found.")
+        return None
+    if len(suggestions) == 1:
+        print(f"Using station: {suggestions[0]}")
+        return suggestions[0]
+
+    print("Did you mean:")
+    for i, name in enumerate(suggestions, start=1):
+        print(f"  {i}. {name}")
+    choice = input(f"Choose a station (1-{len(suggestions)}, or press Enter to cancel): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(suggestions):
+        return suggestions[int(choice) - 1]
+    return None
+
+def read_journey_date():
+    """Asks for the travel date as YYYY-MM-DD text (today if left empty); it is validated by the search."""
+    text = input("Enter Journey Date (YYYY-MM-DD, press Enter for today): ").strip()
+    return text or date.today().isoformat()
+
+def read_passengers():
+    """Asks for the passenger count and each passenger's name and age. Returns [] on invalid input."""
+    count_text = input(f"Enter Number of Passengers (1-{MAX_GROUP_SIZE}, default 1): ").strip() or "1"
+    if not count_text.isdigit() or not 1 <= int(count_text) <= MAX_GROUP_SIZE:
+        print("Invalid number of passengers.")
+        return []
+
+    passengers = []
+    for i in range(int(count_text)):
+        label = f" {i + 1}" if count_text != "1" else ""
+        name = input(f"Enter Passenger{label} Name (Name on ticket): ").strip()
+        try:
+            age = int(input(f"Enter Passenger{label} Age: "))
+        except ValueError:
+            print("Invalid input for age.")
+            return []
+        if age <= 0:
+            print("Invalid age entered.")
+            return []
+        passengers.append((name, age))
+    return passengers
+
 def auth_menu(system):
-    """Handles the initial Login/Register menu."""
-    global CURRENT_USER 
+    """Handles the initial Login/Register menu. Returns the logged-in Session, or None to exit."""
     # ADMIN_SECRET_CODE and ADMIN_USERNAME are only read here, so no 'global' is needed.
 
     while True:
@@ -456,30 +1637,26 @@ def auth_menu(system):
         choice = input(f"Enter your choice (1-3, or type '{ADMIN_SECRET_CODE}' for admin menu): ").strip().upper()
         
         if choice == '3':
-            return False
+            return None
 
         # --- ADMIN MENU CHECK ---
         if choice == ADMIN_SECRET_CODE:
-            # Modify the global variable, so 'global' is needed here.
-            CURRENT_USER = None 
-            
             print("\n--- Admin Access Attempt ---")
             username = input("Enter Admin Username: ").strip()
             password = input("Enter Admin Password: ").strip()
             
-            # Attempt to login. login_user will set CURRENT_USER on success.
-            if system.login_user(username, password):
+            # Attempt to login. login_user returns a Session on success.
+            session = system.login_user(username, password)
+            if session:
                 # SUCCESS: Now check if the logged-in user is the designated admin.
-                if CURRENT_USER and CURRENT_USER.lower() == ADMIN_USERNAME.lower():
-                    print(f"\n[SUCCESS] Admin login successful! Welcome, {CURRENT_USER}.")
+                if session.username.lower() == ADMIN_USERNAME.lower():
+                    print(f"\n[SUCCESS] Admin login successful! Welcome, {session.username}.")
                     input("Press Enter to continue to admin dashboard...")
-                    admin_menu(system)
-                    # Modify the global variable, so 'global' is needed here.
-                    CURRENT_USER = None 
+                    admin_menu(system, session)
                 else:
                     print("\nAdmin Access Failed: Login successful, but user is not the designated 'admin' user.")
-                    # Modify the global variable, so 'global' is needed here.
-                    CURRENT_USER = None 
+                # The admin session ends when the dashboard is left.
+                system.logout_user(session)
             
             input("\nPress Enter to continue...")
             continue # Loop back to the start of auth_menu
@@ -492,11 +1669,12 @@ def auth_menu(system):
             password = input("Enter Password: ").strip()
 
             if choice == '1':
-                # The login_user sets CURRENT_USER and returns bool.
-                if system.login_user(username, password):
-                    print(f"\n[SUCCESS] Login successful! Welcome, {CURRENT_USER}.")
+                # The login_user returns a Session, or None if the login failed.
+                session = system.login_user(username, password)
+                if session:
+                    print(f"\n[SUCCESS] Login successful! Welcome, {session.username}.")
                     input("Press Enter to continue to main menu...")
-                    return True # Go to main_menu
+                    return session # Go to main_menu
             elif choice == '2':
                 system.register_user(username, password)
             
@@ -505,12 +1683,12 @@ def auth_menu(system):
              print("\nInvalid choice.")
              input("\nPress Enter to continue...")
 
-def admin_menu(system):
+def admin_menu(system, session):
     """Displays the admin menu with stats and handles admin actions."""
-    # CURRENT_USER and ADMIN_USERNAME are only read here, so no 'global' is needed.
+    # ADMIN_USERNAME is only read here, so no 'global' is needed.
     
     # Use case-insensitive check against the official ADMIN_USERNAME
-    if CURRENT_USER is None or CURRENT_USER.lower() != ADMIN_USERNAME.lower():
+    if session is None or session.username.lower() != ADMIN_USERNAME.lower():
         print("\nADMIN ACCESS DENIED: Only the 'admin' user can access this menu.")
         input("Press Enter to return to the main menu...")
         return
@@ -531,6 +1709,14 @@ def admin_menu(system):
             print(f"Total System Seat Capacity: {stats['system_total_seats']}")
             print(f"Total Seats Booked: {stats['system_booked_seats']}")
             print(f"System Occupancy Rate: {stats['occupancy_percent']:.2f}%")
+            cache = stats['pnr_cache']
+            print(f"PNR Cache: {cache['hits']} hits, {cache['misses']} misses ({cache['hit_rate']:.1%} hit rate, {cache['entries']} cached)")
+            replicas = stats['replicas']
+            for replica in replicas['replicas']:
+                lag = f"{replica['lag_seconds']:.2f}s behind" if replica['lag_seconds'] is not None else "unreachable"
+                print(f"Read Replica {replica['replica'] + 1}: {lag}{'' if replica['serving'] else ' (not serving reads)'}")
+            if replicas['replicas']:
+                print(f"Reads Served: {replicas['reads']['replica']} by replicas, {replicas['reads']['primary']} by the primary")
             print("---------------------------------")
         else:
             print("Could not load system statistics.")
@@ -538,27 +1724,33 @@ def admin_menu(system):
         print("\n--- Admin Actions ---")
         print("1. Reset All Seats & Clear Bookings (DANGER)")
         print("2. Reset All Users & Re-register Admin (DANGER)")
-        print("3. Return to Main Menu")
+        print("3. Show Query Metrics")
+        print("4. Show Occupancy & Booking Analytics")
+        print("5. Return to Main Menu")
         print("----------------------------------------------")
         
-        choice = input("Enter your choice (1-3): ").strip()
+        choice = input("Enter your choice (1-5): ").strip()
         
         if choice == '1':
             confirm = input("DANGER: Are you absolutely sure you want to delete ALL reservations and reset seats? (Type 'YES' to confirm): ").strip().upper()
             if confirm == 'YES':
-                system.reset_seats()
+                system.reset_seats(session)
             else:
                 print("Database reset cancelled.")
         elif choice == '2':
             confirm = input("DANGER: Are you absolutely sure you want to delete ALL users (including non-admin) and their associated data? (Type 'YES' to confirm): ").strip().upper()
             if confirm == 'YES':
-                system.reset_users()
-                # If reset_users succeeds, it will clear CURRENT_USER and the loop will return to auth_menu next.
-                if CURRENT_USER is None:
+                system.reset_users(session)
+                # If reset_users succeeds, every session is logged out and we return to auth_menu.
+                if system.sessions.get(session.token) is None:
                     return 
             else:
                 print("User table reset cancelled.")
         elif choice == '3':
+            system.show_metrics()
+        elif choice == '4':
+            system.show_analytics(session)
+        elif choice == '5':
             return # Exit admin menu and return to auth_menu
         else:
             print("\nInvalid choice.")
@@ -567,8 +1759,6 @@ def admin_menu(system):
 
 def main_menu():
     """Displays the main menu and handles user input."""
-    global CURRENT_USER 
-    
     system = RailwayReservationSystem()
 
     if not system.connect():
@@ -576,7 +1766,8 @@ def main_menu():
         return
         
     # --- Start with Authentication ---
-    if not auth_menu(system):
+    session = auth_menu(system)
+    if not session:
         print("\nThank you for using the Railway Reservation System. Goodbye!")
         system.disconnect()
         return
@@ -586,52 +1777,57 @@ def main_menu():
         clear_screen()
         # Display logged-in status
         print("==============================================")
-        print(f"  RAILWAY RESERVATION SYSTEM | User: {CURRENT_USER}")
+        print(f"  RAILWAY RESERVATION SYSTEM | User: {session.username}")
         print("==============================================")
         print("1. Search & Book Train")
         print("2. View My Reservation Details (by PNR)")
         print("3. Cancel My Reservation (by PNR)")
-        print("4. Logout / Exit")
+        print("4. My Bookings")
+        print("5. Logout / Exit")
         print("----------------------------------------------")
         
-        choice = input("Enter your choice (1-4): ").strip().upper()
+        choice = input("Enter your choice (1-5): ").strip().upper()
 
         if choice == '1':
-            source = input("Enter Source Station: ").strip()
-            destination = input("Enter Destination Station: ").strip()
-            
-            if system.search_trains(source, destination):
+            source = choose_station(system, "Enter Source Station: ")
+            destination = choose_station(system, "Enter Destination Station: ") if source else None
+            if not source or not destination:
+                input("\nPress Enter to continue...")
+                continue
+            journey_date = read_journey_date()
+
+            found = system.search_trains(source, destination, journey_date)
+            if not found:
+                found = system.search_connections(source, destination, journey_date)
+
+            if found:
                 train_num = input("\nEnter Train Number to book (or press Enter to return to menu): ").strip()
                 if train_num:
-                    name = input("Enter Passenger Name (Name on ticket): ").strip()
-                    try:
-                        age = int(input("Enter Passenger Age: "))
-                        if age > 0:
-                            system.book_ticket(train_num, name, age)
-                        else:
-                            print("Invalid age entered.")
-                    except ValueError:
-                        print("Invalid input for age.")
+                    passengers = read_passengers()
+                    if passengers:
+                        system.book_group(session, train_num, journey_date, passengers, offer_waitlist=True)
             
         elif choice == '2':
             pnr = input("Enter PNR Number to view: ").strip().upper()
             if pnr:
-                system.view_booking(pnr)
+                system.view_booking(session, pnr)
 
         elif choice == '3':
             pnr = input("Enter PNR Number to cancel: ").strip().upper()
             if pnr:
-                system.cancel_ticket(pnr)
+                system.cancel_ticket(session, pnr)
 
         elif choice == '4':
-            # Modify the global variable, so 'global' is needed here.
-            CURRENT_USER = None
+            system.show_bookings(session)
+
+        elif choice == '5':
+            system.logout_user(session)
             print("\nLogged out successfully.")
             system.disconnect()
             return
         
         else:
-            print("\nInvalid choice. Please enter a number between 1 and 4.")
+            print("\nInvalid choice. Please enter a number between 1 and 5.")
 
         input("\nPress Enter to continue...")
 
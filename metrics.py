@@ -0,0 +1,290 @@
+# Query instrumentation for the Railway Reservation System.
+# Every statement run through a pooled connection is timed and attributed to the logical
+# operation (search, book, cancel, view, ...) that issued it, so latency can be broken
+# down into pool wait, statement time and the rest of the operation.
+#
+#   system.metrics.snapshot()        # dict: per-operation histograms, slowest statements
+#   system.metrics.dump("m.json")    # the same, written as JSON
+#   GET /admin/metrics               # the same, over the HTTP API
+#
+# Statements slower than the threshold are written to the slow-query log (SQL text,
+# operation, time and row count; parameters are never logged).
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+# Upper bounds (milliseconds) of the latency histogram buckets; the last bucket is open.
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+slow_log = logging.getLogger("railway.slow_queries")
+
+_operation = contextvars.ContextVar("railway_operation", default="other")
+
+
+def current_operation():
+    return _operation.get()
+
+def instrumented(name):
+    """
+    Decorator for RailwayReservationSystem methods: statements run inside the method are
+    attributed to operation `name`, and the whole call is timed as one operation.
+    """
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            token = _operation.set(name)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = method(self, *args, **kwargs)
+                failed = False
+                return result
+            finally:
+                _operation.reset(token)
+                self.metrics.record_operation(name, time.perf_counter() - start, failed)
+        return wrapper
+    return decorate
+
+def _statement_key(query):
+    """One line of SQL per statement shape: comments dropped, whitespace collapsed, placeholder lists folded."""
+    query = " ".join(re.sub(r"--[^\n]*", "", query).split())
+    query = re.sub(r"%s(?:, %s)+", "%s, ...", query)
+    return re.sub(r"\(%s, ...\)(?:, \(%s, ...\))+", "(%s, ...), ...", query)
+
+
+class Histogram:
+    """Latency histogram over BUCKETS_MS, with count, sum and maximum."""
+
+    __slots__ = ('counts', 'count', 'total', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        ms = seconds * 1000
+        index = 0
+        while index < len(BUCKETS_MS) and ms > BUCKETS_MS[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += ms
+        self.maximum = max(self.maximum, ms)
+
+    def quantile(self, fraction):
+        """Upper bound (ms) of the bucket holding the given quantile (the maximum for the open bucket)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.maximum
+        return self.maximum
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count if self.count else 0.0,
+            'p50_ms': self.quantile(0.50),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': self.maximum,
+            'buckets_ms': {str(bound): count for bound, count in zip(BUCKETS_MS + ('+inf',), self.counts)},
+        }
+
+
+class _OperationStats:
+    __slots__ = ('latency', 'db_time', 'pool_wait', 'statements', 'rows', 'errors', 'db_errors')
+
+    def __init__(self):
+        self.latency = Histogram()    # whole operation
+        self.db_time = Histogram()    # each statement (and commit)
+        self.pool_wait = Histogram()  # each connection checkout
+        self.statements = 0
+        self.rows = 0                 # rows written plus rows fetched
+        self.errors = 0
+        self.db_errors = 0
+
+
+class QueryMetrics:
+    """Thread-safe collector of operation and statement timings (see module comment)."""
+
+    def __init__(self, slow_threshold=0.1, max_statements=500):
+        self.slow_threshold = slow_threshold
+        self.max_statements = max_statements
+        self.started_at = time.time()
+        self._operations = {}  # name -> _OperationStats
+        self._statements = {}  # statement key -> [count, total_ms, max_ms]
+        self._lock = threading.Lock()
+
+    def _stats(self, operation):
+        stats = self._operations.get(operation)
+        if stats is None:
+            stats = self._operations[operation] = _OperationStats()
+        return stats
+
+    def record_operation(self, operation, seconds, failed):
+        with self._lock:
+            stats = self._stats(operation)
+            stats.latency.add(seconds)
+            if failed:
+                stats.errors += 1
+
+    def record_pool_wait(self, seconds):
+        with self._lock:
+            self._stats(current_operation()).pool_wait.add(seconds)
+
+    def record_rows(self, rows):
+        """Counts rows fetched by the current operation."""
+        if rows:
+            with self._lock:
+                self._stats(current_operation()).rows += rows
+
+    def record_statement(self, query, seconds, rows, error=None):
+        """Records one statement; rows is the cursor's rowcount (rows written, -1 for most SELECTs)."""
+        operation = current_operation()
+        key = _statement_key(query)
+        with self._lock:
+            stats = self._stats(operation)
+            stats.db_time.add(seconds)
+            stats.statements += 1
+            stats.rows += max(rows, 0)
+            if error is not None:
+                stats.db_errors += 1
+            entry = self._statements.get(key)
+            if entry is None and len(self._statements) < self.max_statements:
+                entry = self._statements[key] = [0, 0.0, 0.0]
+            if entry is not None:
+                entry[0] += 1
+                entry[1] += seconds * 1000
+                entry[2] = max(entry[2], seconds * 1000)
+
+        if error is not None:
+            slow_log.warning("FAILED op=%s %.1f ms %s: %s", operation, seconds * 1000, key, error)
+        elif seconds >= self.slow_threshold:
+            slow_log.warning("SLOW op=%s %.1f ms rowcount=%d %s", operation, seconds * 1000, rows, key)
+
+    def snapshot(self, top=20):
+        """Returns every metric as plain data (JSON-serialisable)."""
+        with self._lock:
+            operations = {
+                name: {
+                    'latency': stats.latency.to_dict(),
+                    'db_time': stats.db_time.to_dict(),
+                    'pool_wait': stats.pool_wait.to_dict(),
+                    'statements': stats.statements,
+                    'rows': stats.rows,
+                    'errors': stats.errors,
+                    'db_errors': stats.db_errors,
+                }
+                for name, stats in sorted(self._operations.items())
+            }
+            statements = sorted(self._statements.items(), key=lambda item: item[1][1], reverse=True)[:top]
+        return {
+            'since': self.started_at,
+            'slow_threshold_ms': self.slow_threshold * 1000,
+            'operations': operations,
+            'top_statements': [
+                {'sql': key, 'count': count, 'total_ms': total, 'mean_ms': total / count, 'max_ms': maximum}
+                for key, (count, total, maximum) in statements
+            ],
+        }
+
+    def dump(self, path):
+        with open(path, mode='w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._operations.clear()
+            self._statements.clear()
+            self.started_at = time.time()
+
+
+# --- Connection wrappers (installed by ConnectionPool when it has metrics) ---
+
+class InstrumentedCursor:
+    """Times execute/executemany on a DB-API cursor; everything else is passed through."""
+
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+
+    def _timed(self, method, query, params):
+        start = time.perf_counter()
+        try:
+            method(query, params)
+        except Exception as err:
+            self._metrics.record_statement(query, time.perf_counter() - start, 0, err)
+            raise
+        self._metrics.record_statement(query, time.perf_counter() - start, self._cursor.rowcount)
+
+    def execute(self, query, params=()):
+        self._timed(self._cursor.execute, query, params)
+
+    def executemany(self, query, seq_params):
+        self._timed(self._cursor.executemany, query, seq_params)
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        self._metrics.record_rows(1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._metrics.record_rows(len(rows))
+        return rows
+
+    def fetchmany(self, size=1):
+        rows = self._cursor.fetchmany(size)
+        self._metrics.record_rows(len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """Hands out instrumented cursors and times commits; everything else is passed through."""
+
+    def __init__(self, conn, metrics):
+        self._conn = conn
+        self._metrics = metrics
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._metrics)
+
+    def commit(self):
+        start = time.perf_counter()
+        self._conn.commit()
+        self._metrics.record_statement("COMMIT", time.perf_counter() - start, 0)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def configure_slow_log(path):
+    """Sends the slow-query log to a file (appending), or discards it when path is None."""
+    for handler in list(slow_log.handlers):
+        if getattr(handler, 'baseFilename', None) == (os.path.abspath(path) if path else None):
+            return
+    slow_log.propagate = False
+    for handler in list(slow_log.handlers):
+        slow_log.removeHandler(handler)
+        handler.close()
+    if path:
+        handler = logging.FileHandler(path, encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        slow_log.addHandler(handler)
+    else:
+        slow_log.addHandler(logging.NullHandler())
@@ -0,0 +1,12 @@
+-- Route index for search_trains (WHERE source = ? AND destination = ? AND available_seats > 0).
+-- available_seats is left out on purpose: it changes on every booking and would
+-- turn each seat update into an extra index write.
+CREATE INDEX idx_trains_route ON TRAINS (source, destination);
+
+-- Change feed for in-process indexes: every write that changes a train's
+-- name or route records the train number here in the same transaction.
+CREATE TABLE TRAIN_CHANGES (
+    change_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    train_number VARCHAR(10) NOT NULL,
+    changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,8 @@
+-- Seat numbers only need to be unique within a train, not across the whole table.
+ALTER TABLE RESERVATIONS
+    DROP INDEX seat_number,
+    ADD UNIQUE KEY uq_reservations_train_seat (train_number, seat_number);
+
+-- Bitmap of taken seats (1 bit per seat, 1250 bytes = up to 10,000 seats).
+-- NULL means "not built yet": it is rebuilt from RESERVATIONS on the next booking.
+ALTER TABLE TRAINS ADD COLUMN seat_map VARBINARY(1250) NULL;
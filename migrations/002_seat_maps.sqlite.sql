@@ -0,0 +1,21 @@
+-- SQLite cannot drop a column UNIQUE constraint, so RESERVATIONS is rebuilt with
+-- seat numbers unique per train instead of across the whole table.
+CREATE TABLE RESERVATIONS_NEW (
+    pnr_number VARCHAR(20) PRIMARY KEY,
+    train_number VARCHAR(10) NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    passenger_name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    seat_number INT NOT NULL,
+    booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (train_number, seat_number),
+    FOREIGN KEY (train_number) REFERENCES TRAINS(train_number),
+    FOREIGN KEY (username) REFERENCES USERS(username)
+);
+INSERT INTO RESERVATIONS_NEW (pnr_number, train_number, username, passenger_name, age, seat_number, booking_date)
+    SELECT pnr_number, train_number, username, passenger_name, age, seat_number, booking_date FROM RESERVATIONS;
+DROP TABLE RESERVATIONS;
+ALTER TABLE RESERVATIONS_NEW RENAME TO RESERVATIONS;
+
+-- Bitmap of taken seats (1 bit per seat). NULL means "not built yet".
+ALTER TABLE TRAINS ADD COLUMN seat_map BLOB;
@@ -0,0 +1,9 @@
+-- Shared login sessions (SESSION_BACKEND = 'database'), so several API processes
+-- accept each other's tokens. Only a SHA-256 digest of each token is stored.
+CREATE TABLE SESSIONS (
+    session_key CHAR(64) PRIMARY KEY,
+    username VARCHAR(50) NOT NULL,
+    expires_at BIGINT NOT NULL
+);
+
+CREATE INDEX idx_sessions_expires ON SESSIONS (expires_at);
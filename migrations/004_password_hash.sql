@@ -0,0 +1,3 @@
+-- Salted KDF hashes ("scrypt$<cost>$<salt>$<hash>", see credentials.py) are longer than the
+-- 128-character SHA-512 hex digests the column was sized for.
+ALTER TABLE USERS MODIFY password_hash VARCHAR(255) NOT NULL;
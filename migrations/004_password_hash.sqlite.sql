@@ -0,0 +1 @@
+-- SQLite does not enforce VARCHAR lengths, so password_hash needs no change here.
@@ -0,0 +1,15 @@
+-- Materialized admin dashboard counters (see admin_stats.py). Each figure is the SUM of
+-- its slot rows; writers add their deltas to a random slot to avoid one hot row.
+CREATE TABLE ADMIN_STATS (
+    stat_name VARCHAR(50) NOT NULL,
+    slot INT NOT NULL,
+    value BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (stat_name, slot)
+);
+
+-- Start from the current contents of the tables.
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'total_users', 0, COUNT(*) FROM USERS;
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'total_trains', 0, COUNT(*) FROM TRAINS;
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'total_reservations', 0, COUNT(*) FROM RESERVATIONS;
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'system_total_seats', 0, COALESCE(SUM(total_seats), 0) FROM TRAINS;
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'system_booked_seats', 0, COALESCE(SUM(total_seats - available_seats), 0) FROM TRAINS;
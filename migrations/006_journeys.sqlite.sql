@@ -0,0 +1,57 @@
+-- Journey instances: one seat inventory per train per travel date, created the first
+-- time that date is booked. TRAINS.total_seats is the capacity new journeys start with;
+-- TRAINS.available_seats is no longer changed by bookings.
+CREATE TABLE JOURNEYS (
+    train_number VARCHAR(10) NOT NULL,
+    journey_date DATE NOT NULL,
+    total_seats INT NOT NULL,
+    available_seats INT NOT NULL,
+    seat_map VARBINARY(1250) NULL,
+    PRIMARY KEY (train_number, journey_date),
+    FOREIGN KEY (train_number) REFERENCES TRAINS(train_number)
+);
+
+CREATE INDEX idx_journeys_date ON JOURNEYS (journey_date);
+
+-- Inventory of journeys that have departed (see archive_journeys in seat_inventory.py).
+CREATE TABLE JOURNEYS_ARCHIVE (
+    train_number VARCHAR(10) NOT NULL,
+    journey_date DATE NOT NULL,
+    total_seats INT NOT NULL,
+    available_seats INT NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (train_number, journey_date)
+);
+
+-- Existing reservations travel on the day they were booked. SQLite cannot change a
+-- table's UNIQUE constraint, so RESERVATIONS is rebuilt with seats unique per journey.
+CREATE TABLE RESERVATIONS_NEW (
+    pnr_number VARCHAR(20) PRIMARY KEY,
+    train_number VARCHAR(10) NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    passenger_name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    seat_number INT NOT NULL,
+    booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    journey_date DATE NOT NULL,
+    UNIQUE (train_number, journey_date, seat_number),
+    FOREIGN KEY (train_number) REFERENCES TRAINS(train_number),
+    FOREIGN KEY (username) REFERENCES USERS(username)
+);
+INSERT INTO RESERVATIONS_NEW (pnr_number, train_number, username, passenger_name, age, seat_number, booking_date, journey_date)
+    SELECT pnr_number, train_number, username, passenger_name, age, seat_number, booking_date, DATE(booking_date) FROM RESERVATIONS;
+DROP TABLE RESERVATIONS;
+ALTER TABLE RESERVATIONS_NEW RENAME TO RESERVATIONS;
+
+-- Journeys for those reservations; their seat maps are rebuilt on the next booking.
+INSERT INTO JOURNEYS (train_number, journey_date, total_seats, available_seats)
+    SELECT r.train_number, r.journey_date, t.total_seats, t.total_seats - COUNT(*)
+    FROM RESERVATIONS r JOIN TRAINS t ON t.train_number = r.train_number
+    GROUP BY r.train_number, r.journey_date, t.total_seats;
+
+ALTER TABLE TRAINS DROP COLUMN seat_map;
+
+-- Seat capacity and occupancy on the dashboard now cover the open journeys.
+DELETE FROM ADMIN_STATS WHERE stat_name IN ('system_total_seats', 'system_booked_seats');
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'system_total_seats', 0, COALESCE(SUM(total_seats), 0) FROM JOURNEYS;
+INSERT INTO ADMIN_STATS (stat_name, slot, value) SELECT 'system_booked_seats', 0, COALESCE(SUM(total_seats - available_seats), 0) FROM JOURNEYS;
@@ -0,0 +1,8 @@
+-- Sharded seat inventory: a journey can be split into several slot rows, each owning
+-- the seats first_seat .. first_seat + total_seats - 1. Existing journeys become a
+-- single slot 0 holding every seat (INVENTORY_SLOTS = 1 keeps creating them that way).
+ALTER TABLE JOURNEYS
+    ADD COLUMN slot INT NOT NULL DEFAULT 0,
+    ADD COLUMN first_seat INT NOT NULL DEFAULT 1,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (train_number, journey_date, slot);
@@ -0,0 +1,21 @@
+-- Sharded seat inventory: a journey can be split into several slot rows, each owning
+-- the seats first_seat .. first_seat + total_seats - 1. Existing journeys become a
+-- single slot 0 holding every seat (INVENTORY_SLOTS = 1 keeps creating them that way).
+-- SQLite cannot change a primary key, so JOURNEYS is rebuilt.
+CREATE TABLE JOURNEYS_NEW (
+    train_number VARCHAR(10) NOT NULL,
+    journey_date DATE NOT NULL,
+    slot INT NOT NULL DEFAULT 0,
+    first_seat INT NOT NULL DEFAULT 1,
+    total_seats INT NOT NULL,
+    available_seats INT NOT NULL,
+    seat_map BLOB,
+    PRIMARY KEY (train_number, journey_date, slot),
+    FOREIGN KEY (train_number) REFERENCES TRAINS(train_number)
+);
+INSERT INTO JOURNEYS_NEW (train_number, journey_date, slot, first_seat, total_seats, available_seats, seat_map)
+    SELECT train_number, journey_date, 0, 1, total_seats, available_seats, seat_map FROM JOURNEYS;
+DROP TABLE JOURNEYS;
+ALTER TABLE JOURNEYS_NEW RENAME TO JOURNEYS;
+
+CREATE INDEX idx_journeys_date ON JOURNEYS (journey_date);
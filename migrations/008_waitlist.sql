@@ -0,0 +1,16 @@
+-- Waitlists of full journeys (see waitlist.py). Passengers are served in waitlist_id
+-- order; the PNR is handed out on joining and kept when the passenger gets a seat.
+CREATE TABLE WAITLIST (
+    waitlist_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    pnr_number VARCHAR(20) NOT NULL UNIQUE,
+    train_number VARCHAR(10) NOT NULL,
+    journey_date DATE NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    passenger_name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    joined_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (train_number) REFERENCES TRAINS(train_number),
+    FOREIGN KEY (username) REFERENCES USERS(username)
+);
+
+CREATE INDEX idx_waitlist_journey ON WAITLIST (train_number, journey_date, waitlist_id);
@@ -0,0 +1,8 @@
+-- Source of PNR numbers (see pnr.py). Each process reserves a block of numbers at a
+-- time by advancing next_value in a short transaction of its own.
+CREATE TABLE PNR_SEQUENCE (
+    name VARCHAR(20) PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+INSERT INTO PNR_SEQUENCE (name, next_value) VALUES ('pnr', 1);
@@ -0,0 +1,5 @@
+-- "My bookings" (see list_bookings in main.py): a user's bookings newest first. Pages
+-- continue after the (booking time, PNR) of the last row shown, so each page is a short
+-- range scan of these indexes however far back it is.
+CREATE INDEX idx_reservations_user_booked ON RESERVATIONS (username, booking_date, pnr_number);
+CREATE INDEX idx_waitlist_user_joined ON WAITLIST (username, joined_at, pnr_number);
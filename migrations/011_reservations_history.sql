@@ -0,0 +1,15 @@
+-- Reservations moved out of RESERVATIONS by an online reset (see rollover.py). No
+-- foreign keys, so the users and trains they refer to can be removed later.
+CREATE TABLE RESERVATIONS_HISTORY (
+    pnr_number VARCHAR(20) PRIMARY KEY,
+    train_number VARCHAR(10) NOT NULL,
+    journey_date DATE NOT NULL,
+    username VARCHAR(50) NOT NULL,
+    passenger_name VARCHAR(100) NOT NULL,
+    age INT NOT NULL,
+    seat_number INT NOT NULL,
+    booking_date TIMESTAMP NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_history_journey ON RESERVATIONS_HISTORY (train_number, journey_date);
@@ -0,0 +1,6 @@
+-- RESERVATIONS_HISTORY is also the cold store for completed bookings (see
+-- archive_completed in rollover.py). Old rows are read rarely, so they are kept
+-- compressed; the indexes serve PNR fallback lookups, "My Bookings" and date-range reports.
+ALTER TABLE RESERVATIONS_HISTORY ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8;
+CREATE INDEX idx_history_user_booked ON RESERVATIONS_HISTORY (username, booking_date, pnr_number);
+CREATE INDEX idx_history_date ON RESERVATIONS_HISTORY (journey_date);
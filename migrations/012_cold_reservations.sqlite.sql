@@ -0,0 +1,4 @@
+-- RESERVATIONS_HISTORY is also the cold store for completed bookings (see
+-- archive_completed in rollover.py). SQLite has no row compression.
+CREATE INDEX idx_history_user_booked ON RESERVATIONS_HISTORY (username, booking_date, pnr_number);
+CREATE INDEX idx_history_date ON RESERVATIONS_HISTORY (journey_date);
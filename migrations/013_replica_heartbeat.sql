@@ -0,0 +1,9 @@
+-- Replication heartbeat (see replicas.py). The primary writes the current time (seconds
+-- since the epoch) here every heartbeat interval; a replica's copy of the row shows how
+-- far behind the primary it is.
+CREATE TABLE REPLICA_HEARTBEAT (
+    name VARCHAR(20) PRIMARY KEY,
+    beat_at DOUBLE NOT NULL
+);
+
+INSERT INTO REPLICA_HEARTBEAT (name, beat_at) VALUES ('primary', 0);
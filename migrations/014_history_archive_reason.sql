@@ -0,0 +1,7 @@
+-- Why a row is in RESERVATIONS_HISTORY: 'completed' (its journey ran; see archive_completed
+-- in rollover.py) or 'reset' (an admin reset cleared the booking before its journey; see
+-- reset_journey). Lookups show the two differently.
+ALTER TABLE RESERVATIONS_HISTORY ADD COLUMN archive_reason VARCHAR(10) NOT NULL DEFAULT 'completed';
+
+-- Rows archived before this column existed: only a reset archives a journey that had not run yet.
+UPDATE RESERVATIONS_HISTORY SET archive_reason = 'reset' WHERE journey_date >= DATE(archived_at);
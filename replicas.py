@@ -0,0 +1,204 @@
+# Read replicas for the Railway Reservation System.
+# Searches, booking lookups, booking history and the dashboards only read, so they can be
+# served by replicas of the primary database; bookings, cancellations and every other
+# write (the FOR UPDATE transactions) stay on the primary.
+#
+# Staleness bound: every heartbeat interval the primary's REPLICA_HEARTBEAT row is set to
+# the current time and replication carries it to the replicas, so a replica's copy of the
+# row shows how far behind it is. A replica more than max_lag seconds behind (or
+# unreachable) is skipped; when no replica is fresh enough, reads go to the primary.
+#
+# Read-your-writes: after a write commits, the users it touched are noted with the time.
+# Their reads stay on the primary until a replica has a heartbeat written after that time,
+# and with it everything committed before. (With parallel replication appliers this needs
+# replica_preserve_commit_order=ON, the MySQL 8.0.27+ default.) The guarantee holds for
+# writes made through this process; other processes only promise max_lag.
+#
+#   router = ReplicaRouter(primary_pool, [replica_pool, ...], max_lag=2.0)
+#   with router.connection(username) as conn: ...     # a fresh replica, or the primary
+#   router.wrote(username)                             # after committing a write for username
+
+import itertools
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from storage import DB_ERRORS
+
+BEAT_SQL = "UPDATE REPLICA_HEARTBEAT SET beat_at = %s WHERE name = 'primary'"
+READ_BEAT_SQL = "SELECT beat_at FROM REPLICA_HEARTBEAT WHERE name = 'primary'"
+RETRY_AFTER = 5.0          # Seconds an unreachable replica is left alone before it is tried again
+PRUNE_WRITERS_AT = 1000    # Tracked writers before entries older than max_lag are dropped
+
+
+class ReplicaRouter:
+    """
+    Sends reads to replica pools that are within max_lag of the primary, and to the
+    primary otherwise (see module comment). Exposes connection() like a ConnectionPool,
+    so read-only helpers written for a pool can be handed the router instead.
+    """
+
+    def __init__(self, primary, replicas, max_lag=2.0, heartbeat_interval=0.5):
+        """
+        Args:
+            primary (ConnectionPool): Pool of the primary database; the heartbeat is written there.
+            replicas (list): ConnectionPools of the replicas (owned by the router; closed with it).
+            max_lag (float): Seconds a replica may trail the primary and still serve reads.
+            heartbeat_interval (float): Seconds between heartbeats; must be well below max_lag.
+        """
+        if replicas and heartbeat_interval >= max_lag:
+            raise ValueError("The heartbeat interval must be shorter than the allowed replica lag.")
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.heartbeat_interval = heartbeat_interval
+        self.reads = {'replica': 0, 'primary': 0}  # Reads served by each, since start
+        self._seen = {}          # replica index -> (heartbeat on the replica, monotonic time it was read)
+        self._down_until = {}    # replica index -> monotonic time to try an unreachable replica again
+        self._written = {}       # username (lower case) -> time.time() of the user's last write
+        self._everyone = 0.0     # time.time() of the last write that concerns every user (resets)
+        self._prune_at = PRUNE_WRITERS_AT
+        self._turn = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Heartbeat (primary) ---
+
+    def _beat(self):
+        with self.primary.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(BEAT_SQL, (time.time(),))
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._beat()
+            except DB_ERRORS:
+                pass  # The replicas look older until the primary is back, so reads move to it.
+
+    def start(self):
+        """Writes a first heartbeat and keeps writing them from a background thread (no-op without replicas)."""
+        if not self.replicas or self._thread is not None:
+            return
+        self._beat()
+        self._thread = threading.Thread(target=self._run, name="replica-heartbeat", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """Stops the heartbeat and closes the replica pools (the primary pool belongs to the caller)."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for pool in self.replicas:
+            pool.close()
+
+    # --- Write tracking ---
+
+    def wrote(self, *usernames):
+        """Records a committed write touching these users' bookings; their reads wait for the replicas to have it."""
+        if not self.replicas:
+            return
+        now = time.time()
+        with self._lock:
+            for username in usernames:
+                if username:
+                    self._written[username.lower()] = now
+            if len(self._written) > self._prune_at:
+                # A write older than max_lag is on every replica fresh enough to be read anyway.
+                cutoff = now - self.max_lag
+                self._written = {user: at for user, at in self._written.items() if at >= cutoff}
+                self._prune_at = max(PRUNE_WRITERS_AT, 2 * len(self._written))
+
+    def wrote_all(self):
+        """Records a committed write that concerns every user (a reset): all reads wait for the replicas to have it."""
+        if self.replicas:
+            with self._lock:
+                self._everyone = time.time()
+
+    # --- Reads ---
+
+    def _mark_down(self, index):
+        with self._lock:
+            self._seen.pop(index, None)
+            self._down_until[index] = time.monotonic() + RETRY_AFTER
+
+    def _heartbeat_on(self, index):
+        """
+        The primary time replica `index` has caught up to, or None if it cannot be reached.
+        Re-read at most every half heartbeat interval; a cached value only under-states the replica.
+        """
+        now = time.monotonic()
+        with self._lock:
+            seen = self._seen.get(index)
+            if seen is not None and now - seen[1] < self.heartbeat_interval / 2:
+                return seen[0]
+            if self._down_until.get(index, 0.0) > now:
+                return None
+        try:
+            with self.replicas[index].connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(READ_BEAT_SQL)
+                    row = cursor.fetchone()
+                finally:
+                    cursor.close()
+        except DB_ERRORS:
+            self._mark_down(index)
+            return None
+        beat = float(row[0]) if row else None
+        with self._lock:
+            self._seen[index] = (beat, now)
+        return beat
+
+    def _choose(self, username):
+        """Index of a replica fresh enough for this read (round robin), or None for the primary."""
+        if not self.replicas:
+            return None
+        now = time.time()
+        with self._lock:
+            needed = max(self._everyone, self._written.get(username.lower(), 0.0) if username else 0.0)
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            index = (start + offset) % len(self.replicas)
+            beat = self._heartbeat_on(index)
+            if beat is not None and now - beat <= self.max_lag and beat >= needed:
+                return index
+        return None
+
+    @contextmanager
+    def connection(self, username=None):
+        """
+        Checks out a connection for read-only work: from a replica within max_lag that has
+        every write recorded for `username` (see wrote), otherwise from the primary.
+        """
+        index = self._choose(username)
+        with ExitStack() as stack:
+            conn, served_by = None, 'replica'
+            if index is not None:
+                try:
+                    conn = stack.enter_context(self.replicas[index].connection())
+                except DB_ERRORS:
+                    self._mark_down(index)
+            if conn is None:
+                conn, served_by = stack.enter_context(self.primary.connection()), 'primary'
+            with self._lock:
+                self.reads[served_by] += 1
+            yield conn
+
+    def status(self):
+        """Returns each replica's lag (seconds, None if unreachable) and the read counts, as plain data."""
+        now = time.time()
+        replicas = []
+        for index in range(len(self.replicas)):
+            beat = self._heartbeat_on(index)
+            lag = now - beat if beat is not None else None
+            replicas.append({'replica': index, 'lag_seconds': lag, 'serving': lag is not None and lag <= self.max_lag})
+        with self._lock:
+            reads = dict(self.reads)
+        return {'max_lag_seconds': self.max_lag, 'replicas': replicas, 'reads': reads}
@@ -0,0 +1,281 @@
+# Online reset ("rollover") and archival for the Railway Reservation System.
+# The offline reset empties RESERVATIONS and JOURNEYS in one transaction, which locks
+# out every booking while it runs. The online reset works one journey at a time
+# instead: each journey's reservations are moved to RESERVATIONS_HISTORY and its seats
+# freed in a short transaction, with a pause after every batch of journeys, so bookings
+# and searches on other journeys carry on and wait at most one journey's transaction.
+#
+# Bookings made on a journey after it has been reset are kept: the reset covers what
+# was booked before it reached each journey. Reservations it archives for journeys that
+# have not run are marked archive_reason 'reset', so lookups do not show them as trips taken.
+#
+# Archival keeps RESERVATIONS small: reservations for journeys that ran more than
+# ARCHIVE_AFTER_DAYS ago (main.py) move to RESERVATIONS_HISTORY in small batches, where
+# PNR lookups and "My Bookings" still find them.
+#   python rollover.py                    # once
+#   python rollover.py --interval 86400   # every day
+
+import sqlite3
+import time
+
+from admin_stats import record_stats
+from storage import DB_ERRORS
+from waitlist import expire_waitlists
+
+HISTORY_COLUMNS = "pnr_number, train_number, journey_date, username, passenger_name, age, seat_number, booking_date"
+
+# Attempts per transaction: a cancellation locks its reservation before the journey,
+# the reverse of this reset, so MySQL may pick one of them as a deadlock victim.
+ATTEMPTS = 3
+ER_LOCK_WAIT_TIMEOUT = 1205
+ER_LOCK_DEADLOCK = 1213
+
+
+def archive_reservations(cursor, where, params, reason='completed'):
+    """
+    Moves the RESERVATIONS rows matching `where` into RESERVATIONS_HISTORY with archive_reason
+    `reason` ('completed' or 'reset'). Returns how many moved.
+    """
+    cursor.execute(
+        f"""
+        INSERT INTO RESERVATIONS_HISTORY ({HISTORY_COLUMNS}, archive_reason)
+        SELECT {HISTORY_COLUMNS}, %s FROM RESERVATIONS WHERE {where}
+        """,
+        (reason, *params),
+    )
+    cursor.execute(f"DELETE FROM RESERVATIONS WHERE {where}", params)
+    return cursor.rowcount
+
+def reset_journey(cursor, train_number, journey_date, today):
+    """
+    Archives one journey's reservations, drops its waitlist and frees every seat.
+    Call inside a transaction. The slot rows are locked first, as a booking does.
+    Reservations are archived as 'reset', or as 'completed' if the journey ran before today.
+    Returns (reservations archived, seats freed, waitlisted passengers dropped).
+    """
+    journey = (train_number, journey_date)
+    cursor.execute(
+        "SELECT SUM(total_seats - available_seats) FROM JOURNEYS WHERE train_number = %s AND journey_date = %s FOR UPDATE",
+        journey,
+    )
+    booked_seats = int(cursor.fetchone()[0] or 0)
+    reason = 'completed' if journey_date < today else 'reset'
+    archived = archive_reservations(cursor, "train_number = %s AND journey_date = %s", journey, reason)
+    cursor.execute("DELETE FROM WAITLIST WHERE train_number = %s AND journey_date = %s", journey)
+    dropped = cursor.rowcount
+    # A NULL seat map is rebuilt from RESERVATIONS (now empty) on the next booking.
+    cursor.execute(
+        "UPDATE JOURNEYS SET available_seats = total_seats, seat_map = NULL WHERE train_number = %s AND journey_date = %s",
+        journey,
+    )
+    record_stats(cursor, total_reservations=-archived, system_booked_seats=-booked_seats)
+    return archived, booked_seats, dropped
+
+def archive_departed(cursor, before_date, after_pnr, batch_size):
+    """
+    Archives up to batch_size reservations for journeys before before_date (they have no
+    JOURNEYS row once archive_journeys has run), in PNR order after after_pnr.
+    Call inside a transaction. Returns (reservations archived, last PNR looked at).
+    """
+    cursor.execute(
+        "SELECT pnr_number FROM RESERVATIONS WHERE pnr_number > %s AND journey_date < %s ORDER BY pnr_number LIMIT %s FOR UPDATE",
+        (after_pnr, before_date, batch_size),
+    )
+    pnr_numbers = [row[0] for row in cursor.fetchall()]
+    if not pnr_numbers:
+        return 0, None
+    placeholders = ", ".join(["%s"] * len(pnr_numbers))
+    archived = archive_reservations(cursor, f"pnr_number IN ({placeholders})", pnr_numbers)
+    record_stats(cursor, total_reservations=-archived)
+    return archived, pnr_numbers[-1]
+
+def _lock_conflict(err):
+    """True for a deadlock victim or a lock wait timeout (SQLite: database locked), which a retry can cure."""
+    if isinstance(err, sqlite3.OperationalError):
+        return "locked" in str(err) or "busy" in str(err)
+    return getattr(err, 'errno', None) in (ER_LOCK_DEADLOCK, ER_LOCK_WAIT_TIMEOUT)
+
+def _in_transaction(conn, cursor, work, *args):
+    """
+    Runs work(cursor, *args) in a transaction of its own, retrying deadlock victims and lock
+    wait timeouts. No transaction may be open on conn: commit (or roll back) reads first.
+    """
+    for attempt in range(ATTEMPTS):
+        try:
+            conn.start_transaction()
+            result = work(cursor, *args)
+            conn.commit()
+            return result
+        except DB_ERRORS as err:
+            conn.rollback()
+            if attempt == ATTEMPTS - 1 or not _lock_conflict(err):
+                raise
+            time.sleep(0.05 * (attempt + 1))
+
+def online_reset(pool, today, batch_size=50, pause=0.05):
+    """
+    Resets every journey and archives every reservation while bookings continue.
+
+    Journeys are visited in key order, batch_size per connection checkout, each in its own
+    transaction; the generator sleeps `pause` seconds between batches (the connection is
+    back in the pool meanwhile). Reservations of departed journeys follow, batch_size per
+    transaction. After every batch it yields a progress dict:
+    {'phase': 'journeys' or 'departed', 'journeys_done', 'journeys_total', 'archived',
+    'seats_freed', 'waitlist_dropped'}.
+    """
+    progress = {
+        'phase': 'journeys', 'journeys_done': 0, 'journeys_total': 0,
+        'archived': 0, 'seats_freed': 0, 'waitlist_dropped': 0,
+    }
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            # Every journey has a slot 0.
+            cursor.execute("SELECT COUNT(*) FROM JOURNEYS WHERE slot = 0")
+            progress['journeys_total'] = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    last = ('', '0001-01-01')
+    while True:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    """
+                    SELECT train_number, journey_date FROM JOURNEYS
+                    WHERE slot = 0 AND (train_number, journey_date) > (%s, %s)
+                    ORDER BY train_number, journey_date LIMIT %s
+                    """,
+                    (*last, batch_size),
+                )
+                journeys = cursor.fetchall()
+                conn.commit()  # end the read's transaction (MySQL opens one on SELECT) before each journey's own
+                for train_number, journey_date in journeys:
+                    archived, freed, dropped = _in_transaction(conn, cursor, reset_journey, train_number, journey_date, today)
+                    progress['journeys_done'] += 1
+                    progress['archived'] += archived
+                    progress['seats_freed'] += freed
+                    progress['waitlist_dropped'] += dropped
+            finally:
+                cursor.close()
+        if not journeys:
+            break
+        last = tuple(journeys[-1])
+        yield dict(progress)
+        time.sleep(pause)
+
+    progress['phase'] = 'departed'
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            progress['waitlist_dropped'] += _in_transaction(conn, cursor, expire_waitlists, today)
+        finally:
+            cursor.close()
+
+    archived_journeys = progress['archived']
+    for archived in archive_completed(pool, today, batch_size, pause):
+        progress['archived'] = archived_journeys + archived
+        yield dict(progress)
+
+def archive_completed(pool, before_date, batch_size=500, pause=0.05):
+    """
+    Moves the reservations for journeys before before_date to RESERVATIONS_HISTORY,
+    batch_size per transaction with a pause between batches. Their journeys have run, so
+    no seat counts change. Yields the number archived so far after every batch.
+    """
+    archived = 0
+    after_pnr = ''
+    while after_pnr is not None:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                moved, after_pnr = _in_transaction(conn, cursor, archive_departed, before_date, after_pnr, batch_size)
+                archived += moved
+            finally:
+                cursor.close()
+        yield archived
+        if after_pnr is not None:
+            time.sleep(pause)
+
+def delete_users(pool, batch_size=50, pause=0.05):
+    """
+    Deletes every user, batch_size per transaction with a pause between batches.
+    Users who still have reservations or waitlist entries (e.g. booked after the online
+    reset passed their journey) are kept. Yields {'deleted', 'kept'} after every batch.
+    """
+    progress = {'deleted': 0, 'kept': 0}
+    last = ''
+    while True:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT username FROM USERS WHERE username > %s ORDER BY username LIMIT %s", (last, batch_size))
+                usernames = [row[0] for row in cursor.fetchall()]
+                conn.commit()  # end the read's transaction (MySQL opens one on SELECT); the delete gets its own
+                if usernames:
+                    placeholders = ", ".join(["%s"] * len(usernames))
+                    conn.start_transaction()
+                    cursor.execute(
+                        f"""
+                        DELETE FROM USERS WHERE username IN ({placeholders})
+                        AND username NOT IN (SELECT username FROM RESERVATIONS WHERE username IN ({placeholders}))
+                        AND username NOT IN (SELECT username FROM WAITLIST WHERE username IN ({placeholders}))
+                        """,
+                        usernames * 3,
+                    )
+                    deleted = cursor.rowcount
+                    record_stats(cursor, total_users=-deleted)
+                    conn.commit()
+                    progress['deleted'] += deleted
+                    progress['kept'] += len(usernames) - deleted
+            finally:
+                cursor.close()
+        if not usernames:
+            return
+        last = usernames[-1]
+        yield dict(progress)
+        time.sleep(pause)
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import date, timedelta
+
+    import main
+    from seat_inventory import archive_journeys
+    from storage import create_pool
+
+    parser = argparse.ArgumentParser(description="Move completed bookings to RESERVATIONS_HISTORY.")
+    parser.add_argument("--backend", choices=("mysql", "sqlite"), default=main.DB_BACKEND)
+    parser.add_argument("--sqlite-path", default=main.SQLITE_PATH)
+    parser.add_argument("--days", type=int, default=main.ARCHIVE_AFTER_DAYS, help="archive journeys that ran this many days ago or earlier")
+    parser.add_argument("--batch-size", type=int, default=500, help="reservations per transaction")
+    parser.add_argument("--interval", type=float, default=0, help="seconds between runs (0 runs once)")
+    args = parser.parse_args()
+
+    pool = create_pool(args.backend, mysql_config=main.DB_CONFIG, sqlite_path=args.sqlite_path, size=1)
+    try:
+        while True:
+            today = date.today()
+            try:
+                with pool.connection() as conn:
+                    cursor = conn.cursor()
+                    try:
+                        journeys = _in_transaction(conn, cursor, archive_journeys, today)
+                        dropped = _in_transaction(conn, cursor, expire_waitlists, today)
+                    finally:
+                        cursor.close()
+                archived = 0
+                for archived in archive_completed(pool, today - timedelta(days=args.days), args.batch_size):
+                    print(f"  ... {archived} reservations archived")
+                print(f"[OK] Archived {journeys} departed journeys, {archived} reservations; dropped {dropped} waitlist entries.")
+            except DB_ERRORS as err:
+                print(f"Archival Error: {err}")
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
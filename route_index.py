@@ -0,0 +1,119 @@
+# In-process route index for the Railway Reservation System.
+# Keeps a hash map of (source, destination) -> train numbers so search_trains only has
+# to ask the database for live seat counts of trains that actually run on the route.
+
+import threading
+import time
+
+def record_train_changes(cursor, train_numbers):
+    """
+    Appends the given trains to the TRAIN_CHANGES feed.
+    Call this inside the same transaction that inserts or edits the TRAINS rows.
+    """
+    if train_numbers:
+        cursor.executemany("INSERT INTO TRAIN_CHANGES (train_number) VALUES (%s)", [(number,) for number in train_numbers])
+
+
+class RouteIndex:
+    """
+    Hash index of (source, destination) -> tuple of train numbers.
+
+    The index is loaded once from TRAINS and then refreshed incrementally from the
+    TRAIN_CHANGES feed, at most once every refresh_interval seconds.
+    """
+
+    def __init__(self, pool, refresh_interval=5.0):
+        self.pool = pool
+        self.refresh_interval = refresh_interval
+        self.version = 0          # Bumped whenever the indexed routes change
+        self._routes = {}         # (source, destination) -> tuple of train numbers
+        self._train_routes = {}   # train_number -> (source, destination)
+        self._last_change_id = 0
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _add(self, train_number, route):
+        self._train_routes[train_number] = route
+        self._routes[route] = self._routes.get(route, ()) + (train_number,)
+
+    def _remove(self, train_number):
+        route = self._train_routes.pop(train_number, None)
+        if route is None:
+            return
+        remaining = tuple(number for number in self._routes[route] if number != train_number)
+        if remaining:
+            self._routes[route] = remaining
+        else:
+            del self._routes[route]
+
+    def load(self):
+        """Builds the whole index from TRAINS."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            # Read the feed position first, so changes made during the load are replayed later.
+            cursor.execute("SELECT COALESCE(MAX(change_id), 0) FROM TRAIN_CHANGES")
+            last_change_id = cursor.fetchone()[0]
+            cursor.execute("SELECT train_number, source, destination FROM TRAINS")
+            rows = cursor.fetchall()
+            cursor.close()
+
+        with self._lock:
+            self._routes = {}
+            self._train_routes = {}
+            for train_number, source, destination in rows:
+                self._add(train_number, (source, destination))
+            self._last_change_id = last_change_id
+            self._last_refresh = time.monotonic()
+            self.version += 1
+        return len(rows)
+
+    def refresh(self, force=False):
+        """Applies new TRAIN_CHANGES entries to the index. Returns the number of trains re-read."""
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return 0
+
+        with self._lock:
+            # Callers that waited for the lock find the refresh another one just made.
+            now = time.monotonic()
+            if not force and now - self._last_refresh < self.refresh_interval:
+                return 0
+            self._last_refresh = now
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT change_id, train_number FROM TRAIN_CHANGES WHERE change_id > %s ORDER BY change_id",
+                    (self._last_change_id,),
+                )
+                changes = cursor.fetchall()
+                if not changes:
+                    cursor.close()
+                    return 0
+
+                changed_trains = sorted({train_number for _, train_number in changes})
+                placeholders = ", ".join(["%s"] * len(changed_trains))
+                cursor.execute(
+                    f"SELECT train_number, source, destination FROM TRAINS WHERE train_number IN ({placeholders})",
+                    tuple(changed_trains),
+                )
+                rows = cursor.fetchall()
+                cursor.close()
+
+            for train_number in changed_trains:
+                self._remove(train_number)
+            for train_number, source, destination in rows:
+                self._add(train_number, (source, destination))
+            self._last_change_id = changes[-1][0]
+            self.version += 1
+            return len(changed_trains)
+
+    def train_routes(self):
+        """Returns a snapshot of {train_number: (source, destination)} for every indexed train."""
+        self.refresh()
+        with self._lock:
+            return dict(self._train_routes), self.version
+
+    def lookup(self, source, destination):
+        """Returns the train numbers running from source to destination (possibly empty)."""
+        self.refresh()
+        return self._routes.get((source, destination), ())
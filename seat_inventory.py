@@ -0,0 +1,249 @@
+# Seat inventory for the Railway Reservation System.
+# Tracks exactly which seats of each journey (a train on one travel date) are taken, so
+# cancelled seats are handed out again instead of being skipped or double-booked by
+# "total - available + 1" arithmetic.
+#
+# A journey's seats live in one or more JOURNEYS rows ("slots"), each owning a disjoint
+# range of seat numbers with its own counter and seat map. With a single slot every
+# booking on the journey locks the same row; with K slots a booking locks one random
+# slot that has room, so concurrent bookers on a popular train rarely wait for each other.
+
+import random
+
+from admin_stats import record_stats
+from storage import prepared_statement
+
+# Statements run by every booking and cancellation (prepared once per connection).
+JOURNEY_EXISTS_SQL = prepared_statement("SELECT 1 FROM JOURNEYS WHERE train_number = %s AND journey_date = %s LIMIT 1")
+SLOT_SEATS_SQL = prepared_statement("SELECT slot, available_seats FROM JOURNEYS WHERE train_number = %s AND journey_date = %s")
+_LOCK_SLOTS = """
+    SELECT slot, first_seat, available_seats, total_seats, seat_map FROM JOURNEYS
+    WHERE train_number = %s AND journey_date = %s"""
+LOCK_ALL_SLOTS_SQL = prepared_statement(_LOCK_SLOTS + " ORDER BY slot FOR UPDATE")
+LOCK_SLOT_SQL = prepared_statement(_LOCK_SLOTS + " AND slot = %s FOR UPDATE")
+LOCK_SEAT_SLOT_SQL = prepared_statement(_LOCK_SLOTS + " AND first_seat <= %s AND first_seat + total_seats > %s FOR UPDATE")
+STORE_SLOT_SQL = prepared_statement("""
+    UPDATE JOURNEYS SET available_seats = available_seats + %s, seat_map = %s
+    WHERE train_number = %s AND journey_date = %s AND slot = %s
+""")
+
+
+class SeatMap:
+    """
+    Bitmap of a range of seats (a whole journey, or one slot of it starting at first_seat):
+    bit (seat_number - first_seat) is set when the seat is taken.
+
+    The bits live in one Python int, so "first free seat" is a couple of big-int
+    operations (C speed, a few machine words for a train) instead of a Python loop.
+    The map is stored in JOURNEYS.seat_map as little-endian bytes (1 bit per seat).
+    """
+
+    def __init__(self, total_seats, bits=0, first_seat=1):
+        self.total_seats = total_seats
+        self.first_seat = first_seat
+        self._full = (1 << total_seats) - 1
+        self._bits = bits & self._full
+
+    @classmethod
+    def from_bytes(cls, total_seats, data, first_seat=1):
+        return cls(total_seats, int.from_bytes(data or b"", "little"), first_seat)
+
+    @classmethod
+    def from_seat_numbers(cls, total_seats, seat_numbers, first_seat=1):
+        bits = 0
+        for seat_number in seat_numbers:
+            bits |= 1 << (seat_number - first_seat)
+        return cls(total_seats, bits, first_seat)
+
+    def to_bytes(self):
+        return self._bits.to_bytes((self.total_seats + 7) // 8, "little")
+
+    def free_count(self):
+        return self.total_seats - bin(self._bits).count("1")
+
+    def is_taken(self, seat_number):
+        return bool(self._bits >> (seat_number - self.first_seat) & 1)
+
+    def first_free(self):
+        """Returns the lowest free seat number, or None if the train is full."""
+        if self._bits == self._full:
+            return None
+        # (bits + 1) & ~bits isolates the lowest zero bit.
+        return ((self._bits + 1) & ~self._bits).bit_length() + self.first_seat - 1
+
+    def find_block(self, count):
+        """Returns the first seat of the lowest run of `count` adjacent free seats, or None."""
+        free = ~self._bits & self._full
+        starts = free
+        for shift in range(1, count):
+            starts &= free >> shift
+        if not starts:
+            return None
+        return (starts & -starts).bit_length() + self.first_seat - 1
+
+    def allocate(self, count):
+        """
+        Takes `count` seats: one contiguous block when possible, otherwise the lowest free seats.
+        Returns the seat numbers, or None (and takes nothing) if not enough seats are free.
+        """
+        if count > self.free_count():
+            return None
+        first = self.find_block(count)
+        if first is not None:
+            seats = list(range(first, first + count))
+        else:
+            seats = []
+            bits = self._bits
+            for _ in range(count):
+                lowest_free = (bits + 1) & ~bits
+                seats.append(lowest_free.bit_length() + self.first_seat - 1)
+                bits |= lowest_free
+        for seat_number in seats:
+            self._bits |= 1 << (seat_number - self.first_seat)
+        return seats
+
+    def release(self, seat_number):
+        """Returns a seat to the pool."""
+        self._bits &= ~(1 << (seat_number - self.first_seat))
+
+
+def ensure_journey(conn, cursor, train_number, journey_date, slots=1):
+    """
+    Creates the journey (train on one travel date) from the train's capacity if it does not
+    exist yet, split into `slots` rows with disjoint seat ranges, and commits.
+    Returns False if the train does not exist.
+
+    This runs in its own short transaction before the booking transaction: two bookings
+    that both find the rows missing would otherwise deadlock on the insert (MySQL gap locks).
+    Every path commits, so the caller can start its transaction next: with autocommit off,
+    MySQL opens a transaction on the first SELECT and start_transaction() refuses to nest.
+    """
+    cursor.execute(JOURNEY_EXISTS_SQL, (train_number, journey_date))
+    if cursor.fetchone():
+        conn.commit()
+        return True
+
+    cursor.execute("SELECT total_seats FROM TRAINS WHERE train_number = %s", (train_number,))
+    train_info = cursor.fetchone()
+    if not train_info:
+        conn.commit()
+        return False
+
+    total_seats = train_info[0]
+    slots = max(1, min(slots, total_seats))
+    rows = []
+    first_seat = 1
+    for slot in range(slots):
+        # Spread the seats evenly; the first (total_seats % slots) slots get one extra.
+        seat_count = total_seats // slots + (1 if slot < total_seats % slots else 0)
+        rows.append((train_number, journey_date, slot, first_seat, seat_count, seat_count))
+        first_seat += seat_count
+
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    cursor.execute(
+        f"INSERT IGNORE INTO JOURNEYS (train_number, journey_date, slot, first_seat, total_seats, available_seats) VALUES {placeholders}",
+        [value for row in rows for value in row],
+    )
+    if cursor.rowcount == len(rows):
+        record_stats(cursor, system_total_seats=total_seats)
+    conn.commit()
+    return True
+
+def pick_slot(cursor, train_number, journey_date, count, rng=random):
+    """
+    Returns a random slot of the journey with at least `count` free seats (a plain read,
+    no lock), or None when the journey has a single slot or no slot has enough room on
+    its own, in which case the caller locks every slot.
+    """
+    cursor.execute(SLOT_SEATS_SQL, (train_number, journey_date))
+    rows = cursor.fetchall()
+    candidates = [slot for slot, available_seats in rows if available_seats >= count]
+    if len(rows) < 2 or not candidates:
+        return None
+    return rng.choice(candidates)
+
+def lock_journey(cursor, train_number, journey_date, slot=None, seat_number=None):
+    """
+    Locks journey slot rows (FOR UPDATE, in slot order) and returns a list of
+    (slot, available_seats, SeatMap): only `slot` if given, else the slot that owns
+    `seat_number` if given, else every slot. The list is empty if there is no such journey.
+
+    Slots without a stored map (rows created before seat maps existed, or after a reset)
+    get one built from their current RESERVATIONS.
+    """
+    if slot is not None:
+        cursor.execute(LOCK_SLOT_SQL, (train_number, journey_date, slot))
+    elif seat_number is not None:
+        cursor.execute(LOCK_SEAT_SLOT_SQL, (train_number, journey_date, seat_number, seat_number))
+    else:
+        cursor.execute(LOCK_ALL_SLOTS_SQL, (train_number, journey_date))
+
+    locked = []
+    for slot, first_seat, available_seats, total_seats, data in cursor.fetchall():
+        if data is None:
+            cursor.execute(
+                """
+                SELECT seat_number FROM RESERVATIONS
+                WHERE train_number = %s AND journey_date = %s AND seat_number >= %s AND seat_number < %s
+                """,
+                (train_number, journey_date, first_seat, first_seat + total_seats),
+            )
+            seat_map = SeatMap.from_seat_numbers(total_seats, [row[0] for row in cursor.fetchall()], first_seat)
+        else:
+            seat_map = SeatMap.from_bytes(total_seats, data, first_seat)
+        locked.append((slot, available_seats, seat_map))
+    return locked
+
+def allocate_seats(locked, count):
+    """
+    Takes `count` seats from locked slots: a contiguous block inside one slot when possible,
+    otherwise free seats slot by slot. Returns [(slot, seat_map, seat_numbers), ...] for the
+    slots that changed, or None (and takes nothing) if the slots do not have enough seats.
+    """
+    if count > sum(min(available_seats, seat_map.free_count()) for _, available_seats, seat_map in locked):
+        return None
+    for slot, available_seats, seat_map in locked:
+        if available_seats >= count and seat_map.find_block(count) is not None:
+            return [(slot, seat_map, seat_map.allocate(count))]
+
+    taken = []
+    remaining = count
+    for slot, available_seats, seat_map in locked:
+        share = min(remaining, available_seats, seat_map.free_count())
+        if share > 0:
+            taken.append((slot, seat_map, seat_map.allocate(share)))
+            remaining -= share
+        if not remaining:
+            break
+    return taken
+
+def store_journey(cursor, train_number, journey_date, slot, seat_map, seats_delta):
+    """Writes a slot's updated seat map and adjusts its available_seats by seats_delta (row must be locked)."""
+    cursor.execute(STORE_SLOT_SQL, (seats_delta, seat_map.to_bytes(), train_number, journey_date, slot))
+
+def archive_journeys(cursor, before_date):
+    """
+    Moves the inventory of journeys that ran before before_date into JOURNEYS_ARCHIVE (one
+    row per journey, slots summed) and takes them off the dashboard's seat figures.
+    Call inside a transaction. Returns the number of journeys archived.
+    """
+    cursor.execute(
+        "SELECT SUM(total_seats), SUM(total_seats - available_seats) FROM JOURNEYS WHERE journey_date < %s FOR UPDATE",
+        (before_date,),
+    )
+    total_seats, booked_seats = cursor.fetchone()
+    if total_seats is None:
+        return 0
+
+    cursor.execute(
+        """
+        INSERT INTO JOURNEYS_ARCHIVE (train_number, journey_date, total_seats, available_seats)
+        SELECT train_number, journey_date, SUM(total_seats), SUM(available_seats) FROM JOURNEYS
+        WHERE journey_date < %s GROUP BY train_number, journey_date
+        """,
+        (before_date,),
+    )
+    count = cursor.rowcount
+    cursor.execute("DELETE FROM JOURNEYS WHERE journey_date < %s", (before_date,))
+    record_stats(cursor, system_total_seats=-int(total_seats), system_booked_seats=-int(booked_seats))
+    return count
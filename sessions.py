@@ -0,0 +1,181 @@
+# Login sessions for the Railway Reservation System.
+# login_user hands out a signed token; every reservation call carries the Session it
+# belongs to, so one process can serve many logged-in users at the same time.
+
+import base64
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+
+class Session:
+    """One logged-in user. The token is what clients send back with every request."""
+
+    __slots__ = ('token', 'username', 'expires_at', 'checked_at')
+
+    def __init__(self, token, username, expires_at, checked_at=0.0):
+        self.token = token
+        self.username = username
+        self.expires_at = expires_at
+        self.checked_at = checked_at
+
+    def __repr__(self):
+        return f"Session(username={self.username!r}, expires_at={self.expires_at})"
+
+
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class SessionStore:
+    """
+    Issues and checks signed session tokens.
+
+    A token is "<user>.<expiry>.<nonce>.<signature>" (HMAC-SHA256 over the first three
+    parts), so forged or expired tokens are rejected without any lookup. Live sessions
+    are kept in memory in expiry order (all sessions share one TTL), which makes
+    evicting expired entries a pop from the front.
+
+    With a shared backend (see DatabaseSessionBackend), sessions are also written there
+    so other processes accept them; a locally cached session is re-checked against the
+    backend every recheck_interval seconds to pick up logouts made elsewhere.
+    """
+
+    def __init__(self, secret, ttl=1800, backend=None, recheck_interval=5.0):
+        self._key = secret.encode() if isinstance(secret, str) else secret
+        self.ttl = ttl
+        self.backend = backend
+        self.recheck_interval = recheck_interval
+        self._sessions = OrderedDict()  # token -> Session, oldest (first to expire) first
+        self._lock = threading.Lock()
+
+    def _sign(self, payload):
+        return _b64(hmac.new(self._key, payload.encode(), hashlib.sha256).digest())
+
+    def _verify(self, token):
+        """Returns (username, expires_at) for a token with a valid signature, otherwise None."""
+        try:
+            user_part, expiry_part, nonce, signature = token.split(".")
+            payload = f"{user_part}.{expiry_part}.{nonce}"
+            if not hmac.compare_digest(signature, self._sign(payload)):
+                return None
+            return _unb64(user_part).decode(), int(expiry_part)
+        except (AttributeError, ValueError):
+            return None
+
+    def _evict_expired(self, now):
+        while self._sessions:
+            token, session = next(iter(self._sessions.items()))
+            if session.expires_at > now:
+                break
+            del self._sessions[token]
+
+    def create(self, username):
+        """Starts a session for an authenticated user and returns it."""
+        now = time.time()
+        expires_at = int(now + self.ttl)
+        payload = f"{_b64(username.encode())}.{expires_at}.{secrets.token_urlsafe(12)}"
+        session = Session(f"{payload}.{self._sign(payload)}", username, expires_at, now)
+
+        if self.backend:
+            self.backend.save(session)
+        with self._lock:
+            self._evict_expired(now)
+            self._sessions[session.token] = session
+        return session
+
+    def get(self, token):
+        """Returns the live Session for a token, or None if it is forged, expired or logged out."""
+        verified = self._verify(token)
+        now = time.time()
+        if verified is None or verified[1] <= now:
+            return None
+
+        with self._lock:
+            self._evict_expired(now)
+            session = self._sessions.get(token)
+        if session and (not self.backend or now - session.checked_at < self.recheck_interval):
+            return session
+        if not self.backend:
+            return None
+
+        # Not cached here (or due for a re-check): ask the shared backend.
+        if not self.backend.exists(token):
+            with self._lock:
+                self._sessions.pop(token, None)
+            return None
+        session = session or Session(token, verified[0], verified[1])
+        session.checked_at = now
+        with self._lock:
+            if token not in self._sessions:
+                self._sessions[token] = session
+        return session
+
+    def revoke(self, token):
+        """Logs a single session out."""
+        with self._lock:
+            self._sessions.pop(token, None)
+        if self.backend:
+            self.backend.delete(token)
+
+    def revoke_all(self):
+        """Logs every user out (used after the USERS table is reset)."""
+        with self._lock:
+            self._sessions.clear()
+        if self.backend:
+            self.backend.delete_all()
+
+    def __len__(self):
+        with self._lock:
+            self._evict_expired(time.time())
+            return len(self._sessions)
+
+
+class DatabaseSessionBackend:
+    """Shares sessions between processes through the SESSIONS table (see migrations/003_sessions.sql)."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @staticmethod
+    def _key(token):
+        # Only a digest of the token is stored, so a leaked table cannot be replayed.
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def _run(self, query, params=()):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(query, params)
+                rows = cursor.fetchall() if query.lstrip().upper().startswith("SELECT") else None
+                conn.commit()
+                return rows
+            finally:
+                cursor.close()
+
+    def save(self, session):
+        self._run(
+            "INSERT INTO SESSIONS (session_key, username, expires_at) VALUES (%s, %s, %s)",
+            (self._key(session.token), session.username, session.expires_at),
+        )
+        # Piggy-back the cleanup of expired rows on logins.
+        self._run("DELETE FROM SESSIONS WHERE expires_at <= %s", (int(time.time()),))
+
+    def exists(self, token):
+        rows = self._run(
+            "SELECT 1 FROM SESSIONS WHERE session_key = %s AND expires_at > %s",
+            (self._key(token), int(time.time())),
+        )
+        return bool(rows)
+
+    def delete(self, token):
+        self._run("DELETE FROM SESSIONS WHERE session_key = %s", (self._key(token),))
+
+    def delete_all(self):
+        self._run("DELETE FROM SESSIONS")
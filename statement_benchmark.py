@@ -0,0 +1,118 @@
+# Microbenchmark for the prepared-statement registry (see prepared_statement in storage.py).
+# Times the hot reservation queries on one pooled connection, once with every statement
+# parsed from text on each call and once with the statements kept prepared.
+#
+# Example:
+#   python statement_benchmark.py --iterations 5000
+#   python statement_benchmark.py --backend mysql --iterations 5000
+# (On MySQL this reads from, and books one seat in, the database in main.DB_CONFIG.)
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import date
+
+import main
+from seat_inventory import lock_journey, pick_slot
+
+BENCH_USER = "stmtbench"
+BENCH_PASSWORD = "stmtbench"
+
+
+class _quiet:
+    """Silences the reservation system's console output during setup."""
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = open(os.devnull, mode='w')
+
+    def __exit__(self, *exc):
+        sys.stdout.close()
+        sys.stdout = self._stdout
+
+
+def prepare_data(args):
+    """Makes sure there is a journey and a booking to query. Returns (train, source, destination, pnr)."""
+    system = main.RailwayReservationSystem(backend=args.backend, pool_size=1, sqlite_path=args.sqlite_path)
+    with _quiet():
+        if not system.connect():
+            raise SystemExit("Could not connect to the benchmark database.")
+        try:
+            system.register_user(BENCH_USER, BENCH_PASSWORD)
+            session = system.login_user(BENCH_USER, BENCH_PASSWORD)
+            with system._checkout() as (conn, cursor):
+                cursor.execute("SELECT train_number, source, destination FROM TRAINS ORDER BY train_number LIMIT 1")
+                train_number, source, destination = cursor.fetchone()
+            booked = system.reserve_seats(session, train_number, date.today(), [("Benchmark", 30)])
+        finally:
+            system.disconnect()
+    return train_number, source, destination, booked[0][0]
+
+def timed(function, iterations):
+    """Runs function() iterations times; returns the sorted per-call latencies in microseconds."""
+    for _ in range(min(100, iterations)):
+        function()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return sorted(samples)
+
+def run_mode(args, prepare, data):
+    """Returns {query: sorted latencies} with statement preparation on or off."""
+    train_number, source, destination, pnr_number = data
+    today = date.today()
+    main.PREPARE_STATEMENTS = prepare
+    system = main.RailwayReservationSystem(backend=args.backend, pool_size=1, sqlite_path=args.sqlite_path)
+    with _quiet():
+        system.connect()
+    try:
+        results = {
+            'search (find_trains)': timed(lambda: system.find_trains(source, destination, today), args.iterations),
+            'view (booking join)': timed(lambda: system._load_booking(pnr_number), args.iterations),
+        }
+        with system._checkout() as (conn, cursor):
+            results['pick_slot'] = timed(lambda: pick_slot(cursor, train_number, today, 1), args.iterations)
+            conn.commit()  # end the reads' transaction (MySQL opens one on SELECT) so the lock gets its own
+            conn.start_transaction()
+            results['lock_journey (FOR UPDATE)'] = timed(lambda: lock_journey(cursor, train_number, today), args.iterations)
+            conn.rollback()
+    finally:
+        with _quiet():
+            system.disconnect()
+    return results
+
+def print_report(plain, prepared, backend):
+    def stat(samples, fraction):
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+    print(f"\n--- Prepared statement benchmark ({backend}) ---")
+    print("{:<28} {:>12} {:>12} {:>12} {:>12} {:>9}".format(
+        "Query", "text p50 us", "prep p50 us", "text p95 us", "prep p95 us", "Speedup"
+    ))
+    print("-" * 90)
+    for name in plain:
+        text_p50, prep_p50 = stat(plain[name], 0.5), stat(prepared[name], 0.5)
+        print("{:<28} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>8.2f}x".format(
+            name, text_p50, prep_p50, stat(plain[name], 0.95), stat(prepared[name], 0.95), text_p50 / prep_p50,
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-query latency with and without prepared statements.")
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--sqlite-path', help="SQLite file to use (default: a new temporary file)")
+    parser.add_argument('--iterations', type=int, default=2000, help="timed runs of each query per mode")
+    args = parser.parse_args()
+
+    if args.backend == 'sqlite' and not args.sqlite_path:
+        args.sqlite_path = os.path.join(tempfile.mkdtemp(prefix="railway_stmtbench_"), "bench.sqlite3")
+    main.SLOW_QUERY_LOG = None
+
+    data = prepare_data(args)
+    plain = run_mode(args, False, data)
+    prepared = run_mode(args, True, data)
+    print_report(plain, prepared, args.backend)
@@ -0,0 +1,121 @@
+# Station name lookup for the Railway Reservation System.
+# Resolves what the user typed ("ahmedabad jn", "nizamud", "hydrabad") to the exact
+# station name stored in TRAINS before any search query is sent to the database.
+
+import heapq
+import re
+import threading
+
+# Common abbreviations, expanded so "Ahmedabad Jn" and "Ahmedabad Junction" normalize alike.
+ABBREVIATIONS = {
+    'jn': 'junction',
+    'jct': 'junction',
+    'cant': 'cantonment',
+    'cantt': 'cantonment',
+    't': 'terminus',
+    'trm': 'terminus',
+    'term': 'terminus',
+    'stn': 'station',
+    'rd': 'road',
+    'ngr': 'nagar',
+    'h': 'hazrat',
+}
+
+def normalize_station(name):
+    """Lower-cases, strips punctuation and expands abbreviations ('H Nizamuddin' -> 'hazrat nizamuddin')."""
+    words = re.findall(r"[a-z0-9]+", name.lower())
+    return " ".join(ABBREVIATIONS.get(word, word) for word in words)
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class StationIndex:
+    """
+    Autocomplete and fuzzy matcher over the distinct station names in TRAINS.
+
+    Built once into:
+      * a prefix trie over every word position of each normalized name, where every node
+        already holds its top-k stations (so a prefix lookup is a walk of len(prefix) nodes);
+      * a trigram index used for typo-tolerant matching when no prefix matches.
+    The index is rebuilt when the route index reports that TRAINS has changed.
+    """
+
+    def __init__(self, route_index, top_k=5):
+        self.route_index = route_index
+        self.top_k = top_k
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _build(self, train_routes):
+        popularity = {}
+        for source, destination in train_routes.values():
+            popularity[source] = popularity.get(source, 0) + 1
+            popularity[destination] = popularity.get(destination, 0) + 1
+
+        # Most served stations first, so every trie node keeps the best k candidates.
+        self._names = sorted(popularity, key=lambda name: (-popularity[name], name))
+        self._normalized = [normalize_station(name) for name in self._names]
+        self._exact = {}
+        self._trie = {}
+        self._grams = {}
+        self._gram_counts = [len(_trigrams(normalized)) for normalized in self._normalized]
+
+        for station_id, normalized in enumerate(self._normalized):
+            self._exact.setdefault(normalized, station_id)
+            words = normalized.split()
+            for start in range(len(words)):
+                node = self._trie
+                for char in " ".join(words[start:]):
+                    node = node.setdefault(char, {})
+                    matches = node.setdefault('', [])  # '' holds the station ids for this prefix
+                    if len(matches) < self.top_k and station_id not in matches:
+                        matches.append(station_id)
+            for gram in _trigrams(normalized):
+                self._grams.setdefault(gram, []).append(station_id)
+
+    def _ensure_current(self):
+        self.route_index.refresh()
+        if self.route_index.version != self._version:
+            train_routes, version = self.route_index.train_routes()
+            self._build(train_routes)
+            self._version = version
+
+    def exact(self, text):
+        """Returns the stored station name whose normalized form equals the input, or None."""
+        with self._lock:
+            self._ensure_current()
+            station_id = self._exact.get(normalize_station(text))
+            return None if station_id is None else self._names[station_id]
+
+    def suggest(self, text, k=None):
+        """Returns up to k station names: prefix matches first, then the closest fuzzy matches."""
+        k = k or self.top_k
+        query = normalize_station(text)
+        if not query:
+            return []
+
+        with self._lock:
+            self._ensure_current()
+
+            node = self._trie
+            for char in query:
+                node = node.get(char)
+                if node is None:
+                    break
+            if node:
+                return [self._names[station_id] for station_id in node[''][:k]]
+
+            # No prefix match: rank stations by trigram overlap (Dice coefficient).
+            query_grams = _trigrams(query)
+            shared = {}
+            for gram in query_grams:
+                for station_id in self._grams.get(gram, ()):
+                    shared[station_id] = shared.get(station_id, 0) + 1
+            scored = (
+                (2.0 * count / (len(query_grams) + self._gram_counts[station_id]), -station_id)
+                for station_id, count in shared.items()
+            )
+            best = heapq.nlargest(k, scored)
+            return [self._names[-negative_id] for score, negative_id in best if score >= 0.3]
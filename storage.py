@@ -0,0 +1,570 @@
+# Storage layer for the Railway Reservation System.
+# Provides a bounded connection pool on top of either MySQL (mysql-connector-python)
+# or an embedded SQLite database that runs the same schema as sql_setup.sql.
+#
+# Hot queries are registered with prepared_statement(): each pooled connection prepares
+# them once and re-uses the prepared form (compare with: python statement_benchmark.py).
+
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+
+from metrics import InstrumentedConnection
+
+try:
+    import mysql.connector
+except ImportError:
+    # The SQLite backend works without mysql-connector-python installed.
+    mysql = None
+
+SCHEMA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sql_setup.sql")
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the checkout timeout."""
+
+
+# Every error type a caller may see from the storage layer, whichever backend is active.
+DB_ERRORS = (sqlite3.Error, PoolTimeout) + ((mysql.connector.Error,) if mysql else ())
+
+# SQL text of the queries that are prepared once per connection (see prepared_statement).
+PREPARED_STATEMENTS = set()
+
+def prepared_statement(query):
+    """
+    Registers a hot query and returns it unchanged. Executing exactly this text on a pooled
+    connection uses a statement prepared on that connection the first time it ran there:
+    server-side on MySQL, SQLite's per-connection statement cache on SQLite.
+    """
+    PREPARED_STATEMENTS.add(query)
+    return query
+
+
+# --- 1. SQLite Backend (MySQL-compatible adapter) ---
+
+def _convert_timestamp(value):
+    return datetime.fromisoformat(value.decode("utf-8"))
+
+def _convert_date(value):
+    return date.fromisoformat(value.decode("utf-8"))
+
+# Return TIMESTAMP/DATE columns as datetime objects, the same as mysql-connector does.
+sqlite3.register_converter("TIMESTAMP", _convert_timestamp)
+sqlite3.register_converter("DATE", _convert_date)
+# ... and store date/datetime parameters as ISO text (the implicit adapters are deprecated).
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+
+@lru_cache(maxsize=256)
+def translate_sql(query):
+    """Rewrites the MySQL dialect used throughout the code base into SQLite syntax."""
+    query = query.replace("%s", "?")
+    query = re.sub(r"\bBIGINT\s+AUTO_INCREMENT\s+PRIMARY\s+KEY\b", "INTEGER PRIMARY KEY AUTOINCREMENT", query, flags=re.IGNORECASE)
+    # SQLite locks the whole database for writers (BEGIN IMMEDIATE), so row locks are implicit.
+    query = re.sub(r"\s+FOR\s+UPDATE\b", "", query, flags=re.IGNORECASE)
+    query = re.sub(r"^\s*INSERT\s+IGNORE\b", "INSERT OR IGNORE", query, flags=re.IGNORECASE)
+    query = re.sub(r"^\s*TRUNCATE\s+TABLE\s+(\w+)", r"DELETE FROM \1", query, flags=re.IGNORECASE)
+    query = re.sub(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*0", "PRAGMA defer_foreign_keys = ON", query, flags=re.IGNORECASE)
+    query = re.sub(r"^\s*SET\s+FOREIGN_KEY_CHECKS\s*=\s*1", "PRAGMA defer_foreign_keys = OFF", query, flags=re.IGNORECASE)
+    match = re.search(r"\bON\s+DUPLICATE\s+KEY\s+UPDATE\b", query, flags=re.IGNORECASE)
+    if match:
+        updates = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", query[match.end():], flags=re.IGNORECASE)
+        query = query[:match.start()] + "ON CONFLICT DO UPDATE SET" + updates
+    return query
+
+
+class SQLiteCursor:
+    """Cursor wrapper that accepts the same SQL and parameters as a mysql-connector cursor."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._cursor.execute(translate_sql(query), params or ())
+
+    def executemany(self, query, seq_params):
+        self._cursor.executemany(translate_sql(query), seq_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=1):
+        return self._cursor.fetchmany(size)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """
+    Connection wrapper exposing the subset of the mysql-connector connection API
+    used by the reservation system (start_transaction, in_transaction, ping, ...).
+    """
+
+    def __init__(self, path, timeout=30.0, cached_statements=256):
+        # isolation_level="IMMEDIATE" takes the write lock as soon as a transaction begins,
+        # which mirrors the FOR UPDATE row locks used on MySQL.
+        # sqlite3 keeps up to cached_statements compiled statements per connection, keyed by
+        # SQL text, which is how registered statements stay prepared (0 re-compiles every time).
+        self._conn = sqlite3.connect(
+            path,
+            timeout=timeout,
+            cached_statements=cached_statements,
+            isolation_level="IMMEDIATE",
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # pooled connections move between threads (one at a time)
+        )
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._closed = False
+
+    def cursor(self, *args, **kwargs):
+        return SQLiteCursor(self._conn.cursor())
+
+    def start_transaction(self):
+        self._conn.execute("BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def ping(self, reconnect=False):
+        self._conn.execute("SELECT 1").fetchone()
+
+    def close(self):
+        if not self._closed:
+            self._conn.close()
+            self._closed = True
+
+
+# --- 2. MySQL Backend (prepared statements) ---
+
+ER_UNKNOWN_STMT_HANDLER = 1243
+
+class MySQLCursor:
+    """
+    Cursor of a MySQLConnection. Registered statements run on the connection's prepared
+    cursor for that text and their rows are read straight away (prepared cursors are
+    unbuffered); any other statement runs on a plain cursor.
+    """
+
+    def __init__(self, owner, cursor):
+        self._owner = owner
+        self._plain = cursor
+        self._active = cursor
+        self._rows = None  # rows of the last prepared statement, None after a plain one
+
+    def execute(self, query, params=()):
+        if not self._owner.prepare or query not in PREPARED_STATEMENTS:
+            self._active, self._rows = self._plain, None
+            self._plain.execute(query, params or ())
+            return
+
+        cursor = self._owner._prepared_cursor(query)
+        try:
+            cursor.execute(query, tuple(params or ()))
+        except mysql.connector.Error as err:
+            if err.errno != ER_UNKNOWN_STMT_HANDLER:
+                raise
+            # The server forgot the statement (e.g. after a reconnect): prepare it again.
+            self._owner._forget(query)
+            cursor = self._owner._prepared_cursor(query)
+            cursor.execute(query, tuple(params or ()))
+        self._active = cursor
+        self._rows = deque(cursor.fetchall() if cursor.description else ())
+
+    def executemany(self, query, seq_params):
+        # A plain executemany sends one multi-row INSERT, which beats repeating a prepared one.
+        self._active, self._rows = self._plain, None
+        self._plain.executemany(query, seq_params)
+
+    def fetchone(self):
+        if self._rows is None:
+            return self._plain.fetchone()
+        return self._rows.popleft() if self._rows else None
+
+    def fetchall(self):
+        if self._rows is None:
+            return self._plain.fetchall()
+        rows = list(self._rows)
+        self._rows.clear()
+        return rows
+
+    def fetchmany(self, size=1):
+        if self._rows is None:
+            return self._plain.fetchmany(size)
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    @property
+    def rowcount(self):
+        return self._active.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._active.lastrowid
+
+    @property
+    def description(self):
+        return self._active.description
+
+    def close(self):
+        # Prepared cursors belong to the connection and are closed with it.
+        self._plain.close()
+
+
+class MySQLConnection:
+    """
+    Wraps a mysql-connector connection with a registry of prepared statements: the first
+    run of a registered query prepares it on this connection, later runs only send the
+    parameters. At most max_prepared statements are kept (least recently used are
+    deallocated). A replacement connection opened by the pool starts with an empty registry.
+    """
+
+    def __init__(self, conn, prepare=True, max_prepared=64):
+        self._conn = conn
+        self.prepare = prepare
+        self.max_prepared = max_prepared
+        self._prepared = OrderedDict()  # query -> prepared cursor, LRU order
+
+    def cursor(self, *args, **kwargs):
+        return MySQLCursor(self, self._conn.cursor(*args, **kwargs))
+
+    def _prepared_cursor(self, query):
+        cursor = self._prepared.get(query)
+        if cursor is not None:
+            self._prepared.move_to_end(query)
+            return cursor
+        cursor = self._prepared[query] = self._conn.cursor(prepared=True)
+        if len(self._prepared) > self.max_prepared:
+            _, evicted = self._prepared.popitem(last=False)
+            evicted.close()
+        return cursor
+
+    def _forget(self, query):
+        cursor = self._prepared.pop(query, None)
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+    def close(self):
+        for query in list(self._prepared):
+            self._forget(query)
+        self._conn.close()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def split_sql_script(script):
+    """Splits a .sql file into statements, dropping '--' comments and blank lines."""
+    lines = [line.split("--", 1)[0] for line in script.splitlines()]
+    statements = " ".join(line.strip() for line in lines if line.strip()).split(";")
+    return [statement.strip() for statement in statements if statement.strip()]
+
+def bootstrap_sqlite(path, schema_file=SCHEMA_FILE):
+    """Creates the tables (and sample trains) from sql_setup.sql if the SQLite file is new."""
+    conn = SQLiteConnection(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'TRAINS'")
+        if cursor.fetchone():
+            return False
+
+        with open(schema_file, mode="r", encoding="utf-8") as file:
+            statements = split_sql_script(file.read())
+
+        for statement in statements:
+            # There is a single database per SQLite file, so database selection is skipped.
+            if re.match(r"(CREATE\s+DATABASE|USE)\b", statement, flags=re.IGNORECASE):
+                continue
+            cursor.execute(statement)
+            if statement.upper().startswith("SELECT"):
+                cursor.fetchall()
+        conn.commit()
+        return True
+    finally:
+        conn.close()
+
+
+# --- 3. Schema Migrations ---
+
+def list_migrations(backend, migrations_dir=MIGRATIONS_DIR):
+    """
+    Returns [(version, path)] in the order they must be applied.
+
+    Migrations are named 'NNN_description.sql'. A backend-specific file such as
+    'NNN_description.sqlite.sql' replaces the shared one for that backend only.
+    """
+    if not os.path.isdir(migrations_dir):
+        return []
+    chosen = {}
+    for filename in sorted(os.listdir(migrations_dir)):
+        if not filename.endswith(".sql"):
+            continue
+        parts = filename[:-len(".sql")].split(".")
+        version = parts[0]
+        if len(parts) == 2 and parts[1] != backend:
+            continue
+        if len(parts) == 1 and version in chosen:
+            continue  # a backend-specific file was already picked
+        chosen[version] = os.path.join(migrations_dir, filename)
+    return sorted(chosen.items())
+
+def apply_migrations(pool, migrations_dir=MIGRATIONS_DIR):
+    """Applies every migration not yet recorded in SCHEMA_MIGRATIONS. Returns the versions applied."""
+    applied = []
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS SCHEMA_MIGRATIONS (
+                    version VARCHAR(100) PRIMARY KEY,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+
+            # Serialize concurrent start-ups so each migration runs exactly once.
+            if pool.backend == "mysql":
+                cursor.execute("SELECT GET_LOCK('railway_schema_migrations', 60)")
+                cursor.fetchall()
+            else:
+                conn.start_transaction()
+
+            try:
+                cursor.execute("SELECT version FROM SCHEMA_MIGRATIONS")
+                done = {row[0] for row in cursor.fetchall()}
+
+                for version, path in list_migrations(pool.backend, migrations_dir):
+                    if version in done:
+                        continue
+                    with open(path, mode="r", encoding="utf-8") as file:
+                        for statement in split_sql_script(file.read()):
+                            cursor.execute(statement)
+                    cursor.execute("INSERT INTO SCHEMA_MIGRATIONS (version) VALUES (%s)", (version,))
+                    conn.commit()
+                    if pool.backend == "sqlite":
+                        conn.start_transaction()
+                    applied.append(version)
+
+                if pool.backend == "sqlite":
+                    conn.commit()
+            finally:
+                # The named lock belongs to the session, which goes back to the pool: release it
+                # even when a migration failed, or every other start-up waits out GET_LOCK.
+                if pool.backend == "mysql":
+                    try:
+                        cursor.execute("SELECT RELEASE_LOCK('railway_schema_migrations')")
+                        cursor.fetchall()
+                    except DB_ERRORS:
+                        pass  # A lost connection has released the lock already; keep the original error.
+        finally:
+            cursor.close()
+    return applied
+
+
+# --- 4. Connection Pool ---
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of database connections.
+
+    Connections are checked out per operation, health-checked (ping) when they have
+    been idle for a while, and recycled once they exceed their maximum lifetime.
+    """
+
+    def __init__(self, connect, size=5, timeout=10.0, max_lifetime=1800.0, health_check_after=30.0, backend="mysql"):
+        """
+        Args:
+            connect (callable): Factory returning a new DB-API style connection.
+            size (int): Maximum number of connections open at the same time.
+            timeout (float): Seconds to wait for a free connection before raising PoolTimeout.
+            max_lifetime (float): Connections older than this (seconds) are closed and replaced.
+            health_check_after (float): Idle connections older than this (seconds) are pinged before reuse.
+            backend (str): Name of the backend ('mysql' or 'sqlite') the connections belong to.
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        self._connect = connect
+        self.backend = backend
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.metrics = None  # a metrics.QueryMetrics to time checkouts and statements
+
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()  # LIFO reuses the warmest connection first
+        self._created_at = {}           # id(connection) -> creation time
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self):
+        conn = self._connect()
+        with self._lock:
+            self._created_at[id(conn)] = time.monotonic()
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._created_at.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, idle_since):
+        now = time.monotonic()
+        with self._lock:
+            created_at = self._created_at.get(id(conn), now)
+        if now - created_at > self.max_lifetime:
+            return False
+        if now - idle_since > self.health_check_after:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def acquire(self):
+        """Checks out a healthy connection, opening a new one if none are idle."""
+        if self._closed:
+            raise PoolTimeout("Connection pool is closed.")
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection became free within {self.timeout} seconds.")
+        try:
+            while True:
+                try:
+                    conn, idle_since = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if self._is_healthy(conn, idle_since):
+                    return conn
+                self._discard(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """Returns a connection to the pool, rolling back any transaction left open."""
+        try:
+            if not discard and conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            discard = True
+
+        if discard or self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put((conn, time.monotonic()))
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out one connection for the duration of an operation.
+        With metrics attached, the wait for the connection and its statements are timed.
+        """
+        metrics = self.metrics
+        start = time.perf_counter()
+        conn = self.acquire()
+        broken = False
+        try:
+            if metrics is None:
+                yield conn
+            else:
+                metrics.record_pool_wait(time.perf_counter() - start)
+                yield InstrumentedConnection(conn, metrics)
+        except DB_ERRORS:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+            raise
+        finally:
+            self.release(conn, discard=broken)
+
+    def close(self):
+        """Closes every idle connection; connections still checked out are closed on release."""
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# --- 5. Backend Factory ---
+
+def create_pool(backend="mysql", mysql_config=None, sqlite_path=None, size=5, timeout=10.0, migrate=True, prepare=True, replica=False):
+    """
+    Builds a ConnectionPool for the requested backend and brings its schema up to date.
+
+    Args:
+        backend (str): 'mysql' for a MySQL server, 'sqlite' for the embedded database file.
+        mysql_config (dict): Keyword arguments for mysql.connector.connect (MySQL only).
+        sqlite_path (str): Path of the SQLite database file (SQLite only).
+        size (int): Maximum number of pooled connections.
+        timeout (float): Seconds to wait for a free connection.
+        migrate (bool): Apply pending files from the migrations/ directory.
+        prepare (bool): Keep registered statements prepared per connection (see prepared_statement).
+        replica (bool): The database is a read replica (see replicas.py): its schema comes from the
+            primary by replication, so it is neither created nor migrated, and nothing is opened yet.
+    """
+    if backend == "mysql":
+        if mysql is None:
+            raise RuntimeError("The 'mysql' backend needs mysql-connector-python (pip install mysql-connector-python).")
+        config = dict(mysql_config or {})
+        pool = ConnectionPool(lambda: MySQLConnection(mysql.connector.connect(**config), prepare), size=size, timeout=timeout, backend="mysql")
+    elif backend == "sqlite":
+        if not sqlite_path:
+            raise ValueError("The 'sqlite' backend needs a database file path.")
+        if not replica:
+            bootstrap_sqlite(sqlite_path)
+        cached_statements = 256 if prepare else 0
+        pool = ConnectionPool(lambda: SQLiteConnection(sqlite_path, cached_statements=cached_statements), size=size, timeout=timeout, backend="sqlite")
+    else:
+        raise ValueError(f"Unknown database backend: {backend!r} (expected 'mysql' or 'sqlite').")
+
+    if migrate and not replica:
+        try:
+            apply_migrations(pool)
+        except BaseException:
+            pool.close()
+            raise
+    return pool
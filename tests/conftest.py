@@ -0,0 +1,96 @@
+# The modules under test live at the repository root.
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import storage
+
+try:
+    from mysql.connector.errors import ProgrammingError
+except ImportError:
+    from sqlite3 import ProgrammingError
+
+_SQLiteConnection = storage.SQLiteConnection
+
+
+class MySQLRulesConnection:
+    """
+    A SQLiteConnection that keeps mysql-connector's transaction bookkeeping (autocommit off):
+    any statement, a SELECT included, opens a transaction that stays open until commit or
+    rollback, and start_transaction() raises while one is open.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._open = False
+
+    def cursor(self, *args, **kwargs):
+        return _MySQLRulesCursor(self, self._conn.cursor())
+
+    def start_transaction(self):
+        if self._open:
+            raise ProgrammingError("Transaction already in progress")
+        self._conn.start_transaction()
+        self._open = True
+
+    @property
+    def in_transaction(self):
+        return self._open
+
+    def commit(self):
+        self._conn.commit()
+        self._open = False
+
+    def rollback(self):
+        self._conn.rollback()
+        self._open = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class _MySQLRulesCursor:
+    def __init__(self, owner, cursor):
+        self._owner = owner
+        self._cursor = cursor
+
+    def execute(self, query, params=()):
+        self._owner._open = True
+        self._cursor.execute(query, params)
+
+    def executemany(self, query, seq_params):
+        self._owner._open = True
+        self._cursor.executemany(query, seq_params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@pytest.fixture
+def mysql_rules(monkeypatch):
+    """SQLite connections opened from here on follow mysql-connector's transaction rules."""
+    monkeypatch.setattr(storage, "SQLiteConnection", lambda *args, **kwargs: MySQLRulesConnection(_SQLiteConnection(*args, **kwargs)))
+
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "railway.sqlite3")
+
+
+@pytest.fixture
+def system(sqlite_path, monkeypatch):
+    """A connected RailwayReservationSystem on a new SQLite database with the sample trains."""
+    import main
+    from credentials import PasswordHasher
+
+    monkeypatch.setattr(main, "SLOW_QUERY_LOG", None)
+    system = main.RailwayReservationSystem(backend="sqlite", pool_size=3, sqlite_path=sqlite_path)
+    # A cheap KDF keeps registrations fast; the hash format is the same.
+    hasher = system.hasher = PasswordHasher('pbkdf2_sha256', cost=4, workers=1)
+    assert system.connect()
+    yield system
+    system.disconnect()
+    hasher.close()
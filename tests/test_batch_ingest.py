@@ -0,0 +1,49 @@
+# Batch ingest: per-row results of a partner file applied train by train.
+
+import csv
+from datetime import date
+
+import batch_ingest
+from pnr import encode_pnr
+
+TRAIN = '12723'
+
+
+def _ingest(system, tmp_path, rows):
+    source, output = tmp_path / "batch.csv", tmp_path / "batch.results.csv"
+    with open(source, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=batch_ingest.FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+    counts = batch_ingest.ingest_file(system, str(source), str(output), workers=2)
+    with open(output, newline="") as file:
+        return counts, list(csv.DictReader(file))
+
+def test_bookings_and_cancellations(system, tmp_path):
+    system.create_user("alice", "secret")
+    day = date.today().isoformat()
+    counts, results = _ingest(system, tmp_path, [
+        {'op': 'book', 'username': 'alice', 'train_number': TRAIN, 'journey_date': day, 'passenger_name': 'A', 'age': 30},
+        {'op': 'book', 'username': 'alice', 'train_number': TRAIN, 'journey_date': day, 'passenger_name': '', 'age': 30},
+        {'op': 'cancel', 'username': 'alice', 'pnr_number': ''},
+    ])
+    assert counts == {'ok': 1, 'failed': 2, 'error': 0}
+    assert [row['status'] for row in results] == ['ok', 'failed', 'failed']
+    assert results[0]['seat_number'] == '1'
+    assert results[2]['message'] == "No pnr_number given."
+
+def test_cancel_without_train_of_a_pnr_booked_earlier_in_the_chunk(system, tmp_path):
+    system.create_user("alice", "secret")
+    system.pnrs.allocate(1)
+    next_pnr = encode_pnr(system.pnrs._next)  # the PNR the booking below will get
+    counts, results = _ingest(system, tmp_path, [
+        {'op': 'book', 'username': 'alice', 'train_number': TRAIN, 'journey_date': date.today().isoformat(),
+         'passenger_name': 'A', 'age': 30},
+        {'op': 'cancel', 'username': 'alice', 'pnr_number': next_pnr},
+        {'op': 'cancel', 'username': 'alice', 'pnr_number': encode_pnr(10 ** 9)},
+    ])
+    assert results[0]['pnr_number'] == next_pnr
+    assert [row['status'] for row in results] == ['ok', 'ok', 'failed']
+    assert results[1]['train_number'] == TRAIN
+    assert results[2]['message'] == f"PNR Number {encode_pnr(10 ** 9)} not found."
+    assert counts == {'ok': 2, 'failed': 1, 'error': 0}
@@ -0,0 +1,91 @@
+# PNR cache: LRU/TTL behaviour and invalidation by cancellations and resets.
+
+from datetime import date
+
+import pytest
+
+import booking_cache
+import main
+from booking_cache import BookingCache
+
+TRAIN = '12723'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+def test_ttl_and_lru(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(booking_cache, "time", clock)
+    cache = BookingCache(max_entries=2, ttl=10)
+    for pnr in ("A", "B"):
+        cache.put(pnr, {'pnr_number': pnr}, cache.get(pnr)[1])
+    assert cache.get("A")[0] == {'pnr_number': "A"}  # A is now the most recently used
+    cache.put("C", {'pnr_number': "C"}, cache.get("C")[1])
+    assert cache.get("B")[0] is None
+    clock.now += 10
+    assert cache.get("A")[0] is None
+    assert cache.stats()['entries'] == 1
+
+def test_record_read_before_an_invalidation_is_not_cached():
+    cache = BookingCache()
+    record, generation = cache.get("A")
+    cache.invalidate("B")  # a write committed while "A" was being read
+    cache.put("A", {'pnr_number': "A"}, generation)
+    assert cache.get("A")[0] is None
+
+@pytest.fixture
+def booked(system):
+    system.create_user("alice", "secret")
+    alice = system.sessions.create("alice")
+    [(pnr, *_)] = system.reserve_seats(alice, TRAIN, date.today(), [("A", 30)])
+    assert system.get_booking(alice, pnr)['status'] == 'confirmed'
+    return alice, pnr
+
+def test_repeated_lookups_are_served_from_the_cache(system, booked):
+    alice, pnr = booked
+    hits = system.booking_cache.stats()['hits']
+    assert system.get_booking(alice, pnr)['seat_number'] == 1
+    assert system.booking_cache.stats()['hits'] == hits + 1
+
+def test_cancel_invalidates(system, booked):
+    alice, pnr = booked
+    system.cancel_reservation(alice, pnr)
+    assert system.get_booking(alice, pnr) is None
+
+def test_batch_cancel_invalidates(system, booked):
+    alice, pnr = booked
+    admin = system.sessions.create("admin")
+    [(_, _, error)] = system.apply_train_batch(admin, TRAIN, [{'op': 'cancel', 'username': 'alice', 'pnr_number': pnr}])
+    assert error is None
+    assert system.get_booking(alice, pnr) is None
+
+def test_promotion_invalidates_the_waitlisted_record(system, booked):
+    alice, pnr = booked
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE JOURNEYS SET available_seats = 0 WHERE train_number = %s", (TRAIN,))
+        conn.commit()
+    [(waiting_pnr, *_)] = system.join_waitlist(alice, TRAIN, date.today(), [("B", 31)])
+    assert system.get_booking(alice, waiting_pnr)['status'] == 'waitlisted'
+    system.cancel_reservation(alice, pnr)
+    booking = system.get_booking(alice, waiting_pnr)
+    assert booking['status'] == 'confirmed' and booking['seat_number'] == 1
+
+def test_online_reset_invalidates(system, booked, monkeypatch):
+    alice, pnr = booked
+    monkeypatch.setattr(main, "RESET_MODE", 'online')
+    monkeypatch.setattr(main, "RESET_PAUSE", 0)
+    system.reset_seats(system.sessions.create("admin"))
+    booking = system.get_booking(alice, pnr)
+    assert booking['status'] == 'cancelled_by_reset' and booking['seat_number'] == 1
+
+def test_offline_reset_invalidates(system, booked, monkeypatch):
+    alice, pnr = booked
+    monkeypatch.setattr(main, "RESET_MODE", 'offline')
+    system.reset_seats(system.sessions.create("admin"))
+    assert system.get_booking(alice, pnr) is None
@@ -0,0 +1,97 @@
+# "My Bookings": keyset pages over confirmed, waitlisted and archived bookings.
+
+import base64
+from datetime import date
+
+import pytest
+
+import main
+from main import ReservationError
+
+TRAIN = '12723'
+
+
+def _all_pages(system, session, limit):
+    pages, after = [], None
+    while True:
+        bookings, after = system.list_bookings(session, limit, after)
+        pages.append([booking['pnr_number'] for booking in bookings])
+        if after is None:
+            return pages
+
+def _set_booking_dates(system, dates):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        for pnr, booked_on in dates.items():
+            cursor.execute("UPDATE RESERVATIONS SET booking_date = %s WHERE pnr_number = %s", (booked_on, pnr))
+        conn.commit()
+
+@pytest.fixture
+def alice(system):
+    system.create_user("alice", "secret")
+    return system.sessions.create("alice")
+
+def test_pages_are_newest_first_and_cover_every_booking_once(system, alice):
+    booked = [pnr for pnr, *_ in system.reserve_seats(alice, TRAIN, date.today(), [(f"P{i}", 30) for i in range(5)])]
+    booked += [pnr for pnr, *_ in system.reserve_seats(alice, TRAIN, date.today(), [(f"Q{i}", 30) for i in range(2)])]
+    # Three share a booking time: the PNR breaks the tie.
+    _set_booking_dates(system, dict(zip(booked, [
+        "2026-01-01 10:00:00", "2026-01-01 10:00:00", "2026-01-01 10:00:00",
+        "2026-01-02 09:00:00", "2025-12-31 23:59:59", "2026-01-03 08:00:00", "2026-01-01 09:00:00",
+    ])))
+    expected = [booked[5], booked[3], booked[2], booked[1], booked[0], booked[6], booked[4]]
+
+    assert _all_pages(system, alice, 3) == [expected[:3], expected[3:6], expected[6:]]
+    assert _all_pages(system, alice, 7) == [expected]
+    assert _all_pages(system, alice, 1) == [[pnr] for pnr in expected]
+
+def test_new_bookings_do_not_shift_later_pages(system, alice):
+    booked = [pnr for pnr, *_ in system.reserve_seats(alice, TRAIN, date.today(), [(f"P{i}", 30) for i in range(4)])]
+    _set_booking_dates(system, {pnr: f"2026-01-0{i + 1} 10:00:00" for i, pnr in enumerate(booked)})
+    first, after = system.list_bookings(alice, 2)
+    assert [booking['pnr_number'] for booking in first] == booked[:1:-1]
+    system.reserve_seats(alice, TRAIN, date.today(), [("New", 30)])  # newer than every page
+    second, after = system.list_bookings(alice, 2, after)
+    assert [booking['pnr_number'] for booking in second] == booked[1::-1]
+    assert after is None
+
+def test_waitlisted_and_archived_bookings_are_listed(system, alice, monkeypatch):
+    [(reset_pnr, *_)] = system.reserve_seats(alice, TRAIN, date.today(), [("A", 30)])
+    monkeypatch.setattr(main, "RESET_MODE", 'online')
+    monkeypatch.setattr(main, "RESET_PAUSE", 0)
+    system.reset_seats(system.sessions.create("admin"))
+    [(confirmed_pnr, *_)] = system.reserve_seats(alice, TRAIN, date.today(), [("B", 31)])
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE JOURNEYS SET available_seats = 0 WHERE train_number = %s", (TRAIN,))
+        conn.commit()
+    [(waiting_pnr, *_)] = system.join_waitlist(alice, TRAIN, date.today(), [("C", 32)])
+
+    pages = _all_pages(system, alice, 1)
+    assert sorted(pnr for [pnr] in pages) == sorted([reset_pnr, confirmed_pnr, waiting_pnr])
+    statuses = {booking['pnr_number']: booking['status'] for booking in system.list_bookings(alice, 10)[0]}
+    assert statuses == {reset_pnr: 'cancelled_by_reset', confirmed_pnr: 'confirmed', waiting_pnr: 'waitlisted'}
+
+def test_other_users_bookings_are_not_listed(system, alice):
+    system.reserve_seats(alice, TRAIN, date.today(), [("A", 30)])
+    system.create_user("bob", "secret")
+    assert system.list_bookings(system.sessions.create("bob")) == ([], None)
+
+@pytest.mark.parametrize("cursor", [
+    "not base64!",
+    base64.urlsafe_b64encode(b"no separator").decode(),
+    base64.urlsafe_b64encode(b"2026-13-45 10:00:00|000000001").decode(),
+    base64.urlsafe_b64encode(b"2026-01-01 10:00:00|NOT-A-PNR").decode(),
+    base64.urlsafe_b64encode(b"2026-01-01 10:00:00|a|b").decode(),
+])
+def test_invalid_cursor(system, alice, cursor):
+    with pytest.raises(ReservationError) as err:
+        system.list_bookings(alice, 10, cursor)
+    assert err.value.code == 'invalid'
+
+def test_page_size_is_clamped(system, alice, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BOOKINGS_PAGE_SIZE", 2)
+    system.reserve_seats(alice, TRAIN, date.today(), [(f"P{i}", 30) for i in range(3)])
+    assert len(system.list_bookings(alice, 0)[0]) == 1
+    bookings, after = system.list_bookings(alice, 50)
+    assert len(bookings) == 2 and after is not None
@@ -0,0 +1,66 @@
+# Registration and login against the SQLite backend: password hashing, hash upgrades.
+
+from credentials import PasswordHasher
+
+
+def _stored_hash(system, username):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT password_hash FROM USERS WHERE username = %s", (username,))
+        return cursor.fetchone()[0]
+
+def test_registration_hashes_without_holding_a_connection(system, monkeypatch):
+    pool = system.pool
+    hash_password = system.hasher.hash
+
+    def hash_with_every_connection_free(password):
+        held = [pool.acquire() for _ in range(pool.size)]  # PoolTimeout if one were checked out
+        for conn in held:
+            pool.release(conn)
+        return hash_password(password)
+
+    monkeypatch.setattr(pool, "timeout", 0.1)
+    monkeypatch.setattr(system.hasher, "hash", hash_with_every_connection_free)
+    system.create_user("alice", "secret")
+    assert system.check_credentials("alice", "secret")
+
+def test_login_rehashes_when_the_cost_changes(system):
+    system.create_user("alice", "secret")
+    old_hash = _stored_hash(system, "alice")
+    assert old_hash.startswith("pbkdf2_sha256$4$")
+
+    system.hasher = PasswordHasher('pbkdf2_sha256', cost=5, workers=1)
+    assert system.check_credentials("alice", "secret")
+    new_hash = _stored_hash(system, "alice")
+    assert new_hash.startswith("pbkdf2_sha256$5$")
+    assert system.check_credentials("alice", "secret")
+    assert _stored_hash(system, "alice") == new_hash  # current hashes are left alone
+    system.hasher.close()
+
+def test_login_rehashes_when_the_algorithm_changes(system):
+    system.create_user("alice", "secret")
+    system.hasher = PasswordHasher('scrypt', cost=4, workers=1)
+    assert system.check_credentials("alice", "secret")
+    assert _stored_hash(system, "alice").startswith("scrypt$4$")
+    system.hasher.close()
+
+def test_wrong_password_does_not_rehash(system):
+    system.create_user("alice", "secret")
+    old_hash = _stored_hash(system, "alice")
+    system.hasher = PasswordHasher('pbkdf2_sha256', cost=5, workers=1)
+    assert not system.check_credentials("alice", "wrong")
+    assert _stored_hash(system, "alice") == old_hash
+    system.hasher.close()
+
+def test_legacy_sha512_hash_is_upgraded(system):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "INSERT INTO USERS (username, password_hash) VALUES (%s, %s)",
+            ("alice", system.hasher.legacy_hash("secret")),
+        )
+        conn.commit()
+    assert not system.check_credentials("alice", "wrong")
+    assert system.check_credentials("alice", "secret")
+    assert _stored_hash(system, "alice").startswith("pbkdf2_sha256$4$")
+    assert system.check_credentials("alice", "secret")
@@ -0,0 +1,101 @@
+# Transactions under mysql-connector's rules: with autocommit off a SELECT opens a
+# transaction, and start_transaction() raises while one is open (see conftest).
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import rollover
+from conftest import ProgrammingError
+from rollover import delete_users, online_reset
+from seat_inventory import ensure_journey
+
+TRAIN = '12723'
+
+
+def test_fake_connection_refuses_to_nest_transactions(mysql_rules, system):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+        assert conn.in_transaction
+        with pytest.raises(ProgrammingError):
+            conn.start_transaction()
+
+@pytest.mark.parametrize("train_number", [TRAIN, "00000"])
+def test_ensure_journey_leaves_no_transaction_open(mysql_rules, system, train_number):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        for _ in range(2):  # creates the journey, then finds it
+            ensure_journey(conn, cursor, train_number, date.today(), 1)
+            assert not conn.in_transaction
+            conn.start_transaction()
+            conn.rollback()
+
+def test_second_booking_on_a_journey(mysql_rules, system):
+    system.create_user("alice", "secret")
+    session = system.sessions.create("alice")
+    first = system.reserve_seats(session, TRAIN, date.today(), [("A", 30)])
+    second = system.reserve_seats(session, TRAIN, date.today(), [("B", 31), ("C", 32)])
+    assert [seat for *_, seat in first + second] == [1, 2, 3]
+
+def test_join_waitlist_of_a_full_journey(mysql_rules, system):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE TRAINS SET total_seats = 1 WHERE train_number = %s", (TRAIN,))
+        conn.commit()
+    system.create_user("alice", "secret")
+    session = system.sessions.create("alice")
+    system.reserve_seats(session, TRAIN, date.today(), [("A", 30)])
+    waiting = system.join_waitlist(session, TRAIN, date.today(), [("B", 31)])
+    assert [position for *_, position in waiting] == [1]
+
+def test_train_batch_with_bookings(mysql_rules, system):
+    system.create_user("alice", "secret")
+    admin = system.sessions.create("admin")
+    day = date.today().isoformat()
+    results = system.apply_train_batch(admin, TRAIN, [
+        {'op': 'book', 'username': 'alice', 'journey_date': day, 'passenger_name': 'A', 'age': 30},
+        {'op': 'book', 'username': 'nobody', 'journey_date': day, 'passenger_name': 'B', 'age': 31},
+    ])
+    assert results[0][1] == 1 and results[0][2] is None
+    assert results[1] == (None, None, "Unknown user 'nobody'.")
+    # Only unknown users: the USERS lookup is the last read before the transaction.
+    results = system.apply_train_batch(admin, TRAIN, [
+        {'op': 'book', 'username': 'nobody', 'journey_date': day, 'passenger_name': 'B', 'age': 31},
+    ])
+    assert results == [(None, None, "Unknown user 'nobody'.")]
+
+def test_online_reset_and_user_deletion(mysql_rules, system):
+    system.create_user("alice", "secret")
+    system.create_user("bob", "secret")
+    session = system.sessions.create("alice")
+    system.reserve_seats(session, TRAIN, date.today(), [("A", 30)])
+    progress = list(online_reset(system.pool, date.today(), pause=0))
+    assert progress[-1]['archived'] == 1 and progress[-1]['seats_freed'] == 1
+    progress = list(delete_users(system.pool, pause=0))
+    # The reset left alice no reservations, so she goes too.
+    assert progress[-1] == {'deleted': 2, 'kept': 0}
+
+def test_only_lock_conflicts_are_retried(monkeypatch):
+    monkeypatch.setattr(rollover.time, "sleep", lambda seconds: None)
+
+    class Connection:
+        def start_transaction(self): pass
+        def commit(self): pass
+        def rollback(self): pass
+
+    calls = []
+    def work(cursor, error):
+        calls.append(error)
+        if len(calls) < 2:
+            raise error
+        return "done"
+
+    assert rollover._in_transaction(Connection(), None, work, sqlite3.OperationalError("database is locked")) == "done"
+    assert len(calls) == 2
+    calls.clear()
+    with pytest.raises(ProgrammingError):
+        rollover._in_transaction(Connection(), None, work, ProgrammingError("Transaction already in progress"))
+    assert len(calls) == 1
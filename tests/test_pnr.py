@@ -0,0 +1,65 @@
+# PNR encoding, the Luhn mod 32 check digit and normalize_pnr.
+
+import pytest
+
+from pnr import ALPHABET, DIGITS, _check_digit, encode_pnr, normalize_pnr
+
+
+def test_encode_pads_to_fixed_width():
+    pnr = encode_pnr(1)
+    assert len(pnr) == DIGITS + 1
+    assert pnr[:-1] == "000000001"
+    assert pnr == "000000001" + _check_digit("000000001")
+
+def test_encode_is_ordered_like_the_sequence():
+    # Increasing numbers give increasing PNR payloads (new rows land at the end of the index).
+    payloads = [encode_pnr(number)[:-1] for number in (0, 1, 31, 32, 1000, 32 ** 5)]
+    assert payloads == sorted(payloads)
+    assert encode_pnr(32)[:-1] == "000000010"
+
+def test_encode_rejects_exhausted_sequence():
+    encode_pnr(32 ** DIGITS - 1)
+    with pytest.raises(ValueError):
+        encode_pnr(32 ** DIGITS)
+
+def test_check_digit_is_luhn_mod_32():
+    # Worked example: payload "1" doubles its rightmost digit: 2 -> check digit (-2) % 32 = 30.
+    assert _check_digit("1") == ALPHABET[30]
+    # Doubling 16 gives 32, whose base-32 digits (1, 0) sum to 1 -> check digit 31.
+    assert _check_digit("G") == ALPHABET[31]
+
+def test_every_issued_pnr_validates():
+    for number in (0, 1, 12345, 987654321, 32 ** DIGITS - 1):
+        pnr = encode_pnr(number)
+        assert normalize_pnr(pnr) == pnr
+
+def test_single_wrong_digit_is_caught():
+    pnr = encode_pnr(123456789)
+    for position in range(len(pnr)):
+        for char in ALPHABET:
+            if char != pnr[position]:
+                typo = pnr[:position] + char + pnr[position + 1:]
+                assert normalize_pnr(typo) is None, typo
+
+def test_most_swapped_neighbours_are_caught():
+    pnr = encode_pnr(123456789)
+    swaps = [pnr[:i] + pnr[i + 1] + pnr[i] + pnr[i + 2:] for i in range(len(pnr) - 1) if pnr[i] != pnr[i + 1]]
+    caught = sum(normalize_pnr(swap) is None for swap in swaps)
+    assert caught >= len(swaps) - 1
+
+def test_normalize_accepts_case_hyphens_and_look_alikes():
+    pnr = encode_pnr(0x1234ABCD)
+    assert normalize_pnr(pnr.lower()) == pnr
+    assert normalize_pnr(f" {pnr[:5]}-{pnr[5:]} ") == pnr
+    zero_pnr = encode_pnr(1)   # starts with zeros
+    assert normalize_pnr(zero_pnr.replace("0", "O")) == zero_pnr
+
+def test_normalize_rejects_malformed_input():
+    assert normalize_pnr("") is None
+    assert normalize_pnr("000000001") is None           # check digit missing
+    assert normalize_pnr(encode_pnr(1) + "0") is None   # too long
+    assert normalize_pnr("00000000U0") is None          # U is not a Crockford digit
+
+def test_legacy_hex_pnrs_are_still_accepted():
+    assert normalize_pnr("1a2b3c4d") == "1A2B3C4D"
+    assert normalize_pnr("DEADBEEF") == "DEADBEEF"
@@ -0,0 +1,166 @@
+# Read replica routing: staleness bound, read-your-writes and fallback to the primary.
+# The replica is a SQLite file copied from the primary on demand (replicate), and the
+# router's clock is fake, so lag is exactly what each test sets up.
+
+import sqlite3
+from datetime import date
+
+import pytest
+
+import main
+import replicas
+from credentials import PasswordHasher
+from replicas import ReplicaRouter
+
+TRAIN = '12723'
+SOURCE, DESTINATION = 'Hyderabad Decan', 'New Delhi'
+MAX_LAG = 300.0
+HEARTBEAT_INTERVAL = 100.0  # never reached in real time: the tests write heartbeats themselves
+TICK = 60.0                 # more than half an interval, so the router reads the replica's heartbeat again
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(replicas, "time", clock)
+    return clock
+
+@pytest.fixture
+def replica_path(tmp_path):
+    return str(tmp_path / "replica.sqlite3")
+
+@pytest.fixture
+def replicate(sqlite_path, replica_path):
+    """Copies the primary to the replica: everything committed so far, heartbeat included."""
+    def replicate():
+        source, target = sqlite3.connect(sqlite_path), sqlite3.connect(replica_path)
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+    return replicate
+
+@pytest.fixture
+def system(sqlite_path, replica_path, replicate, clock, monkeypatch):
+    """A RailwayReservationSystem whose reads may go to one replica, with users alice and bob."""
+    monkeypatch.setattr(main, "SLOW_QUERY_LOG", None)
+    monkeypatch.setattr(main, "REPLICA_MAX_LAG", MAX_LAG)
+    monkeypatch.setattr(main, "REPLICA_HEARTBEAT_INTERVAL", HEARTBEAT_INTERVAL)
+    monkeypatch.setattr(main, "PNR_CACHE_SIZE", 0)
+    setup = main.RailwayReservationSystem(backend="sqlite", sqlite_path=sqlite_path)
+    hasher = setup.hasher = PasswordHasher('pbkdf2_sha256', cost=4, workers=1)
+    assert setup.connect()
+    setup.create_user("alice", "secret")
+    setup.create_user("bob", "secret")
+    setup.disconnect()
+    replicate()
+
+    system = main.RailwayReservationSystem(backend="sqlite", sqlite_path=sqlite_path, read_replicas=[replica_path])
+    system.hasher = hasher
+    assert system.connect()
+    yield system
+    system.disconnect()
+    hasher.close()
+
+def tick(system, clock, replicate=None):
+    """Moves time on and writes a heartbeat; with replicate, the replica catches up to it."""
+    clock.now += TICK
+    system.replicas._beat()
+    if replicate:
+        replicate()
+
+def served_by(system, read):
+    before = dict(system.replicas.reads)
+    result = read()
+    [where] = [name for name, count in system.replicas.reads.items() if count != before[name]]
+    return where, result
+
+def test_fresh_replica_serves_reads(system, clock, replicate):
+    tick(system, clock, replicate)
+    where, trains = served_by(system, lambda: system.find_trains(SOURCE, DESTINATION, date.today()))
+    assert where == 'replica' and [train[0] for train in trains] == [TRAIN]
+    status = system.replicas.status()['replicas'][0]
+    assert status['serving'] and status['lag_seconds'] == 0
+
+def test_stale_replica_is_skipped(system, clock, replicate):
+    tick(system, clock, replicate)
+    clock.now += MAX_LAG + 1  # the primary moves on, replication does not
+    system.replicas._beat()
+    assert served_by(system, lambda: system.find_trains(SOURCE, DESTINATION, date.today()))[0] == 'primary'
+    assert not system.replicas.status()['replicas'][0]['serving']
+    tick(system, clock, replicate)
+    assert served_by(system, lambda: system.find_trains(SOURCE, DESTINATION, date.today()))[0] == 'replica'
+
+def test_read_your_writes(system, clock, replicate):
+    tick(system, clock, replicate)
+    alice, bob = system.sessions.create("alice"), system.sessions.create("bob")
+    clock.now += 1  # the booking commits after the replica's last heartbeat
+    [(pnr, *_)] = system.reserve_seats(alice, TRAIN, date.today(), [("A", 30)])
+
+    # The replica is within MAX_LAG but does not have the booking yet: alice reads the primary.
+    where, booking = served_by(system, lambda: system.get_booking(alice, pnr))
+    assert where == 'primary' and booking['seat_number'] == 1
+    where, (bookings, _) = served_by(system, lambda: system.list_bookings(alice))
+    assert where == 'primary' and [b['pnr_number'] for b in bookings] == [pnr]
+    # Other users' reads may still be served by the replica.
+    assert served_by(system, lambda: system.list_bookings(bob))[0] == 'replica'
+
+    # A heartbeat written before the booking committed is not enough...
+    replicate()
+    clock.now += TICK
+    assert served_by(system, lambda: system.list_bookings(alice))[0] == 'primary'
+    # ... one written after it is: the replica has the booking too.
+    tick(system, clock, replicate)
+    where, (bookings, _) = served_by(system, lambda: system.list_bookings(alice))
+    assert where == 'replica' and [b['pnr_number'] for b in bookings] == [pnr]
+
+    clock.now += 1
+    system.cancel_reservation(alice, pnr)
+    where, booking = served_by(system, lambda: system.get_booking(alice, pnr))
+    assert where == 'primary' and booking is None
+
+def test_reset_sends_every_user_to_the_primary(system, clock, replicate):
+    tick(system, clock, replicate)
+    clock.now += 1
+    system.replicas.wrote_all()
+    bob = system.sessions.create("bob")
+    assert served_by(system, lambda: system.list_bookings(bob))[0] == 'primary'
+    assert served_by(system, lambda: system.find_trains(SOURCE, DESTINATION, date.today()))[0] == 'primary'
+    tick(system, clock, replicate)
+    assert served_by(system, lambda: system.list_bookings(bob))[0] == 'replica'
+
+def test_unreachable_replica_falls_back_to_the_primary(sqlite_path, tmp_path, clock, monkeypatch):
+    monkeypatch.setattr(main, "SLOW_QUERY_LOG", None)
+    monkeypatch.setattr(main, "REPLICA_HEARTBEAT_INTERVAL", HEARTBEAT_INTERVAL)
+    monkeypatch.setattr(main, "REPLICA_MAX_LAG", MAX_LAG)
+    missing = str(tmp_path / "no such directory" / "replica.sqlite3")
+    system = main.RailwayReservationSystem(backend="sqlite", sqlite_path=sqlite_path, read_replicas=[missing])
+    assert system.connect()
+    try:
+        where, trains = served_by(system, lambda: system.find_trains(SOURCE, DESTINATION, date.today()))
+        assert where == 'primary' and trains
+        assert system.replicas.status()['replicas'][0]['lag_seconds'] is None
+    finally:
+        system.disconnect()
+
+def test_router_without_replicas_reads_the_primary(system):
+    router = ReplicaRouter(system.pool, [])
+    router.wrote("alice")
+    with router.connection("alice") as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM USERS")
+        assert cursor.fetchone()[0] == 2
+    assert router.reads == {'replica': 0, 'primary': 1}
+    with pytest.raises(ValueError):
+        ReplicaRouter(system.pool, [system.pool], max_lag=1.0, heartbeat_interval=1.0)
@@ -0,0 +1,94 @@
+# SeatMap bit arithmetic and allocate_seats, for whole journeys and offset slots.
+
+from seat_inventory import SeatMap, allocate_seats
+
+
+def test_empty_map():
+    seats = SeatMap(10)
+    assert seats.free_count() == 10
+    assert seats.first_free() == 1
+    assert seats.find_block(10) == 1
+    assert seats.find_block(11) is None
+
+def test_first_free_skips_taken_seats():
+    seats = SeatMap.from_seat_numbers(8, [1, 2, 4])
+    assert seats.first_free() == 3
+    assert SeatMap.from_seat_numbers(3, [1, 2, 3]).first_free() is None
+
+def test_find_block_finds_the_lowest_run():
+    seats = SeatMap.from_seat_numbers(10, [3, 6])   # free runs: 1-2, 4-5, 7-10
+    assert seats.find_block(1) == 1
+    assert seats.find_block(2) == 1
+    assert seats.find_block(3) == 7
+    assert seats.find_block(4) == 7
+    assert seats.find_block(5) is None
+
+def test_find_block_does_not_run_past_the_last_seat():
+    seats = SeatMap.from_seat_numbers(5, [1, 2, 3])
+    assert seats.find_block(2) == 4
+    assert seats.find_block(3) is None
+
+def test_allocate_takes_a_contiguous_block():
+    seats = SeatMap.from_seat_numbers(10, [2])
+    assert seats.allocate(3) == [3, 4, 5]
+    assert seats.free_count() == 6
+    assert all(seats.is_taken(n) for n in (2, 3, 4, 5))
+
+def test_allocate_falls_back_to_the_lowest_free_seats():
+    seats = SeatMap.from_seat_numbers(6, [2, 4, 6])
+    assert seats.allocate(3) == [1, 3, 5]
+    assert seats.free_count() == 0
+
+def test_allocate_takes_nothing_when_too_few_seats_are_free():
+    seats = SeatMap.from_seat_numbers(4, [1, 2])
+    assert seats.allocate(3) is None
+    assert seats.free_count() == 2
+
+def test_release_frees_the_seat_again():
+    seats = SeatMap(4)
+    seats.allocate(4)
+    seats.release(3)
+    assert seats.free_count() == 1
+    assert seats.first_free() == 3
+    assert seats.allocate(1) == [3]
+
+def test_offset_slot_uses_its_own_seat_numbers():
+    # The second slot of a journey: seats 51-75.
+    seats = SeatMap(25, first_seat=51)
+    assert seats.first_free() == 51
+    assert seats.allocate(2) == [51, 52]
+    assert seats.is_taken(52) and not seats.is_taken(53)
+    seats.release(51)
+    assert seats.first_free() == 51
+    assert seats.find_block(3) == 53
+
+def test_offset_slot_from_seat_numbers_and_bytes():
+    seats = SeatMap.from_seat_numbers(10, [101, 105, 110], first_seat=101)
+    assert seats.free_count() == 7
+    restored = SeatMap.from_bytes(10, seats.to_bytes(), first_seat=101)
+    assert [n for n in range(101, 111) if restored.is_taken(n)] == [101, 105, 110]
+    assert restored.find_block(3) == 102
+    assert restored.allocate(4) == [106, 107, 108, 109]
+
+def test_bytes_round_trip():
+    seats = SeatMap.from_seat_numbers(20, [1, 9, 17, 20])
+    data = seats.to_bytes()
+    assert len(data) == 3
+    assert SeatMap.from_bytes(20, data).to_bytes() == data
+    assert SeatMap.from_bytes(20, None).free_count() == 20
+
+def test_allocate_seats_prefers_one_slot_with_a_block():
+    first, second = SeatMap.from_seat_numbers(5, [2, 4]), SeatMap(5, first_seat=6)
+    taken = allocate_seats([(0, 3, first), (1, 5, second)], 3)
+    assert taken == [(1, second, [6, 7, 8])]
+
+def test_allocate_seats_spreads_over_slots_when_no_block_fits():
+    first, second = SeatMap.from_seat_numbers(3, [2]), SeatMap.from_seat_numbers(3, [5], first_seat=4)
+    taken = allocate_seats([(0, 2, first), (1, 2, second)], 4)
+    assert taken == [(0, first, [1, 3]), (1, second, [4, 6])]
+
+def test_allocate_seats_respects_the_slot_counters():
+    # The counter (available_seats) says 1 even though the map has 3 free seats.
+    seats = SeatMap(3)
+    assert allocate_seats([(0, 1, seats)], 2) is None
+    assert seats.free_count() == 3
@@ -0,0 +1,87 @@
+# Signed session tokens: tampering, expiry, logout and sessions shared through the database.
+
+import pytest
+
+import sessions
+from main import ReservationError
+from sessions import DatabaseSessionBackend, SessionStore, _b64
+
+SECRET = "test-secret"
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions, "time", clock)
+    return clock
+
+def test_token_round_trip(clock):
+    store = SessionStore(SECRET, ttl=60)
+    session = store.create("alice")
+    assert store.get(session.token) is session
+    assert session.username == "alice" and session.expires_at == int(clock.now + 60)
+
+def test_tampered_tokens_are_rejected(clock):
+    store = SessionStore(SECRET, ttl=60)
+    token = store.create("alice").token
+    user_part, expiry_part, nonce, signature = token.split(".")
+    forged = [
+        ".".join((_b64(b"admin"), expiry_part, nonce, signature)),              # another user
+        ".".join((user_part, str(int(expiry_part) + 3600), nonce, signature)),  # a later expiry
+        token[:-1] + ("A" if token[-1] != "A" else "B"),                        # a changed signature
+        token + ".extra", "not-a-token", "", None,
+    ]
+    for candidate in forged:
+        assert store.get(candidate) is None, candidate
+    # A token signed with another secret is refused too.
+    assert store.get(SessionStore("other-secret", ttl=60).create("alice").token) is None
+
+def test_tokens_expire(clock):
+    store = SessionStore(SECRET, ttl=60)
+    session = store.create("alice")
+    clock.now += 59
+    assert store.get(session.token) is session
+    clock.now += 1
+    assert store.get(session.token) is None
+    assert len(store) == 0  # evicted
+
+def test_logout_revokes_only_that_session(clock):
+    store = SessionStore(SECRET, ttl=60)
+    first, second = store.create("alice"), store.create("alice")
+    store.revoke(first.token)
+    assert store.get(first.token) is None
+    assert store.get(second.token) is second
+    store.revoke_all()
+    assert store.get(second.token) is None
+
+def test_reservations_refuse_logged_out_and_non_admin_sessions(system):
+    system.create_user("alice", "secret")
+    session = system.login_user("alice", "secret")
+    assert system._require_session(session) == "alice"
+    with pytest.raises(ReservationError) as err:
+        system._require_session(session, admin=True)
+    assert err.value.code == 'forbidden'
+
+    system.logout_user(session)
+    with pytest.raises(ReservationError) as err:
+        system.reserve_seats(session, '12723', None, [("A", 30)])
+    assert err.value.code == 'forbidden'
+    assert system.login_user("alice", "wrong") is None
+
+def test_database_backend_shares_sessions_and_logouts(system):
+    backend = DatabaseSessionBackend(system.pool)
+    here = SessionStore(SECRET, ttl=60, backend=backend, recheck_interval=0)
+    there = SessionStore(SECRET, ttl=60, backend=backend, recheck_interval=0)
+    session = here.create("alice")
+    assert there.get(session.token).username == "alice"
+    here.revoke(session.token)
+    assert there.get(session.token) is None
+    # A validly signed token the backend never saw is not accepted.
+    assert there.get(SessionStore(SECRET, ttl=60).create("alice").token) is None
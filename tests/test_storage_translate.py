@@ -0,0 +1,64 @@
+# translate_sql: the MySQL dialect used by the code base, rewritten for SQLite.
+
+import sqlite3
+
+from storage import translate_sql
+
+
+def test_placeholders():
+    assert translate_sql("SELECT * FROM USERS WHERE username = %s AND password = %s") == (
+        "SELECT * FROM USERS WHERE username = ? AND password = ?"
+    )
+
+def test_for_update_is_dropped():
+    assert translate_sql("SELECT seat_map FROM JOURNEYS WHERE train_number = %s FOR UPDATE") == (
+        "SELECT seat_map FROM JOURNEYS WHERE train_number = ?"
+    )
+    query = """
+        SELECT slot FROM JOURNEYS WHERE journey_date = %s ORDER BY slot
+        FOR UPDATE"""
+    assert "FOR UPDATE" not in translate_sql(query)
+    assert translate_sql(query).endswith("ORDER BY slot")
+
+def test_for_update_inside_a_name_is_kept():
+    assert translate_sql("SELECT last_for_update FROM T") == "SELECT last_for_update FROM T"
+
+def test_truncate():
+    assert translate_sql("TRUNCATE TABLE RESERVATIONS") == "DELETE FROM RESERVATIONS"
+    assert translate_sql("  truncate table USERS") == "DELETE FROM USERS"
+
+def test_insert_ignore():
+    assert translate_sql("INSERT IGNORE INTO T (a) VALUES (%s)") == "INSERT OR IGNORE INTO T (a) VALUES (?)"
+
+def test_foreign_key_checks():
+    assert translate_sql("SET FOREIGN_KEY_CHECKS = 0") == "PRAGMA defer_foreign_keys = ON"
+    assert translate_sql("SET FOREIGN_KEY_CHECKS=1") == "PRAGMA defer_foreign_keys = OFF"
+
+def test_auto_increment():
+    assert translate_sql("CREATE TABLE T (id BIGINT AUTO_INCREMENT PRIMARY KEY, x INT)") == (
+        "CREATE TABLE T (id INTEGER PRIMARY KEY AUTOINCREMENT, x INT)"
+    )
+
+def test_on_duplicate_key_update():
+    query = translate_sql(
+        "INSERT INTO ADMIN_STATS (stat_name, slot, value) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE value = value + VALUES(value)"
+    )
+    assert query == (
+        "INSERT INTO ADMIN_STATS (stat_name, slot, value) VALUES (?, ?, ?) "
+        "ON CONFLICT DO UPDATE SET value = value + excluded.value"
+    )
+
+def test_on_duplicate_key_update_runs_on_sqlite():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE COUNTERS (name TEXT PRIMARY KEY, value INT)")
+    query = translate_sql(
+        "INSERT INTO COUNTERS (name, value) VALUES (%s, %s) ON DUPLICATE KEY UPDATE value = value + VALUES(value)"
+    )
+    conn.execute(query, ("bookings", 2))
+    conn.execute(query, ("bookings", 3))
+    assert conn.execute("SELECT value FROM COUNTERS").fetchone() == (5,)
+
+def test_plain_sql_is_unchanged():
+    query = "SELECT t.train_number FROM TRAINS t WHERE t.source = 'Delhi' ORDER BY t.train_number"
+    assert translate_sql(query) == query
@@ -0,0 +1,103 @@
+# Waitlist of a full journey: joining, positions, and promotion when a seat is cancelled.
+
+from datetime import date
+
+import pytest
+
+import main
+from main import ReservationError
+
+TRAIN = '12723'
+
+
+@pytest.fixture
+def full_train(system):
+    """TRAIN with two seats on today's journey, both booked by 'alice'. Returns (alice, bob, carol, her PNRs)."""
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE TRAINS SET total_seats = 2 WHERE train_number = %s", (TRAIN,))
+        conn.commit()
+    users = []
+    for name in ("alice", "bob", "carol"):
+        system.create_user(name, "secret")
+        users.append(system.sessions.create(name))
+    booked = system.reserve_seats(users[0], TRAIN, date.today(), [("A1", 30), ("A2", 31)])
+    return (*users, [pnr for pnr, *_ in booked])
+
+def _free_seats(system):
+    with system.pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT SUM(available_seats) FROM JOURNEYS WHERE train_number = %s", (TRAIN,))
+        return cursor.fetchone()[0]
+
+def test_join_only_when_full(system):
+    system.create_user("alice", "secret")
+    alice = system.sessions.create("alice")
+    with pytest.raises(ReservationError) as err:
+        system.join_waitlist(alice, TRAIN, date.today(), [("A", 30)])
+    assert err.value.code == 'conflict'
+
+def test_positions_in_joining_order(system, full_train):
+    _, bob, carol, _ = full_train
+    with pytest.raises(ReservationError) as err:
+        system.reserve_seats(bob, TRAIN, date.today(), [("B", 40)])
+    assert err.value.code == 'unavailable'
+
+    [(bob_pnr, _, _, bob_position)] = system.join_waitlist(bob, TRAIN, date.today(), [("B", 40)])
+    carol_entries = system.join_waitlist(carol, TRAIN, date.today(), [("C1", 50), ("C2", 51)])
+    assert bob_position == 1
+    assert [position for *_, position in carol_entries] == [2, 3]
+
+    assert system.get_waitlist_position(bob, bob_pnr)['position'] == 1
+    assert system.get_waitlist_position(carol, carol_entries[1][0]) == {
+        'pnr_number': carol_entries[1][0], 'train_number': TRAIN,
+        'journey_date': date.today().isoformat(), 'position': 3, 'waiting': 3,
+    }
+    booking = system.get_booking(bob, bob_pnr)
+    assert booking['status'] == 'waitlisted' and booking['waitlist_position'] == 1
+    with pytest.raises(ReservationError) as err:
+        system.get_waitlist_position(carol, bob_pnr)
+    assert err.value.code == 'forbidden'
+
+def test_waitlist_limit(system, full_train, monkeypatch):
+    _, bob, carol, _ = full_train
+    monkeypatch.setattr(main, "WAITLIST_LIMIT", 2)
+    system.join_waitlist(bob, TRAIN, date.today(), [("B", 40)])
+    with pytest.raises(ReservationError) as err:
+        system.join_waitlist(carol, TRAIN, date.today(), [("C1", 50), ("C2", 51)])
+    assert err.value.code == 'unavailable'
+
+def test_cancel_promotes_the_head_of_the_waitlist(system, full_train):
+    alice, bob, carol, alice_pnrs = full_train
+    [(bob_pnr, *_)] = system.join_waitlist(bob, TRAIN, date.today(), [("B", 40)])
+    [(carol_pnr, *_)] = system.join_waitlist(carol, TRAIN, date.today(), [("C", 50)])
+    seat = system.get_booking(alice, alice_pnrs[1])['seat_number']
+
+    assert system.cancel_reservation(alice, alice_pnrs[1]) == (TRAIN, seat)
+
+    # Bob keeps his PNR and takes the cancelled seat; carol moves up; no seat was freed.
+    booking = system.get_booking(bob, bob_pnr)
+    assert booking['status'] == 'confirmed' and booking['seat_number'] == seat
+    assert system.get_waitlist_position(bob, bob_pnr) is None
+    assert system.get_waitlist_position(carol, carol_pnr)['position'] == 1
+    assert system.get_booking(alice, alice_pnrs[1]) is None
+    assert _free_seats(system) == 0
+
+    # With nobody left waiting, the next cancellation frees its seat.
+    system.cancel_reservation(carol, carol_pnr)
+    system.cancel_reservation(alice, alice_pnrs[0])
+    assert _free_seats(system) == 1
+    assert system.reserve_seats(carol, TRAIN, date.today(), [("C", 50)])[0][3] == 1
+
+def test_cancel_a_waitlisted_pnr(system, full_train):
+    _, bob, carol, _ = full_train
+    [(bob_pnr, *_)] = system.join_waitlist(bob, TRAIN, date.today(), [("B", 40)])
+    [(carol_pnr, *_)] = system.join_waitlist(carol, TRAIN, date.today(), [("C", 50)])
+    with pytest.raises(ReservationError) as err:
+        system.cancel_reservation(carol, bob_pnr)
+    assert err.value.code == 'forbidden'
+
+    assert system.cancel_reservation(bob, bob_pnr) == (TRAIN, None)
+    assert system.get_booking(bob, bob_pnr) is None
+    assert system.get_waitlist_position(carol, carol_pnr)['position'] == 1
+    assert _free_seats(system) == 0
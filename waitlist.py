@@ -0,0 +1,208 @@
+# Waitlist for the Railway Reservation System.
+# Passengers who find a journey (a train on one travel date) full can join its waitlist
+# instead of polling for cancelled seats. A waitlisted passenger gets a PNR straight away;
+# when a seat on the journey is cancelled, the head of the waitlist is booked onto it in
+# the same transaction and keeps the same PNR.
+#
+# WAITLIST is the queue (ordered by waitlist_id); WaitlistIndex mirrors it in memory so a
+# passenger's position is a dictionary lookup instead of a count over the table.
+
+import threading
+import time
+from collections import deque
+
+from storage import prepared_statement
+
+POP_HEAD_SQL = prepared_statement(
+    """
+    SELECT waitlist_id, pnr_number, username, passenger_name, age FROM WAITLIST
+    WHERE train_number = %s AND journey_date = %s
+    ORDER BY waitlist_id LIMIT 1 FOR UPDATE
+    """
+)
+
+
+def count_waiting(cursor, train_number, journey_date):
+    cursor.execute(
+        "SELECT COUNT(*) FROM WAITLIST WHERE train_number = %s AND journey_date = %s",
+        (train_number, journey_date),
+    )
+    return cursor.fetchone()[0]
+
+def add_to_waitlist(cursor, train_number, journey_date, username, entries):
+    """
+    Appends (pnr_number, name, age) entries to the journey's waitlist, in order.
+    Call this while holding the journey's slot locks (see lock_journey), so a seat cannot
+    be freed between the caller finding the journey full and the passengers joining.
+    Returns [(waitlist_id, pnr_number), ...].
+    """
+    added = []
+    for pnr_number, name, age in entries:
+        cursor.execute(
+            """
+            INSERT INTO WAITLIST (pnr_number, train_number, journey_date, username, passenger_name, age)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (pnr_number, train_number, journey_date, username, name, age),
+        )
+        added.append((cursor.lastrowid, pnr_number))
+    return added
+
+def pop_waitlist_head(cursor, train_number, journey_date):
+    """
+    Removes the first passenger waiting for the journey and returns
+    (pnr_number, username, name, age), or None if nobody is waiting.
+    Call this inside the transaction that frees the seat they will get.
+    """
+    cursor.execute(POP_HEAD_SQL, (train_number, journey_date))
+    head = cursor.fetchone()
+    if head is None:
+        return None
+    cursor.execute("DELETE FROM WAITLIST WHERE waitlist_id = %s", (head[0],))
+    return head[1:]
+
+def expire_waitlists(cursor, before_date):
+    """Drops the waitlists of journeys that ran before before_date. Returns the passengers removed."""
+    cursor.execute("DELETE FROM WAITLIST WHERE journey_date < %s", (before_date,))
+    return cursor.rowcount
+
+
+class _Queue:
+    """One journey's waitlist: PNRs in order, each with a rank that is contiguous from the head."""
+
+    __slots__ = ('order', 'ranks', 'last_id', 'loaded_at')
+
+    def __init__(self, rows, loaded_at):
+        self.order = deque()
+        self.ranks = {}  # pnr_number -> (rank, username)
+        self.last_id = 0
+        self.loaded_at = loaded_at
+        for waitlist_id, pnr_number, username in rows:
+            self.append(waitlist_id, pnr_number, username)
+
+    def append(self, waitlist_id, pnr_number, username):
+        rank = self.ranks[self.order[-1]][0] + 1 if self.order else 1
+        self.order.append(pnr_number)
+        self.ranks[pnr_number] = (rank, username)
+        self.last_id = waitlist_id
+
+    def position(self, pnr_number):
+        rank, username = self.ranks[pnr_number]
+        return rank - self.ranks[self.order[0]][0] + 1, username
+
+
+class WaitlistIndex:
+    """
+    In-memory copy of the WAITLIST queues, keyed by journey.
+
+    position() is O(1): every entry stores its rank and the head's rank is subtracted.
+    Joining and promoting the head keep ranks as they are; only a passenger leaving from
+    the middle renumbers the entries behind them.
+
+    Changes made by this process are applied after they commit. A journey's queue is
+    re-read from the database (one indexed query) when it is older than refresh_interval,
+    which picks up changes made by other processes.
+    """
+
+    def __init__(self, pool, refresh_interval=5.0):
+        self.pool = pool
+        self.refresh_interval = refresh_interval
+        self._queues = {}   # (train_number, journey_date) -> _Queue
+        self._journeys = {} # pnr_number -> (train_number, journey_date)
+        self._lock = threading.Lock()
+
+    def _load(self, journey):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                SELECT waitlist_id, pnr_number, username FROM WAITLIST
+                WHERE train_number = %s AND journey_date = %s ORDER BY waitlist_id
+                """,
+                journey,
+            )
+            rows = cursor.fetchall()
+            cursor.close()
+
+        queue = _Queue(rows, time.monotonic())
+        with self._lock:
+            self._drop(journey)
+            self._queues[journey] = queue
+            for pnr_number in queue.order:
+                self._journeys[pnr_number] = journey
+        return queue
+
+    def _find_journey(self, pnr_number):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT train_number, journey_date FROM WAITLIST WHERE pnr_number = %s", (pnr_number,))
+            row = cursor.fetchone()
+            cursor.close()
+        return tuple(row) if row else None
+
+    def _drop(self, journey):
+        """Forgets a journey's queue (call with the lock held); it is reloaded on next use."""
+        queue = self._queues.pop(journey, None)
+        if queue:
+            for pnr_number in queue.order:
+                self._journeys.pop(pnr_number, None)
+
+    def position(self, pnr_number):
+        """
+        Returns (train_number, journey_date, position, waiting, username) for a waitlisted
+        PNR (position 1 is next in line), or None if the PNR is not on any waitlist.
+        """
+        with self._lock:
+            journey = self._journeys.get(pnr_number)
+            queue = self._queues.get(journey)
+            fresh = queue is not None and time.monotonic() - queue.loaded_at < self.refresh_interval
+
+        if not fresh:
+            journey = journey or self._find_journey(pnr_number)
+            if journey is None:
+                return None
+            queue = self._load(journey)
+
+        with self._lock:
+            if pnr_number not in queue.ranks:
+                return None
+            position, username = queue.position(pnr_number)
+            return journey[0], journey[1], position, len(queue.order), username
+
+    def joined(self, journey, username, added):
+        """Records [(waitlist_id, pnr_number), ...] that joined the journey's waitlist (after commit)."""
+        with self._lock:
+            queue = self._queues.get(journey)
+            if queue is None:
+                return
+            if added and added[0][0] < queue.last_id:
+                # Another thread's entries committed first with higher ids; re-read instead.
+                self._drop(journey)
+                return
+            for waitlist_id, pnr_number in added:
+                queue.append(waitlist_id, pnr_number, username)
+                self._journeys[pnr_number] = journey
+
+    def left(self, journey, pnr_number):
+        """Records that a PNR left the journey's waitlist, promoted or withdrawn (after commit)."""
+        with self._lock:
+            queue = self._queues.get(journey)
+            if queue is None or pnr_number not in queue.ranks:
+                return
+            self._journeys.pop(pnr_number, None)
+            removed_rank = queue.ranks.pop(pnr_number)[0]
+            if queue.order[0] == pnr_number:
+                queue.order.popleft()
+                return
+            queue.order.remove(pnr_number)
+            # Everyone behind the withdrawn passenger moves up one place.
+            for waiting in queue.order:
+                rank, username = queue.ranks[waiting]
+                if rank > removed_rank:
+                    queue.ranks[waiting] = (rank - 1, username)
+
+    def clear(self):
+        """Forgets every queue (after the waitlists are reset)."""
+        with self._lock:
+            self._queues.clear()
+            self._journeys.clear()